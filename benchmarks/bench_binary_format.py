@@ -0,0 +1,129 @@
+"""
+Compares JSON, NumPy .npy and Arrow IPC requests and responses of the scoring script.
+
+A logistic regression on wide feature vectors is served in process, so the time is spent
+encoding the request, decoding it into the model input, predicting and encoding and
+decoding the response. Every format scores the same rows, from 1 to 10k rows per request,
+and reports the request size and the time of a round trip.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_binary_format.py --features 200
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import mlflow.sklearn
+from sklearn.linear_model import LogisticRegression
+from scoring import score
+
+
+def encode_request(df: pd.DataFrame, content_type: str) -> bytes:
+    """
+    Encodes the rows of a request the way a client would.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The rows.
+
+    content_type : str
+        One of `score.CONTENT_TYPES`.
+
+    Returns
+    -------
+    bytes : The request body.
+    """
+    if content_type == score.NPY_CONTENT_TYPE:
+        stream = io.BytesIO()
+        np.save(stream, df.to_numpy())
+        return stream.getvalue()
+    if content_type == score.ARROW_CONTENT_TYPE:
+        table = pa.Table.from_arrays([pa.array(df[name].to_numpy()) for name in df.columns], names=list(df.columns))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return json.dumps({"input_data": {"columns": list(df.columns), "data": df.to_numpy().tolist()}}).encode("utf-8")
+
+
+def decode_response(body: bytes, content_type: str) -> np.ndarray:
+    """
+    Decodes the predictions of a response the way a client would.
+
+    Parameters
+    ----------
+    body : bytes
+        The response body.
+
+    content_type : str
+        One of `score.CONTENT_TYPES`.
+
+    Returns
+    -------
+    numpy.ndarray : The predictions.
+    """
+    if content_type == score.NPY_CONTENT_TYPE:
+        return np.load(io.BytesIO(body))
+    if content_type == score.ARROW_CONTENT_TYPE:
+        return pa.ipc.open_stream(body).read_all().column("prediction").to_numpy()
+    return np.array(json.loads(body))
+
+
+def run_benchmark(features: int, repeats: int) -> None:
+    """
+    Runs the benchmark and prints the request size and round trip time of every format.
+
+    Parameters
+    ----------
+    features : int
+        The number of features of a row.
+
+    repeats : int
+        The number of timed round trips of every format and request size, the best is kept.
+
+    Returns
+    -------
+    None : The function prints the results.
+    """
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(10000, features)), columns=[f"f{i}" for i in range(features)])
+    outcome = (df["f0"] + df["f1"] > 0).astype(int)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_path = os.path.join(work_dir, "model")
+        mlflow.sklearn.save_model(LogisticRegression().fit(df, outcome), model_path)
+        score.init(model_path)
+
+        formats = [("json", score.JSON_CONTENT_TYPE), ("npy", score.NPY_CONTENT_TYPE), ("arrow", score.ARROW_CONTENT_TYPE)]
+        print(f"{features} features per row, best of {repeats} round trips")
+        print(f"{'rows':>8}{'format':>8}{'request KiB':>13}{'ms':>10}{'speedup':>9}")
+        for rows in [1, 10, 100, 1000, 10000]:
+            requests = df.iloc[:rows]
+            json_ms = None
+            for name, content_type in formats:
+                times = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    body = encode_request(requests, content_type)
+                    response, response_type = score.score_request(body, content_type)
+                    predictions = decode_response(response, response_type)
+                    times.append(time.perf_counter() - start)
+                assert len(predictions) == rows
+                ms = min(times) * 1000
+                json_ms = json_ms or ms
+                print(f"{rows:>8}{name:>8}{len(body) / 2**10:>13,.1f}{ms:>10.3f}{json_ms / ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--features", type=int, default=200, help="Number of features of a row")
+    parser.add_argument("--repeats", type=int, default=20, help="Number of timed round trips of every format and request size")
+    args = parser.parse_args()
+
+    run_benchmark(args.features, args.repeats)
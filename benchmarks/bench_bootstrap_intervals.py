@@ -0,0 +1,66 @@
+"""
+Compares bootstrapping the metrics from the confusion matrix with resampling the rows.
+
+The row baseline draws blocks of index matrices into the label and prediction arrays and
+recomputes the confusion matrix of every resample. The matrix side draws multinomial cell
+counts, whose cost does not depend on the number of rows. Both report the accuracy interval.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_bootstrap_intervals.py --rows 1000000 --resamples 1000
+"""
+import argparse
+import time
+import numpy as np
+from components.classification.classification_metrics import ConfusionCounts, bootstrap_intervals
+
+
+def run_benchmark(rows: int, resamples: int, block_size: int) -> None:
+    """
+    Runs the benchmark and prints the time and accuracy interval of each side.
+
+    Parameters
+    ----------
+    rows : int
+        The number of labels and predictions.
+
+    resamples : int
+        The number of bootstrap resamples.
+
+    block_size : int
+        The number of resamples drawn together.
+
+    Returns
+    -------
+    None : The function prints the results.
+    """
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, size=rows)
+    y_pred = np.where(rng.random(rows) < 0.8, y_true, 1 - y_true)
+
+    start = time.perf_counter()
+    accuracies = []
+    for first in range(0, resamples, block_size):
+        indices = rng.integers(0, rows, size=(min(block_size, resamples - first), rows))
+        accuracies.append((y_true[indices] == y_pred[indices]).mean(axis=1))
+    row_interval = np.quantile(np.concatenate(accuracies), [0.025, 0.975])
+    row_seconds = time.perf_counter() - start
+    print(f"{'rows':>8}{row_seconds:>10.3f} s  accuracy in [{row_interval[0]:.5f}, {row_interval[1]:.5f}]")
+
+    start = time.perf_counter()
+    counts = ConfusionCounts()
+    counts.update(y_true, y_pred)
+    intervals = bootstrap_intervals(counts.matrix, counts.labels, n_resamples=resamples, block_size=block_size)
+    matrix_seconds = time.perf_counter() - start
+    accuracy = intervals["accuracy"]
+    print(f"{'matrix':>8}{matrix_seconds:>10.3f} s  accuracy in [{accuracy['lower']:.5f}, {accuracy['upper']:.5f}]")
+    print(f"{'speedup':>8}{row_seconds / matrix_seconds:>10.1f} x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000, help="Number of labels and predictions")
+    parser.add_argument("--resamples", type=int, default=1000, help="Number of bootstrap resamples")
+    parser.add_argument("--block_size", type=int, default=16, help="Number of resamples drawn together")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.resamples, args.block_size)
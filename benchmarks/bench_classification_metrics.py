@@ -0,0 +1,80 @@
+"""
+Compares the single-pass confusion-matrix metrics with the separate sklearn metric calls.
+
+The sklearn baseline is what evaluate_model used to run: accuracy_score, recall_score and
+precision_score, each validating and scanning the labels again. Both sides are timed on
+the same synthetic labels and their metrics are checked against each other.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_classification_metrics.py --rows 20000000 --classes 2
+"""
+import argparse
+import time
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from components.classification.classification_metrics import ConfusionCounts
+
+
+def run_benchmark(rows: int, classes: int, repeats: int) -> None:
+    """
+    Runs the benchmark and prints the best time of each side.
+
+    Parameters
+    ----------
+    rows : int
+        The number of labels and predictions.
+
+    classes : int
+        The number of classes, binary metrics are used for 2 and macro averages otherwise.
+
+    repeats : int
+        The number of timed runs of each side.
+
+    Returns
+    -------
+    None : The function prints the results and raises if the metrics differ.
+    """
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, classes, size=rows)
+    y_pred = np.where(rng.random(rows) < 0.8, y_true, rng.integers(0, classes, size=rows))
+    average = "binary" if classes == 2 else "macro"
+
+    def sklearn_metrics():
+        return {
+            "accuracy": accuracy_score(y_true, y_pred),
+            "recall": recall_score(y_true, y_pred, average=average),
+            "precision": precision_score(y_true, y_pred, average=average),
+            "f1_score": f1_score(y_true, y_pred, average=average),
+        }
+
+    def single_pass_metrics():
+        counts = ConfusionCounts()
+        counts.update(y_true, y_pred)
+        return counts.metrics(average)
+
+    print(f"{rows:,} rows, {classes} classes, {average} average")
+    timings = {}
+    for name, compute in [("sklearn", sklearn_metrics), ("single-pass", single_pass_metrics)]:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            metrics = compute()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = (best, metrics)
+        print(f"{name:>12}{best:>10.3f} s{rows / best:>16,.0f} rows/sec")
+
+    expected, actual = timings["sklearn"][1], timings["single-pass"][1]
+    for metric, value in expected.items():
+        if not np.isclose(actual[metric], value):
+            raise AssertionError(f"{metric} differs: {actual[metric]} != {value}")
+    print(f"{'speedup':>12}{timings['sklearn'][0] / timings['single-pass'][0]:>10.1f} x, metrics match")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000000, help="Number of labels and predictions")
+    parser.add_argument("--classes", type=int, default=2, help="Number of classes")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed runs of each side")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.classes, args.repeats)
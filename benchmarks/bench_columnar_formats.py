@@ -0,0 +1,114 @@
+"""
+Compares CSV with the columnar dataset formats on a synthetic wide table.
+
+For every format the table is written with `DatasetWriter` and read back with
+`read_dataset_files`, reporting write time, full read time, pruned read time (10 columns)
+and bytes on disk.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_columnar_formats.py --rows 200000 --columns 200
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from components.common.data_loader import DATASET_FORMATS, DatasetWriter, dataset_file_name, read_dataset_files
+
+
+def make_wide_table(rows: int, columns: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a synthetic feature table with float, integer and categorical columns.
+
+    Parameters
+    ----------
+    rows : int
+        The number of rows.
+
+    columns : int
+        The number of feature columns, split evenly between the three kinds.
+
+    seed : int, optional
+        The random seed. The default value is 0.
+
+    Returns
+    -------
+    pd.DataFrame : The synthetic table with an extra binary 'label' column.
+    """
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        if i % 3 == 0:
+            data[f"num_{i}"] = rng.normal(size=rows)
+        elif i % 3 == 1:
+            data[f"int_{i}"] = rng.integers(0, 1000, size=rows)
+        else:
+            data[f"cat_{i}"] = pd.Categorical.from_codes(
+                rng.integers(0, 20, size=rows), [f"level_{j}" for j in range(20)]
+            ).astype(str)
+    data["label"] = rng.integers(0, 2, size=rows)
+    return pd.DataFrame(data)
+
+
+def run_benchmark(rows: int, columns: int, repeat: int) -> None:
+    """
+    Runs the benchmark and prints one result line per format.
+
+    Parameters
+    ----------
+    rows : int
+        The number of rows of the synthetic table.
+
+    columns : int
+        The number of feature columns of the synthetic table.
+
+    repeat : int
+        The number of times each measurement is repeated, the best time is reported.
+
+    Returns
+    -------
+    None : The function prints the results.
+    """
+    df = make_wide_table(rows, columns)
+    pruned_columns = list(df.columns[:9]) + ["label"]
+    print(f"Synthetic table: {rows} rows x {df.shape[1]} columns")
+    print(f"{'format':<10}{'write s':>10}{'read s':>10}{'pruned s':>10}{'MB on disk':>12}")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for data_format in DATASET_FORMATS:
+            file_path = os.path.join(work_dir, dataset_file_name("data", data_format))
+
+            write_times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with DatasetWriter(file_path, data_format) as writer:
+                    writer.write(df)
+                write_times.append(time.perf_counter() - start)
+
+            read_times = []
+            pruned_times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                read_dataset_files([file_path], data_format)
+                read_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                read_dataset_files([file_path], data_format, usecols=pruned_columns)
+                pruned_times.append(time.perf_counter() - start)
+
+            size_mb = os.path.getsize(file_path) / 2**20
+            print(
+                f"{data_format:<10}{min(write_times):>10.3f}{min(read_times):>10.3f}"
+                f"{min(pruned_times):>10.3f}{size_mb:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000, help="Number of rows")
+    parser.add_argument("--columns", type=int, default=200, help="Number of feature columns")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per measurement")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.columns, args.repeat)
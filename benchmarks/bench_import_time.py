@@ -0,0 +1,97 @@
+"""
+Measures the import time of every component with `python -X importtime`.
+
+Every component is imported in a fresh interpreter, so nothing is cached between runs. The
+cumulative time of the component module and the heavy modules it loads at import time
+(mlflow, pandas, scikit-learn, scipy and pyarrow) are reported. Components load these lazily,
+so any heavy module listed, or a time over `--max_ms`, is a regression and fails the run.
+
+Usage (from the repository root):
+    python benchmarks/bench_import_time.py --repeats 5 --max_ms 500
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Components timed by the benchmark
+COMPONENTS = [
+    "components.training.split_data",
+    "components.classification.model_evaluator",
+    "components.classification.model_selector",
+    "components.training.register_model",
+]
+
+# Modules the components must not import at module load
+HEAVY_MODULES = ["mlflow", "pandas", "sklearn", "scipy", "pyarrow"]
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def import_time(module: str) -> tuple:
+    """
+    Imports a module in a fresh interpreter and reads its `-X importtime` report.
+
+    Parameters
+    ----------
+    module : str
+        The full name of the module.
+
+    Returns
+    -------
+    tuple : The cumulative import time of the module in milliseconds and the heavy modules
+        it loaded.
+    """
+    code = f"import sys, {module}; print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    env = {**os.environ, "PYTHONPATH": SRC_PATH}
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env, capture_output=True, text=True, check=True)
+
+    # Lines read 'import time: <self us> | <cumulative us> | <indented module name>'
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative = int(fields[1]) / 1000
+    heavy = [name for name in completed.stdout.strip().split(",") if name]
+    return cumulative, heavy
+
+
+def run_benchmark(repeats: int, max_ms: float = None) -> None:
+    """
+    Runs the benchmark and prints the best import time of every component.
+
+    Parameters
+    ----------
+    repeats : int
+        The number of timed imports of every component.
+
+    max_ms : float, optional
+        The import time budget of a component in milliseconds. Defaults to None.
+
+    Returns
+    -------
+    None : The function prints the results and raises if a component loads a heavy module
+        or exceeds the budget.
+    """
+    failures = []
+    for module in COMPONENTS:
+        runs = [import_time(module) for _ in range(repeats)]
+        best = min(milliseconds for milliseconds, _ in runs)
+        heavy = sorted(set(name for _, names in runs for name in names))
+        print(f"{module:>45}{best:>10.1f} ms  heavy modules {heavy or 'none'}")
+        if heavy:
+            failures.append(f"{module} imports {heavy}")
+        if max_ms is not None and best > max_ms:
+            failures.append(f"{module} takes {best:.1f} ms to import")
+
+    if failures:
+        raise AssertionError("; ".join(failures))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5, help="Number of timed imports of every component")
+    parser.add_argument("--max_ms", type=float, default=None, help="Import time budget of a component in milliseconds")
+    args = parser.parse_args()
+
+    run_benchmark(args.repeats, args.max_ms)
@@ -0,0 +1,186 @@
+"""
+Load-tests the local scoring server with micro-batching off and on.
+
+A random forest is saved as an MLflow model and served by `src/scoring/score.py` in a
+separate process, once per side. Client threads send single-row requests over kept-alive
+connections for a fixed time. Every side reports the p50 and p99 latency and the throughput.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_micro_batching.py --clients 32 --seconds 10
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import mlflow.sklearn
+from sklearn.ensemble import RandomForestClassifier
+
+SCORE_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "scoring", "score.py")
+
+
+def free_port() -> int:
+    """
+    Finds a free local port.
+
+    Returns
+    -------
+    int : The port.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(model_path: str, port: int, max_batch_rows: int, max_latency_ms: float) -> subprocess.Popen:
+    """
+    Starts the scoring server in a separate process and waits until it answers.
+
+    Parameters
+    ----------
+    model_path : str
+        The MLflow model folder.
+
+    port : int
+        The port of the server.
+
+    max_batch_rows : int
+        The micro-batch size, 0 disables micro-batching.
+
+    max_latency_ms : float
+        The longest time a request waits in a micro-batch.
+
+    Returns
+    -------
+    subprocess.Popen : The server process.
+    """
+    process = subprocess.Popen([
+        sys.executable, SCORE_SCRIPT, "--model_path", model_path, "--port", str(port),
+        "--max_batch_rows", str(max_batch_rows), "--max_latency_ms", str(max_latency_ms),
+    ], stdout=subprocess.DEVNULL)
+    for _ in range(600):
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The scoring server did not start")
+
+
+def load_test(port: int, rows: list, clients: int, seconds: float) -> tuple:
+    """
+    Sends single-row requests from client threads for a fixed time.
+
+    Parameters
+    ----------
+    port : int
+        The port of the server.
+
+    rows : list of list
+        The rows sent, one per request, in turn.
+
+    clients : int
+        The number of client threads, each with its own connection.
+
+    seconds : float
+        The duration of the test.
+
+    Returns
+    -------
+    tuple : The latencies of the requests in seconds and the number of requests per second.
+    """
+    bodies = [json.dumps({"data": [row]}).encode("utf-8") for row in rows]
+    latencies = [[] for _ in range(clients)]
+    stop = time.perf_counter() + seconds
+
+    def client(index):
+        connection = http.client.HTTPConnection("127.0.0.1", port)
+        sent = index
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            connection.request("POST", "/score", body=bodies[sent % len(bodies)], headers={"Content-Type": "application/json"})
+            connection.getresponse().read()
+            latencies[index].append(time.perf_counter() - start)
+            sent += clients
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    all_latencies = np.concatenate([np.array(values) for values in latencies])
+    return all_latencies, len(all_latencies) / elapsed
+
+
+def run_benchmark(clients: int, seconds: float, max_batch_rows: int, max_latency_ms: float, n_estimators: int) -> None:
+    """
+    Runs the benchmark and prints the latency and throughput with micro-batching off and on.
+
+    Parameters
+    ----------
+    clients : int
+        The number of concurrent clients.
+
+    seconds : float
+        The duration of every load test.
+
+    max_batch_rows : int
+        The micro-batch size of the batching side.
+
+    max_latency_ms : float
+        The longest time a request waits in a micro-batch.
+
+    n_estimators : int
+        The number of trees of the model, which sets the fixed cost of a `predict` call.
+
+    Returns
+    -------
+    None : The function prints the results.
+    """
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.normal(size=(10000, 20)), columns=[f"f{i}" for i in range(20)])
+    outcome = (features["f0"] + features["f1"] * features["f2"] > 0).astype(int)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        model = RandomForestClassifier(n_estimators=n_estimators, max_depth=8, n_jobs=1, random_state=0).fit(features, outcome)
+        model_path = os.path.join(work_dir, "model")
+        mlflow.sklearn.save_model(model, model_path, serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE)
+        rows = features.iloc[:1000].to_numpy().tolist()
+
+        print(f"{clients} clients sending single-row requests for {seconds:g} s")
+        print(f"{'batching':>10}{'p50 ms':>10}{'p99 ms':>10}{'requests/s':>12}")
+        for name, batch_rows in [("off", 0), ("on", max_batch_rows)]:
+            port = free_port()
+            process = start_server(model_path, port, batch_rows, max_latency_ms)
+            try:
+                latencies, throughput = load_test(port, rows, clients, seconds)
+            finally:
+                process.terminate()
+                process.wait()
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            print(f"{name:>10}{p50:>10.2f}{p99:>10.2f}{throughput:>12,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32, help="Number of concurrent clients")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of every load test")
+    parser.add_argument("--max_batch_rows", type=int, default=64, help="Micro-batch size of the batching side")
+    parser.add_argument("--max_latency_ms", type=float, default=5.0, help="Longest time a request waits in a micro-batch")
+    parser.add_argument("--n_estimators", type=int, default=100, help="Number of trees of the model")
+    args = parser.parse_args()
+
+    run_benchmark(args.clients, args.seconds, args.max_batch_rows, args.max_latency_ms, args.n_estimators)
@@ -0,0 +1,89 @@
+"""
+Measures how evaluate_model throughput scales with the number of prediction workers.
+
+A random forest predicting on a single core is saved as an MLflow model and evaluated on
+a synthetic test set with 1, 2, 4, ... worker processes. Every run reports rows/sec and
+checks that its metrics match the single-process run exactly.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_parallel_prediction.py --rows 1000000 --max_workers 8
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import mlflow
+import mlflow.sklearn
+from sklearn.ensemble import RandomForestClassifier
+from components.classification.model_evaluator import evaluate_model
+
+
+def run_benchmark(rows: int, max_workers: int, batch_size: int) -> None:
+    """
+    Runs the benchmark and prints one result line per worker count.
+
+    Parameters
+    ----------
+    rows : int
+        The number of test rows.
+
+    max_workers : int
+        The largest number of worker processes, the counts are doubled from 1.
+
+    batch_size : int
+        The batch size of the streamed shards, or None for one shard per worker.
+
+    Returns
+    -------
+    None : The function prints the results and raises if the metrics differ.
+    """
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.normal(size=(rows, 20)), columns=[f"f{i}" for i in range(20)])
+    outcome = (features["f0"] + features["f1"] * features["f2"] + rng.normal(size=rows) > 0).astype(int)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Recent MLflow versions only keep the file store behind an opt-in
+        os.environ.setdefault("MLFLOW_ALLOW_FILE_STORE", "true")
+        mlflow.set_tracking_uri(f"file:{os.path.join(work_dir, 'mlruns')}")
+
+        train_rows = min(rows, 50000)
+        model = RandomForestClassifier(n_estimators=100, max_depth=12, n_jobs=1, random_state=0)
+        model.fit(features.iloc[:train_rows], outcome.iloc[:train_rows])
+        model_path = os.path.join(work_dir, "model")
+        mlflow.sklearn.save_model(model, model_path, serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE)
+
+        test_data_path = os.path.join(work_dir, "test_data")
+        os.makedirs(test_data_path)
+        features.assign(outcome=outcome).to_parquet(os.path.join(test_data_path, "test_data.parquet"), index=False)
+
+        print(f"{'workers':>8}{'seconds':>10}{'rows/sec':>14}{'speedup':>9}  metrics")
+        baseline = None
+        workers = 1
+        while workers <= max_workers:
+            result_file = os.path.join(work_dir, f"results_{workers}.json")
+            start = time.perf_counter()
+            evaluate_model("model", model_path, test_data_path, "outcome", result_file, batch_size=batch_size, num_workers=workers)
+            seconds = time.perf_counter() - start
+
+            with open(result_file) as f:
+                metrics = json.load(f)
+            if baseline is None:
+                baseline = (seconds, metrics)
+            matches = metrics == baseline[1]
+            print(f"{workers:>8}{seconds:>10.2f}{rows / seconds:>14,.0f}{baseline[0] / seconds:>9.2f}  {'match' if matches else 'MISMATCH'}")
+            if not matches:
+                raise AssertionError(f"Metrics with {workers} workers differ from the single-process run")
+            workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000, help="Number of test rows")
+    parser.add_argument("--max_workers", type=int, default=os.cpu_count(), help="Largest number of worker processes")
+    parser.add_argument("--batch_size", type=int, default=None, help="Stream shards of this many rows")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.max_workers, args.batch_size)
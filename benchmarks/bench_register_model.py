@@ -0,0 +1,111 @@
+"""
+Compares registering a model directory as it is with loading and logging the model again.
+
+A random forest ensemble is saved as an MLflow model and registered in a local MLflow file
+store twice: by the previous path, which loads the model and serialises it again with
+`mlflow.sklearn.log_model`, and by register_trained_model, which copies the model directory
+to the run artifacts. The aborted path, where the trained model is not the best, is timed
+too. Every side reports its wall time and the peak memory allocated by Python.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_register_model.py --n_estimators 500
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import mlflow
+import mlflow.sklearn
+from sklearn.ensemble import RandomForestClassifier
+from components.training.register_model import register_trained_model
+
+
+def timed(register) -> tuple:
+    """
+    Runs a registration, measuring its wall time and peak traced memory.
+
+    Parameters
+    ----------
+    register : callable
+        The registration, called without arguments.
+
+    Returns
+    -------
+    tuple : The wall time in seconds and the peak memory in MiB.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    register()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 2**20
+
+
+def run_benchmark(n_estimators: int, rows: int) -> None:
+    """
+    Runs the benchmark and prints the time and peak memory of every registration path.
+
+    Parameters
+    ----------
+    n_estimators : int
+        The number of trees of the ensemble, which sets the size of the model.
+
+    rows : int
+        The number of training rows.
+
+    Returns
+    -------
+    None : The function prints the results.
+    """
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(rows, 20))
+    outcome = (features[:, 0] + features[:, 1] * features[:, 2] + rng.normal(size=rows) > 0).astype(int)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Recent MLflow versions only keep the file store behind an opt-in
+        os.environ.setdefault("MLFLOW_ALLOW_FILE_STORE", "true")
+        mlflow.set_tracking_uri(f"file:{os.path.join(work_dir, 'mlruns')}")
+
+        model = RandomForestClassifier(n_estimators=n_estimators, n_jobs=-1, random_state=0).fit(features, outcome)
+        model_path = os.path.join(work_dir, "model")
+        mlflow.sklearn.save_model(model, model_path, serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE)
+        del model
+        model_bytes = sum(os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(model_path) for name in names)
+        print(f"Model directory of {model_bytes / 2**20:,.1f} MiB")
+
+        comparison_report = os.path.join(work_dir, "comparison_report.json")
+        register_report = os.path.join(work_dir, "register_report.txt")
+
+        def reserialise():
+            with mlflow.start_run():
+                mlflow.sklearn.log_model(
+                    sk_model=mlflow.sklearn.load_model(model_path),
+                    registered_model_name="reserialised",
+                    artifact_path="reserialised",
+                    serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE,
+                )
+
+        def register(best_model_id):
+            def run():
+                with open(comparison_report, "w") as f:
+                    json.dump({"best_model_id": best_model_id}, f)
+                register_trained_model(comparison_report, model_path, "copied", "trained", register_report)
+            return run
+
+        print(f"{'path':>12}{'seconds':>10}{'peak MiB':>10}")
+        for name, run in [("reserialise", reserialise), ("copy", register("trained")), ("aborted", register("champion"))]:
+            seconds, peak = timed(run)
+            print(f"{name:>12}{seconds:>10.2f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n_estimators", type=int, default=500, help="Number of trees of the ensemble")
+    parser.add_argument("--rows", type=int, default=50000, help="Number of training rows")
+    args = parser.parse_args()
+
+    run_benchmark(args.n_estimators, args.rows)
@@ -0,0 +1,63 @@
+"""
+Measures McNemar's test on packed correctness bits against the same test on boolean arrays.
+
+Both sides count the rows only one of two models predicts correctly. The packed side reads
+the bit arrays saved by evaluate_model, 8 rows per byte, through a popcount table.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_significance_test.py --rows 50000000
+"""
+import argparse
+import time
+import numpy as np
+from components.classification.classification_metrics import mcnemar_test
+
+
+def run_benchmark(rows: int, repeats: int) -> None:
+    """
+    Runs the benchmark and prints the best time of each side.
+
+    Parameters
+    ----------
+    rows : int
+        The number of test rows.
+
+    repeats : int
+        The number of timed runs of each side.
+
+    Returns
+    -------
+    None : The function prints the results and raises if the counts differ.
+    """
+    rng = np.random.default_rng(0)
+    correct_a = rng.random(rows) < 0.8
+    correct_b = np.where(rng.random(rows) < 0.05, rng.random(rows) < 0.85, correct_a)
+    packed_a, packed_b = np.packbits(correct_a), np.packbits(correct_b)
+
+    def boolean_counts():
+        return int((correct_a & ~correct_b).sum()), int((correct_b & ~correct_a).sum())
+
+    def packed_counts():
+        return mcnemar_test(packed_a, packed_b)[:2]
+
+    print(f"{rows:,} rows, {correct_a.nbytes / 2**20:,.1f} MiB as booleans, {packed_a.nbytes / 2**20:,.1f} MiB packed")
+    results = {}
+    for name, count in [("boolean", boolean_counts), ("packed", packed_counts)]:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results[name] = count()
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:>8}{best * 1000:>10.1f} ms  discordant rows {results[name]}")
+
+    if results["boolean"] != results["packed"]:
+        raise AssertionError("The packed and boolean counts differ")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000000, help="Number of test rows")
+    parser.add_argument("--repeats", type=int, default=5, help="Number of timed runs of each side")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.repeats)
@@ -0,0 +1,57 @@
+"""
+Measures the cost of a telemetry span and counter when the telemetry is disabled and enabled.
+
+The components call the spans and counters unconditionally, so their cost when disabled is
+the overhead every step pays without a telemetry configuration. The enabled side writes one
+JSON line per span to a temporary file.
+
+Usage (from the repository root):
+    PYTHONPATH=src python benchmarks/bench_telemetry_overhead.py --calls 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from components.common.telemetry import Telemetry
+
+
+def run_benchmark(calls: int) -> None:
+    """
+    Runs the benchmark and prints the time of a span and a counter on each side.
+
+    Parameters
+    ----------
+    calls : int
+        The number of timed spans and counters of each side.
+
+    Returns
+    -------
+    None : The function prints the results.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        sides = [
+            ("disabled", Telemetry("benchmark")),
+            ("enabled", Telemetry("benchmark", os.path.join(work_dir, "telemetry.jsonl"))),
+        ]
+        print(f"{'side':>10}{'span ns':>10}{'count ns':>10}")
+        for name, telemetry in sides:
+            start = time.perf_counter()
+            for _ in range(calls):
+                with telemetry.span("predict"):
+                    pass
+            span_ns = (time.perf_counter() - start) / calls * 1e9
+
+            start = time.perf_counter()
+            for _ in range(calls):
+                telemetry.count("rows", 1000)
+            count_ns = (time.perf_counter() - start) / calls * 1e9
+            telemetry.close()
+            print(f"{name:>10}{span_ns:>10.0f}{count_ns:>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=100000, help="Number of timed spans and counters of each side")
+    args = parser.parse_args()
+
+    run_benchmark(args.calls)
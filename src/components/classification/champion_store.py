@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Version of the stored evaluation results, entries with another version are stale
+CHAMPION_SCHEMA_VERSION = 1
+
+# Report entries naming artifact files saved next to the results
+ARTIFACT_KEYS = ["curves_file", "slices_file", "predictions_file"]
+
+
+def champion_key(model_name: str, model_version: str, test_fingerprint: str, params: dict = None) -> dict:
+    """
+    Builds the key of the stored evaluation results of a registered model.
+
+    Parameters
+    ----------
+    model_name : str
+        The name of the registered model.
+
+    model_version : str
+        The version of the registered model.
+
+    test_fingerprint : str
+        The fingerprint of the test data, see `components.common.hashing.hash_files` and
+        `components.common.hashing.hash_frame`.
+
+    params : dict, optional
+        The evaluation parameters changing the results, such as the outcome label and the
+        metric average.
+
+    Returns
+    -------
+    dict : The key.
+    """
+    return {
+        "model_name": model_name,
+        "model_version": str(model_version),
+        "test_fingerprint": test_fingerprint,
+        "params": params or {},
+    }
+
+
+def parse_model_uri(model_path: str) -> tuple:
+    """
+    Extracts the name and version of a registered model from an MLflow model URI.
+
+    Parameters
+    ----------
+    model_path : str
+        A 'models:/<name>/<version>' URI, or any other model path.
+
+    Returns
+    -------
+    tuple : The model name and version, or (None, None) for other paths.
+    """
+    if model_path and model_path.startswith("models:/"):
+        parts = model_path[len("models:/"):].split("/")
+        if len(parts) == 2 and parts[1].isdigit():
+            return parts[0], parts[1]
+    return None, None
+
+
+class LocalChampionMetricsStore:
+    """
+    Stores the evaluation results of registered models in a local directory so they are not
+    evaluated again.
+
+    An entry is found only for the same model name and version, the same test data and the
+    same evaluation parameters. Entries are also invalidated when their schema version
+    differs from `CHAMPION_SCHEMA_VERSION`, when they are older than the time to live, or
+    explicitly with `invalidate`.
+
+    Every entry is kept in its own folder of the directory, holding an `entry.json` with the
+    key, schema version, creation time and evaluation results next to copies of the artifact
+    files. Entries are written to a temporary folder first and renamed, so concurrent readers
+    never see partial entries.
+
+    Parameters
+    ----------
+    root : str
+        The directory of the store.
+
+    ttl_seconds : float, optional
+        The time to live of the entries. Defaults to None, which keeps them until invalidated.
+    """
+
+    def __init__(self, root: str, ttl_seconds: float = None):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_path(self, key: dict) -> str:
+        """
+        Builds the folder of the entry of a key.
+
+        Parameters
+        ----------
+        key : dict
+            The key, see `champion_key`.
+
+        Returns
+        -------
+        str : The path of the folder.
+        """
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest)
+
+    def _load_entry(self, entry_path: str) -> dict:
+        """
+        Loads an entry, removing it when it is stale or unreadable.
+
+        Parameters
+        ----------
+        entry_path : str
+            The folder of the entry.
+
+        Returns
+        -------
+        dict : The entry, or None when it is missing or invalid.
+        """
+        try:
+            with open(os.path.join(entry_path, "entry.json"), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        expired = self.ttl_seconds is not None and time.time() - entry.get("created_at", 0) > self.ttl_seconds
+        if entry.get("schema_version") != CHAMPION_SCHEMA_VERSION or expired:
+            shutil.rmtree(entry_path, ignore_errors=True)
+            return None
+        return entry
+
+    def get(self, key: dict, artifact_paths: dict = None) -> dict:
+        """
+        Looks up the evaluation results of a key, restoring their artifact files.
+
+        Parameters
+        ----------
+        key : dict
+            The key, see `champion_key`.
+
+        artifact_paths : dict, optional
+            Where to restore the artifact file of every entry of `ARTIFACT_KEYS`.
+
+        Returns
+        -------
+        dict : The evaluation results, or None when there is no valid entry.
+        """
+        entry_path = self._entry_path(key)
+        entry = self._load_entry(entry_path)
+        if entry is None or entry["key"] != key:
+            return None
+
+        metrics = entry["metrics"]
+        for artifact_key in ARTIFACT_KEYS:
+            if artifact_key in metrics:
+                target = (artifact_paths or {}).get(artifact_key)
+                if target is None:
+                    return None
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(os.path.join(entry_path, artifact_key), target)
+        return metrics
+
+    def put(self, key: dict, metrics: dict, artifact_paths: dict = None) -> None:
+        """
+        Stores the evaluation results of a key with their artifact files.
+
+        Parameters
+        ----------
+        key : dict
+            The key, see `champion_key`.
+
+        metrics : dict
+            The evaluation results.
+
+        artifact_paths : dict, optional
+            The artifact file of every entry of `ARTIFACT_KEYS` in the results.
+
+        Returns
+        -------
+        None : The function stores the entry.
+        """
+        staging_path = tempfile.mkdtemp(dir=self.root, prefix=".staging-")
+        try:
+            for artifact_key in ARTIFACT_KEYS:
+                if artifact_key in metrics:
+                    shutil.copyfile(artifact_paths[artifact_key], os.path.join(staging_path, artifact_key))
+            entry = {
+                "schema_version": CHAMPION_SCHEMA_VERSION,
+                "key": key,
+                "created_at": time.time(),
+                "metrics": metrics,
+            }
+            with open(os.path.join(staging_path, "entry.json"), "w") as f:
+                json.dump(entry, f, indent=4)
+
+            # Replace any previous entry of the key by the complete new one
+            entry_path = self._entry_path(key)
+            shutil.rmtree(entry_path, ignore_errors=True)
+            os.rename(staging_path, entry_path)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+    def invalidate(self, model_name: str = None) -> int:
+        """
+        Removes the entries of a model, or all of them.
+
+        Parameters
+        ----------
+        model_name : str, optional
+            The name of the registered model. Defaults to None, which removes all the entries.
+
+        Returns
+        -------
+        int : The number of removed entries.
+        """
+        removed = 0
+        for name in os.listdir(self.root):
+            entry_path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(entry_path):
+                continue
+            entry = self._load_entry(entry_path)
+            if entry is not None and model_name is not None and entry["key"]["model_name"] != model_name:
+                continue
+            shutil.rmtree(entry_path, ignore_errors=True)
+            removed += entry is not None
+        return removed
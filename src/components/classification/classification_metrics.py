@@ -0,0 +1,818 @@
+from __future__ import annotations
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from components.common.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# Supported ways of averaging the per-class metrics
+AVERAGES = ["binary", "micro", "macro", "weighted"]
+
+# Number of set bits of every byte value
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+# Largest number of discordant rows for which McNemar's test uses the exact binomial distribution
+MCNEMAR_EXACT_LIMIT = 1000
+
+
+class ConfusionCounts:
+    """
+    Accumulates a confusion matrix over batches of labels and predictions.
+
+    Labels are encoded into dense codes as they are seen, with a bincount-based encoding
+    for integer labels and a hash-based one otherwise, and every batch is counted with a
+    single bincount over `true_code * n_labels + predicted_code`. Counts from several
+    batches or processes can be merged, even when they have seen different labels.
+
+    Parameters
+    ----------
+    labels : list, optional
+        Labels to register upfront, e.g. [0, 1] so that a binary matrix is always 2x2.
+    """
+
+    def __init__(self, labels: list = None):
+        self.labels = []
+        self._codes = {}
+        self.matrix = np.zeros((0, 0), dtype=np.int64)
+        if labels is not None:
+            self._register(labels)
+            self._grow()
+
+    def _register(self, values) -> np.ndarray:
+        """
+        Looks up the code of every distinct label, registering the new ones.
+
+        Parameters
+        ----------
+        values : iterable
+            Distinct labels.
+
+        Returns
+        -------
+        np.ndarray : The code of every label.
+        """
+        codes = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            value = value.item() if isinstance(value, np.generic) else value
+            if value not in self._codes:
+                self._codes[value] = len(self.labels)
+                self.labels.append(value)
+            codes[i] = self._codes[value]
+        return codes
+
+    def _grow(self) -> None:
+        """
+        Pads the matrix with zeros for newly registered labels.
+
+        Returns
+        -------
+        None : The function resizes the matrix in place.
+        """
+        n_labels = len(self.labels)
+        if self.matrix.shape[0] < n_labels:
+            grown = np.zeros((n_labels, n_labels), dtype=np.int64)
+            grown[: self.matrix.shape[0], : self.matrix.shape[1]] = self.matrix
+            self.matrix = grown
+
+    def encode(self, values) -> np.ndarray:
+        """
+        Encodes labels into dense codes, registering the new labels.
+
+        Parameters
+        ----------
+        values : array-like
+            The labels to encode.
+
+        Returns
+        -------
+        np.ndarray : The code of every label.
+        """
+        values = np.asarray(values)
+        if len(values) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        if values.dtype.kind in "biu":
+            # Small integer ranges are encoded through a lookup table in linear time
+            values = values.astype(np.int64, copy=False)
+            low = int(values.min())
+            span = int(values.max()) - low + 1
+            if span <= 1 << 20:
+                offsets = values - low
+                present = np.flatnonzero(np.bincount(offsets, minlength=span))
+                lookup = np.zeros(span, dtype=np.int64)
+                lookup[present] = self._register(present + low)
+                return lookup[offsets]
+
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        return self._register(uniques)[codes]
+
+    def update(self, y_true, y_pred) -> tuple:
+        """
+        Adds a batch of labels and predictions to the matrix.
+
+        Parameters
+        ----------
+        y_true : array-like
+            The true labels.
+
+        y_pred : array-like
+            The predicted labels.
+
+        Returns
+        -------
+        tuple : The codes of the true and predicted labels of the batch.
+        """
+        true_codes = self.encode(y_true)
+        pred_codes = self.encode(y_pred)
+        if len(true_codes) != len(pred_codes):
+            raise ValueError(
+                f"Found {len(true_codes)} labels and {len(pred_codes)} predictions"
+            )
+        self._grow()
+
+        n_labels = len(self.labels)
+        counts = np.bincount(true_codes * n_labels + pred_codes, minlength=n_labels * n_labels)
+        self.matrix += counts.reshape(n_labels, n_labels)
+        return true_codes, pred_codes
+
+    def merge(self, other: "ConfusionCounts") -> "ConfusionCounts":
+        """
+        Adds the counts of another matrix, aligning the labels.
+
+        Parameters
+        ----------
+        other : ConfusionCounts
+            The counts to add.
+
+        Returns
+        -------
+        ConfusionCounts : This instance, for chaining.
+        """
+        codes = self._register(other.labels)
+        self._grow()
+        np.add.at(self.matrix, np.ix_(codes, codes), other.matrix)
+        return self
+
+    @property
+    def total(self) -> int:
+        """
+        The number of counted rows.
+        """
+        return int(self.matrix.sum())
+
+    def metrics(self, average: str = "binary", pos_label=1) -> dict:
+        """
+        Computes the classification metrics of the accumulated matrix.
+
+        Parameters
+        ----------
+        average : str, optional
+            How the per-class metrics are averaged, see `metrics_from_matrix`.
+
+        pos_label : optional
+            The positive label of the 'binary' average. The default is 1.
+
+        Returns
+        -------
+        dict : The metrics as floats.
+        """
+        return metrics_from_matrix(self.matrix, self.labels, average, pos_label)
+
+
+class SliceCounts(ConfusionCounts):
+    """
+    Accumulates the confusion matrix of every value of some slice columns besides the global one.
+
+    Every batch is counted per slice with a single bincount over
+    `slice_code * n_labels**2 + true_code * n_labels + predicted_code`, so the cost does not
+    depend on the number of slice values. The label codes are shared with the global matrix.
+
+    Parameters
+    ----------
+    columns : list of str
+        The columns whose values define the slices.
+
+    labels : list, optional
+        Labels to register up front, in this order.
+    """
+
+    def __init__(self, columns: list, labels: list = None):
+        super().__init__(labels)
+        self.columns = list(columns)
+        self.slice_values = {column: [] for column in self.columns}
+        self._slice_codes = {column: {} for column in self.columns}
+        n_labels = len(self.labels)
+        self.slice_matrices = {column: np.zeros((0, n_labels, n_labels), dtype=np.int64) for column in self.columns}
+
+    def _register_slices(self, column: str, values) -> np.ndarray:
+        """
+        Looks up the code of every distinct value of a slice column, registering the new ones.
+
+        Parameters
+        ----------
+        column : str
+            The slice column.
+
+        values : iterable
+            Distinct values, missing values all map to the same None slice.
+
+        Returns
+        -------
+        np.ndarray : The code of every value.
+        """
+        codes = np.empty(len(values), dtype=np.int64)
+        known = self._slice_codes[column]
+        for i, value in enumerate(values):
+            value = None if pd.isna(value) else value.item() if isinstance(value, np.generic) else value
+            if value not in known:
+                known[value] = len(self.slice_values[column])
+                self.slice_values[column].append(value)
+            codes[i] = known[value]
+        return codes
+
+    def _grow_slices(self) -> None:
+        """
+        Pads the slice matrices with zeros for new slice values and labels.
+
+        Returns
+        -------
+        None : The function resizes the matrices in place.
+        """
+        n_labels = len(self.labels)
+        for column, matrix in self.slice_matrices.items():
+            n_slices = len(self.slice_values[column])
+            if matrix.shape != (n_slices, n_labels, n_labels):
+                grown = np.zeros((n_slices, n_labels, n_labels), dtype=np.int64)
+                grown[: matrix.shape[0], : matrix.shape[1], : matrix.shape[2]] = matrix
+                self.slice_matrices[column] = grown
+
+    def update(self, y_true, y_pred, slices=None) -> tuple:
+        """
+        Adds a batch of labels and predictions to the global and slice matrices.
+
+        Parameters
+        ----------
+        y_true : array-like
+            The true labels.
+
+        y_pred : array-like
+            The predicted labels.
+
+        slices : pd.DataFrame
+            The slice columns of the batch rows.
+
+        Returns
+        -------
+        tuple : The codes of the true and predicted labels of the batch.
+        """
+        true_codes, pred_codes = super().update(y_true, y_pred)
+        n_labels = len(self.labels)
+        cell_codes = true_codes * n_labels + pred_codes
+
+        slice_codes = {}
+        for column in self.columns:
+            codes, uniques = pd.factorize(slices[column], use_na_sentinel=False)
+            slice_codes[column] = self._register_slices(column, uniques)[codes]
+        self._grow_slices()
+
+        for column, codes in slice_codes.items():
+            matrix = self.slice_matrices[column]
+            counts = np.bincount(codes * n_labels * n_labels + cell_codes, minlength=matrix.size)
+            matrix += counts.reshape(matrix.shape)
+        return true_codes, pred_codes
+
+    def merge(self, other: "SliceCounts") -> "SliceCounts":
+        """
+        Adds the counts of another instance, aligning the labels and slice values.
+
+        Parameters
+        ----------
+        other : SliceCounts
+            The counts to add, with the same slice columns.
+
+        Returns
+        -------
+        SliceCounts : This instance, for chaining.
+        """
+        codes = self._register(other.labels)
+        self._grow()
+        np.add.at(self.matrix, np.ix_(codes, codes), other.matrix)
+
+        slice_codes = {column: self._register_slices(column, other.slice_values[column]) for column in self.columns}
+        self._grow_slices()
+        for column, matrix in self.slice_matrices.items():
+            np.add.at(matrix, np.ix_(slice_codes[column], codes, codes), other.slice_matrices[column])
+        return self
+
+    def slice_table(self, average: str = "binary", pos_label=1) -> pd.DataFrame:
+        """
+        Computes the metrics of every slice in one vectorised pass per slice column.
+
+        Parameters
+        ----------
+        average : str, optional
+            How the per-class metrics are averaged, see `metrics_from_matrix`.
+
+        pos_label : optional
+            The positive label of the 'binary' average. The default is 1.
+
+        Returns
+        -------
+        pd.DataFrame : One row per slice with its column, value, number of rows and metrics.
+        """
+        self._grow_slices()
+        tables = []
+        for column, matrix in self.slice_matrices.items():
+            metrics = metrics_from_matrix(matrix, self.labels, average, pos_label)
+            tables.append(pd.DataFrame({
+                "slice_column": column,
+                "slice_value": pd.Series(self.slice_values[column], dtype=object),
+                "rows": matrix.sum(axis=(1, 2)),
+                **metrics,
+            }))
+        return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    Divides element-wise, returning 0 where the denominator is 0 like scikit-learn does.
+
+    Parameters
+    ----------
+    numerator : np.ndarray
+        The numerators.
+
+    denominator : np.ndarray
+        The denominators.
+
+    Returns
+    -------
+    np.ndarray : The quotients.
+    """
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape), where=denominator != 0)
+
+
+def metrics_from_matrix(matrix: np.ndarray, labels: list, average: str = "binary", pos_label=1) -> dict:
+    """
+    Computes accuracy, precision, recall, F1, FPR and FNR from confusion matrices.
+
+    All the metrics come from the same per-class true/false positive/negative counts. The
+    matrix rows are the true labels and the columns the predicted ones. Leading dimensions
+    are treated as a stack of matrices (e.g. bootstrap resamples or slices) and are kept in
+    the results.
+
+    Parameters
+    ----------
+    matrix : np.ndarray
+        A (..., K, K) array of counts.
+
+    labels : list
+        The K labels of the matrix.
+
+    average : str, optional
+        'binary' reports the metrics of `pos_label`, 'micro' pools the counts of all classes,
+        'macro' averages the per-class metrics and 'weighted' averages them weighted by the
+        number of true rows of every class. The default is 'binary'.
+
+    pos_label : optional
+        The positive label of the 'binary' average. The default is 1. A ValueError is raised
+        when it is not one of two or more labels, e.g. with string labels.
+
+    Returns
+    -------
+    dict : The metrics, as floats for a single matrix or arrays for a stack of matrices.
+    """
+    if average not in AVERAGES:
+        raise ValueError(f"Unknown average '{average}', expected one of {AVERAGES}")
+
+    matrix = np.asarray(matrix, dtype=np.int64)
+    total = matrix.sum(axis=(-2, -1))
+    tp = np.diagonal(matrix, axis1=-2, axis2=-1)
+    support = matrix.sum(axis=-1)
+    predicted = matrix.sum(axis=-2)
+    fp = predicted - tp
+    fn = support - tp
+    tn = total[..., None] - tp - fp - fn
+
+    accuracy = _divide(tp.sum(axis=-1), total)
+
+    if average == "binary":
+        if pos_label in labels:
+            index = labels.index(pos_label)
+            tp, fp, fn, tn = tp[..., index], fp[..., index], fn[..., index], tn[..., index]
+        elif len(labels) > 1:
+            # Like scikit-learn, a positive label missing from two or more labels is an error
+            raise ValueError(f"pos_label={pos_label!r} is not a valid label. It should be one of {labels}")
+        else:
+            # A single label other than the positive one has no positives
+            tp = fp = fn = np.zeros_like(total)
+            tn = total
+    elif average == "micro":
+        tp, fp, fn, tn = tp.sum(axis=-1), fp.sum(axis=-1), fn.sum(axis=-1), tn.sum(axis=-1)
+
+    metrics = {
+        "accuracy": accuracy,
+        "recall": _divide(tp, tp + fn),
+        "precision": _divide(tp, tp + fp),
+        "f1_score": _divide(2 * tp, 2 * tp + fp + fn),
+        "fpr": _divide(fp, fp + tn),
+        "fnr": _divide(fn, fn + tp),
+    }
+
+    if average in ("macro", "weighted"):
+        if average == "macro":
+            weights = np.full(support.shape, 1 / max(support.shape[-1], 1))
+        else:
+            weights = _divide(support, support.sum(axis=-1, keepdims=True))
+        metrics = {
+            name: value if name == "accuracy" else (value * weights).sum(axis=-1)
+            for name, value in metrics.items()
+        }
+
+    if matrix.ndim == 2:
+        return {name: float(value) for name, value in metrics.items()}
+    return metrics
+
+
+def bootstrap_intervals(matrix: np.ndarray, labels: list, average: str = "binary", pos_label=1,
+                        n_resamples: int = 1000, confidence_level: float = 0.95, seed: int = 42,
+                        block_size: int = 256, max_workers: int = None) -> dict:
+    """
+    Computes percentile bootstrap confidence intervals of the metrics of a confusion matrix.
+
+    Resampling the rows with replacement only changes how many rows fall in every cell of the
+    confusion matrix, so every resample is drawn as multinomial counts over the K x K cells
+    and the predictions are never repeated. The resamples are drawn and evaluated in blocks
+    of `block_size` stacked matrices on a thread pool, which bounds the memory to a few
+    blocks, and every block has its own seed so the intervals do not depend on the number
+    of threads.
+
+    Parameters
+    ----------
+    matrix : np.ndarray
+        A (K, K) array of counts.
+
+    labels : list
+        The K labels of the matrix.
+
+    average : str, optional
+        How the per-class metrics are averaged, see `metrics_from_matrix`.
+
+    pos_label : optional
+        The positive label of the 'binary' average. The default is 1.
+
+    n_resamples : int, optional
+        The number of bootstrap resamples. The default is 1000.
+
+    confidence_level : float, optional
+        The probability covered by the intervals. The default is 0.95.
+
+    seed : int, optional
+        The seed of the resampling. The default is 42.
+
+    block_size : int, optional
+        The number of resamples drawn and evaluated together. The default is 256.
+
+    max_workers : int, optional
+        The number of threads evaluating blocks. Defaults to None, which lets the thread
+        pool pick its size.
+
+    Returns
+    -------
+    dict : The lower and upper bounds of every metric, as {"lower": float, "upper": float}.
+    """
+    matrix = np.asarray(matrix, dtype=np.int64)
+    total = int(matrix.sum())
+    if total == 0:
+        raise ValueError("Cannot bootstrap an empty confusion matrix")
+
+    probabilities = matrix.ravel() / total
+    block_sizes = [min(block_size, n_resamples - start) for start in range(0, n_resamples, block_size)]
+    block_seeds = np.random.SeedSequence(seed).spawn(len(block_sizes))
+
+    def evaluate_block(size, block_seed):
+        rng = np.random.default_rng(block_seed)
+        resamples = rng.multinomial(total, probabilities, size=size).reshape(size, *matrix.shape)
+        return metrics_from_matrix(resamples, labels, average, pos_label)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        blocks = list(executor.map(evaluate_block, block_sizes, block_seeds))
+
+    alpha = (1 - confidence_level) / 2
+    intervals = {}
+    for name in blocks[0]:
+        lower, upper = np.quantile(np.concatenate([block[name] for block in blocks]), [alpha, 1 - alpha])
+        intervals[name] = {"lower": float(lower), "upper": float(upper)}
+    return intervals
+
+
+def threshold_curves(y_true, scores, grid_size: int = 101) -> dict:
+    """
+    Computes the ROC and precision-recall curves of binary scores from a single sort.
+
+    The scores are sorted once in descending order and the true and false positives at every
+    distinct score are cumulative sums over the sorted labels. The curves, the area under
+    the ROC curve and the average precision follow in linear time, and the metrics at a grid
+    of thresholds are looked up in the sorted scores with a binary search.
+
+    Parameters
+    ----------
+    y_true : array-like of bool
+        Whether every row belongs to the positive class.
+
+    scores : array-like of float
+        The predicted probability of the positive class of every row.
+
+    grid_size : int, optional
+        The number of evenly spaced thresholds in [0, 1] at which the metrics are computed.
+        A row is predicted positive when its score is at least the threshold. The default is 101.
+
+    Returns
+    -------
+    dict : The 'roc_auc' and 'average_precision' floats, the curve arrays 'thresholds',
+        'fpr', 'tpr', 'precision' and 'recall', the 'operating_thresholds', 'operating_fpr'
+        and 'operating_tpr' arrays searched by `tpr_at_fpr`, and the 'grid_thresholds' with
+        the 'grid_<metric>' arrays of every metric of `metrics_from_matrix`.
+    """
+    y_true = np.asarray(y_true, dtype=bool)
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(y_true) != len(scores):
+        raise ValueError(f"Found {len(y_true)} labels and {len(scores)} scores")
+
+    order = np.argsort(scores, kind="stable")[::-1]
+    sorted_scores = scores[order]
+    tps_all = np.cumsum(y_true[order], dtype=np.int64)
+    fps_all = np.arange(1, len(scores) + 1, dtype=np.int64) - tps_all
+    positives = int(tps_all[-1]) if len(scores) else 0
+    negatives = len(scores) - positives
+
+    # Keep the last row of every run of equal scores, with the origin in front
+    distinct = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(scores) - 1] if len(scores) else np.empty(0, dtype=np.int64)
+    tps = np.r_[0, tps_all[distinct]]
+    fps = np.r_[0, fps_all[distinct]]
+    thresholds = np.r_[np.inf, sorted_scores[distinct]]
+
+    tpr = _divide(tps, positives)
+    fpr = _divide(fps, negatives)
+    precision = np.r_[1.0, _divide(tps[1:], tps[1:] + fps[1:])]
+    roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)) if positives and negatives else 0.0
+    average_precision = float(np.sum(np.diff(tpr) * precision[1:])) if positives else 0.0
+
+    # The best operating point within a false positive budget is the last one with its number
+    # of false positives. These points are kept apart because tied scores can put real
+    # thresholds on a straight segment of the curves.
+    operating = np.r_[fps[1:] != fps[:-1], True]
+
+    # Drop the points lying on a straight segment, they do not change the curves
+    corners = np.r_[True, np.logical_or(np.diff(fps, 2) != 0, np.diff(tps, 2) != 0), True] if len(tps) > 2 else np.ones(len(tps), dtype=bool)
+
+    # Rows predicted positive at every grid threshold, i.e. with a score at least the threshold
+    grid_thresholds = np.linspace(0, 1, grid_size)
+    predicted = np.searchsorted(-sorted_scores, -grid_thresholds, side="right")
+    grid_tp = np.where(predicted > 0, tps_all[np.maximum(predicted - 1, 0)], 0) if len(scores) else np.zeros(grid_size, dtype=np.int64)
+    grid_fp = predicted - grid_tp
+    grid_matrix = np.stack([
+        np.stack([negatives - grid_fp, grid_fp], axis=-1),
+        np.stack([positives - grid_tp, grid_tp], axis=-1),
+    ], axis=-2)
+    grid_metrics = metrics_from_matrix(grid_matrix, [0, 1])
+
+    return {
+        "roc_auc": roc_auc,
+        "average_precision": average_precision,
+        "thresholds": thresholds[corners],
+        "fpr": fpr[corners],
+        "tpr": tpr[corners],
+        "precision": precision[corners],
+        "recall": tpr[corners],
+        "operating_thresholds": thresholds[operating],
+        "operating_fpr": fpr[operating],
+        "operating_tpr": tpr[operating],
+        "grid_thresholds": grid_thresholds,
+        **{f"grid_{name}": value for name, value in grid_metrics.items()},
+    }
+
+
+def save_curves(file_path: str, curves: dict) -> None:
+    """
+    Saves the curves of `threshold_curves` to a compressed NumPy archive.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the .npz file.
+
+    curves : dict
+        The curves and their summary floats.
+
+    Returns
+    -------
+    None : The function writes the archive.
+    """
+    with open(file_path, "wb") as curves_file:
+        np.savez_compressed(curves_file, **curves)
+
+
+def load_curves(file_path: str) -> dict:
+    """
+    Loads the curves saved by `save_curves`.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the .npz file.
+
+    Returns
+    -------
+    dict : The curve arrays, with the summary values as floats.
+    """
+    with np.load(file_path) as archive:
+        return {name: archive[name].item() if archive[name].ndim == 0 else archive[name] for name in archive.files}
+
+
+def tpr_at_fpr(curves: dict, max_fpr: float) -> tuple:
+    """
+    Finds the operating point with the highest true positive rate within a false positive budget.
+
+    The search runs on every threshold of the operating arrays of the curves. Curves saved
+    without them are searched on their corners.
+
+    Parameters
+    ----------
+    curves : dict
+        The curves of `threshold_curves` or `load_curves`.
+
+    max_fpr : float
+        The highest acceptable false positive rate.
+
+    Returns
+    -------
+    tuple : The true positive rate, false positive rate and score threshold of the operating point.
+    """
+    prefix = "operating_" if "operating_fpr" in curves else ""
+    fpr, tpr, thresholds = curves[f"{prefix}fpr"], curves[f"{prefix}tpr"], curves[f"{prefix}thresholds"]
+    within = np.flatnonzero(fpr <= max_fpr)
+    best = within[np.argmax(tpr[within])]
+    return float(tpr[best]), float(fpr[best]), float(thresholds[best])
+
+
+def save_correctness(file_path: str, correct, labels_digest: str) -> None:
+    """
+    Saves whether every test row is predicted correctly as a packed bit array.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the .npz file.
+
+    correct : array-like of bool
+        Whether every row is predicted correctly, in test data order.
+
+    labels_digest : str
+        A digest of the test labels in row order, to check that two files cover the same rows.
+
+    Returns
+    -------
+    None : The function writes the file.
+    """
+    correct = np.asarray(correct, dtype=bool)
+    with open(file_path, "wb") as correctness_file:
+        np.savez(correctness_file, correct=np.packbits(correct), rows=len(correct), labels_digest=labels_digest)
+
+
+class PackedCorrectness:
+    """
+    Accumulates whether the test rows are predicted correctly, batch by batch, as packed bits.
+
+    Only whole bytes of bits are packed, the few rows left over wait for the next batch, so
+    the packed bytes of all the batches are the bytes of `np.packbits` over all the rows. The
+    labels are folded into a sha256 digest as they come, so no per-row array is kept.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self._packed = []
+        self._pending = np.zeros(0, dtype=bool)
+        self._labels_digest = hashlib.sha256()
+
+    def update(self, correct, label_hashes) -> None:
+        """
+        Adds the rows of a batch.
+
+        Parameters
+        ----------
+        correct : array-like of bool
+            Whether every row of the batch is predicted correctly, in test data order.
+
+        label_hashes : np.ndarray
+            A hash of the label of every row of the batch, in the same order.
+
+        Returns
+        -------
+        None : The function updates the bits and the digest.
+        """
+        bits = np.concatenate([self._pending, np.asarray(correct, dtype=bool)])
+        whole = len(bits) - len(bits) % 8
+        if whole:
+            self._packed.append(np.packbits(bits[:whole]))
+        self._pending = bits[whole:]
+        self.rows += len(correct)
+        self._labels_digest.update(np.ascontiguousarray(label_hashes).tobytes())
+
+    @property
+    def labels_digest(self) -> str:
+        """
+        str : The hex digest of the labels of all the rows.
+        """
+        return self._labels_digest.hexdigest()
+
+    def packed(self) -> np.ndarray:
+        """
+        Packs the bits of all the rows.
+
+        Returns
+        -------
+        np.ndarray : The bytes of `np.packbits` over the correctness of all the rows.
+        """
+        return np.concatenate(self._packed + [np.packbits(self._pending)])
+
+    def save(self, file_path: str) -> None:
+        """
+        Saves the correctness in the format of `save_correctness`.
+
+        Parameters
+        ----------
+        file_path : str
+            Path of the .npz file.
+
+        Returns
+        -------
+        None : The function writes the file.
+        """
+        with open(file_path, "wb") as correctness_file:
+            np.savez(correctness_file, correct=self.packed(), rows=self.rows, labels_digest=self.labels_digest)
+
+
+def load_correctness(file_path: str) -> tuple:
+    """
+    Loads the per-row correctness saved by `save_correctness`.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the .npz file.
+
+    Returns
+    -------
+    tuple : The packed correctness bits, the number of rows and the digest of the labels.
+    """
+    with np.load(file_path) as archive:
+        return archive["correct"], int(archive["rows"]), str(archive["labels_digest"])
+
+
+def mcnemar_test(correct_a: np.ndarray, correct_b: np.ndarray) -> tuple:
+    """
+    Tests whether two models evaluated on the same rows have different error rates.
+
+    Only the rows where one model is right and the other wrong carry information. They are
+    counted on the packed correctness bits with a byte popcount table, so millions of rows
+    take milliseconds. The two-sided p-value is exact for up to `MCNEMAR_EXACT_LIMIT`
+    discordant rows and uses the continuity-corrected chi-square approximation above.
+
+    Parameters
+    ----------
+    correct_a : np.ndarray
+        The packed correctness bits of the first model, see `save_correctness`.
+
+    correct_b : np.ndarray
+        The packed correctness bits of the second model.
+
+    Returns
+    -------
+    tuple : The number of rows only the first model gets right, the number of rows only
+        the second one gets right, and the p-value.
+    """
+    correct_a = np.asarray(correct_a, dtype=np.uint8)
+    correct_b = np.asarray(correct_b, dtype=np.uint8)
+    if correct_a.shape != correct_b.shape:
+        raise ValueError(f"Found {correct_a.size} and {correct_b.size} bytes of correctness bits")
+
+    # The padding bits of the last byte are zero in both arrays and never counted
+    only_a = int(POPCOUNT[correct_a & ~correct_b].sum(dtype=np.int64))
+    only_b = int(POPCOUNT[correct_b & ~correct_a].sum(dtype=np.int64))
+    discordant = only_a + only_b
+    if discordant == 0:
+        return only_a, only_b, 1.0
+
+    if discordant <= MCNEMAR_EXACT_LIMIT:
+        # Twice the binomial tail of the smaller count with probability 1/2
+        tail = sum(math.comb(discordant, k) for k in range(min(only_a, only_b) + 1))
+        p_value = min(1.0, 2 * tail / 2 ** discordant)
+    else:
+        statistic = (abs(only_a - only_b) - 1) ** 2 / discordant
+        p_value = math.erfc(math.sqrt(statistic / 2))
+    return only_a, only_b, p_value
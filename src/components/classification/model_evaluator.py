@@ -1,13 +1,297 @@
+from __future__ import annotations
 import argparse
-import glob
 import json
 import os
-import pandas as pd
-import mlflow
-from mlflow.sklearn import load_model
-from sklearn.metrics import accuracy_score, precision_score, recall_score
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urlparse
+import numpy as np
+from components.classification.classification_metrics import AVERAGES, ConfusionCounts, PackedCorrectness, SliceCounts, bootstrap_intervals, save_curves, threshold_curves
+from components.classification.champion_store import ARTIFACT_KEYS, LocalChampionMetricsStore, champion_key, parse_model_uri
+from components.common.data_loader import find_dataset_files, iter_dataset_chunks, read_dataset_files
+from components.common.hashing import hash_files, hash_frame
+from components.common.lazy_import import lazy_import
+from components.common.step_cache import StepCache
+from components.common.telemetry import Telemetry
 
-def evaluate_model(model_id:str, model_path:str, test_data_path:str, outcome_label:str, result_file:str)->None:
+mlflow = lazy_import("mlflow")
+mlflow_sklearn = lazy_import("mlflow.sklearn")
+pd = lazy_import("pandas")
+
+def load_model(model_uri:str):
+    """
+    Loads a scikit-learn model saved with MLflow, importing mlflow only when a model is loaded.
+
+    Parameters
+    ----------
+    model_uri : str
+        The path or MLflow URI of the model.
+
+    Returns
+    -------
+    object : The model.
+    """
+    return mlflow_sklearn.load_model(model_uri)
+
+def is_local_path(model_path:str)->bool:
+    """
+    Tells whether a model path is a local path rather than an MLflow URI such as 'models:/<name>/<version>'.
+
+    Parameters
+    ----------
+    model_path : str
+        The path or MLflow URI of the model.
+
+    Returns
+    -------
+    bool : True for local paths, including Windows drive paths.
+    """
+    return len(urlparse(model_path).scheme) <= 1
+
+def build_metrics(model_id:str, counts:ConfusionCounts, average:str='binary', pos_label=1)->dict:
+    """
+    Builds the evaluation report of a model from its confusion counts.
+
+    Parameters
+    ----------
+    model_id : str
+        Identifier for the model being evaluated.
+
+    counts : ConfusionCounts
+        The confusion counts of the model on the test data.
+
+    average : str, optional
+        How the per-class metrics are averaged, see `metrics_from_matrix`.
+
+    pos_label : int or str, optional
+        The positive label of the binary metrics. Defaults to 1.
+
+    Returns
+    -------
+    dict : The metrics, followed by the labels and the confusion matrix they come from.
+    """
+    return {
+        "model_id": model_id,
+        **counts.metrics(average, pos_label),
+        "average": average,
+        "labels": counts.labels,
+        "confusion_matrix": counts.matrix.tolist(),
+    }
+
+def new_counts(slice_columns:list=None)->ConfusionCounts:
+    """
+    Creates empty confusion counts, sliced by some columns of the test data when they are given.
+
+    Parameters
+    ----------
+    slice_columns : list of str, optional
+        The columns whose values define the slices.
+
+    Returns
+    -------
+    ConfusionCounts : The empty counts.
+    """
+    return SliceCounts(slice_columns) if slice_columns else ConfusionCounts()
+
+def predict_batch(model, batch, outcome_label:str, counts:ConfusionCounts, threshold_sweep:bool=False, keep_correct:bool=False, pos_label=1)->dict:
+    """
+    Predicts a batch of the test data and adds it to the confusion counts.
+
+    Parameters
+    ----------
+    model : sklearn estimator
+        The trained model.
+
+    batch : pd.DataFrame
+        The test rows, including the outcome label column.
+
+    outcome_label : str
+        The column name in the test data that contains the true labels.
+
+    counts : ConfusionCounts
+        The confusion counts updated with the batch, the slices are taken from the batch
+        columns when they are `SliceCounts`.
+
+    threshold_sweep : bool, optional
+        When set, `predict_proba` is called instead of `predict` and the labels are the
+        classes with the highest probability, as `predict` would return them.
+
+    keep_correct : bool, optional
+        When set, whether every row is predicted correctly is returned with a hash of its label.
+
+    pos_label : int or str, optional
+        The class whose probability is the score of the threshold sweep, a ValueError is
+        raised when the model has no such class. Defaults to 1.
+
+    Returns
+    -------
+    dict : The per-row arrays of the batch: 'positives' and 'scores', whether every row is
+        positive and its positive class probability, when `threshold_sweep` is set, and
+        'correct' and 'label_hashes' when `keep_correct` is set, to be folded into a
+        `PackedCorrectness` rather than kept.
+    """
+    X_batch = batch.drop(outcome_label, axis=1)
+    y_batch = batch[outcome_label]
+    if threshold_sweep:
+        positive_column = np.flatnonzero(model.classes_ == pos_label)
+        if not len(positive_column):
+            # Like metrics_from_matrix, a positive label the model cannot predict is an error
+            raise ValueError(f"pos_label={pos_label!r} is not a valid label. It should be one of {list(model.classes_)}")
+        # Predict the probabilities once and derive the hard labels from them
+        probabilities = model.predict_proba(X_batch)
+        y_pred = model.classes_[probabilities.argmax(axis=1)]
+    else:
+        y_pred = model.predict(X_batch)
+
+    if isinstance(counts, SliceCounts):
+        true_codes, pred_codes = counts.update(y_batch, y_pred, batch)
+    else:
+        true_codes, pred_codes = counts.update(y_batch, y_pred)
+
+    kept = {}
+    if threshold_sweep:
+        kept["positives"] = y_batch.to_numpy() == pos_label
+        kept["scores"] = probabilities[:, positive_column[0]]
+    if keep_correct:
+        kept["correct"] = true_codes == pred_codes
+        kept["label_hashes"] = pd.util.hash_pandas_object(y_batch, index=False).to_numpy()
+    return kept
+
+def collect_batch(batch_kept:dict, kept:list, correctness:PackedCorrectness=None)->None:
+    """
+    Folds the per-row correctness of a batch into the packed bits and keeps its other arrays.
+
+    Parameters
+    ----------
+    batch_kept : dict
+        The per-row arrays of `predict_batch`.
+
+    kept : list of dict
+        The positives and scores of the batches, appended to when the batch has them.
+
+    correctness : PackedCorrectness, optional
+        The correctness of the previous batches, updated when the batch has its correctness.
+
+    Returns
+    -------
+    None : The function updates `kept` and `correctness`.
+    """
+    if correctness is not None:
+        correctness.update(batch_kept.pop("correct"), batch_kept.pop("label_hashes"))
+    if batch_kept:
+        kept.append(batch_kept)
+
+# Model loaded once by every prediction worker process
+_worker_model = None
+
+def _init_prediction_worker(model_path:str)->None:
+    """
+    Loads the model once in a prediction worker process.
+
+    Parameters
+    ----------
+    model_path : str
+        Path to the trained model file.
+
+    Returns
+    -------
+    None : The function stores the model for the worker's shards.
+    """
+    global _worker_model
+    _worker_model = load_model(model_path)
+
+def _predict_shard(shard, outcome_label:str, threshold_sweep:bool=False, slice_columns:list=None, keep_correct:bool=False, pos_label=1)->tuple:
+    """
+    Predicts a shard of the test data in a worker process and counts the outcomes.
+
+    Parameters
+    ----------
+    shard : pd.DataFrame
+        The test rows, including the outcome label column.
+
+    outcome_label : str
+        The column name in the test data that contains the true labels.
+
+    threshold_sweep : bool, optional
+        When set, the positive class probabilities are returned as well, see `predict_batch`.
+
+    slice_columns : list of str, optional
+        The columns whose values define the slices of the counts.
+
+    keep_correct : bool, optional
+        When set, the per-row correctness is returned as well, see `predict_batch`.
+
+    pos_label : int or str, optional
+        The class whose probability is the score of the threshold sweep. Defaults to 1.
+
+    Returns
+    -------
+    tuple : The confusion counts of the shard and the per-row arrays of `predict_batch`.
+    """
+    counts = new_counts(slice_columns)
+    kept = predict_batch(_worker_model, shard, outcome_label, counts, threshold_sweep, keep_correct, pos_label)
+    return counts, kept
+
+def parallel_confusion_counts(model_path:str, shards, outcome_label:str, num_workers:int, threshold_sweep:bool=False, slice_columns:list=None, correctness:PackedCorrectness=None, pos_label=1)->tuple:
+    """
+    Predicts shards of the test data on a process pool and merges their confusion counts.
+
+    Every worker loads the model once. At most two shards per worker are in flight, so
+    streamed shards are not read faster than they are predicted.
+
+    Parameters
+    ----------
+    model_path : str
+        Path to the trained model file.
+
+    shards : iterable of pd.DataFrame
+        The test rows, including the outcome label column.
+
+    outcome_label : str
+        The column name in the test data that contains the true labels.
+
+    num_workers : int
+        The number of worker processes.
+
+    threshold_sweep : bool, optional
+        When set, the positive class probabilities of the shards are collected as well.
+
+    slice_columns : list of str, optional
+        The columns whose values define the slices of the counts.
+
+    correctness : PackedCorrectness, optional
+        When set, the per-row correctness of the shards is added to it in shard order.
+
+    pos_label : int or str, optional
+        The class whose probability is the score of the threshold sweep. Defaults to 1.
+
+    Returns
+    -------
+    tuple : The confusion counts of all the shards and the list of the shards' positives
+        and scores of `predict_batch` in shard order.
+    """
+    counts = new_counts(slice_columns)
+    kept = []
+    keep_correct = correctness is not None
+
+    def merge(shard_result):
+        shard_counts, shard_kept = shard_result
+        counts.merge(shard_counts)
+        collect_batch(shard_kept, kept, correctness)
+
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_prediction_worker, initargs=(model_path,)) as executor:
+        pending = deque()
+        for shard in shards:
+            if len(pending) >= 2 * num_workers:
+                merge(pending.popleft().result())
+            pending.append(executor.submit(_predict_shard, shard, outcome_label, threshold_sweep, slice_columns, keep_correct, pos_label))
+        while pending:
+            merge(pending.popleft().result())
+
+    return counts, kept
+
+def evaluate_model(model_id:str, model_path:str, test_data_path:str, outcome_label:str, result_file:str, max_workers:int=None, batch_size:int=None, num_workers:int=None, average:str='binary', threshold_grid_size:int=None, curves_file:str=None, bootstrap_resamples:int=None, confidence_level:float=0.95, seed:int=42, slice_columns:list=None, slices_file:str=None, predictions_file:str=None, champion_store:str=None, model_name:str=None, model_version:str=None, champion_ttl:float=None, test_data:pd.DataFrame=None, pos_label=1, run_id:str=None)->None:
     """
     Evaluate a machine learning model on test data and save the evaluation metrics.
     
@@ -20,33 +304,130 @@ def evaluate_model(model_id:str, model_path:str, test_data_path:str, outcome_lab
         Path to the trained model file.
 
     test_data_path : str 
-        Directory path containing test data CSV files.
+        Directory path containing test data CSV, parquet or feather files. The format is
+        detected from the file extensions.
     
     outcome_label : str
         The column name in the test data that contains the true labels.
     
     result_file : str
         Path to the file where evaluation metrics will be saved.
+
+    max_workers : int, optional
+        Number of threads reading the test data files concurrently.
+        Defaults to None, which lets the thread pool pick its size.
+
+    batch_size : int, optional
+        When set, the test data is streamed and predicted in batches of this many rows and
+        only the confusion counts are kept between batches, so peak memory is bounded by the
+        batch size. The metrics are identical to the full-batch evaluation.
+        Defaults to None, which predicts the whole test dataset at once.
+
+    num_workers : int, optional
+        When greater than 1, the test data is sharded across this many worker processes,
+        each loading the model once, and their confusion counts are merged. The shards are
+        the batches when `batch_size` is set, otherwise one contiguous shard per worker.
+        The metrics are identical to the single-process evaluation.
+        Defaults to None, which predicts in the current process.
+
+    average : str, optional
+        How the per-class metrics are averaged: 'binary' reports the metrics of `pos_label`, while 'micro', 'macro' and 'weighted' support multiclass outcomes.
+        All metrics come from one confusion matrix of the predictions. Defaults to 'binary'.
+
+    threshold_grid_size : int, optional
+        When set, `predict_proba` is called once instead of `predict` and the scores of the
+        positive label are sorted once to compute the ROC and precision-recall curves, the
+        ROC AUC, the average precision and the metrics at this many evenly spaced thresholds.
+        The curves are saved to `curves_file` and the report gets the AUC and average precision.
+        Defaults to None, which only evaluates the hard labels.
+
+    curves_file : str, optional
+        Path to the .npz file where the threshold sweep curves are saved.
+        Defaults to None, which saves them next to `result_file` as `<result name>_curves.npz`.
+
+    bootstrap_resamples : int, optional
+        When set, the report gets percentile bootstrap confidence intervals of every metric
+        from this many resamples. The resamples are drawn from the confusion matrix of the
+        single prediction pass, so the model is not run again.
+        Defaults to None, which only reports the point estimates.
+
+    confidence_level : float, optional
+        The probability covered by the confidence intervals. Defaults to 0.95.
+
+    seed : int, optional
+        The seed of the bootstrap resampling. Defaults to 42.
+
+    slice_columns : list of str, optional
+        Columns of the test data whose values define slices, e.g. regions or merchant tiers.
+        The confusion counts of every slice are accumulated with the global ones in a single
+        bincount per batch and the per-slice metrics are saved as a CSV table to `slices_file`.
+        The columns are passed to the model like the other test data columns.
+        Defaults to None, which only reports the global metrics.
+
+    slices_file : str, optional
+        Path to the CSV file where the per-slice metrics are saved.
+        Defaults to None, which saves them next to `result_file` as `<result name>_slices.csv`.
+
+    predictions_file : str, optional
+        When set, whether every test row is predicted correctly is saved to this .npz file as
+        a packed bit array, with a digest of the test labels in row order. The model selector
+        uses it to test whether two models differ significantly. Only the packed bits are
+        kept between batches. Defaults to None.
+
+    champion_store : str, optional
+        Directory of a `LocalChampionMetricsStore`. When set, the results of a registered
+        model are stored with their artifacts under its name, version, a fingerprint of the
+        test data files and the evaluation parameters, and reused without loading or running
+        the model as long as none of them changes. Defaults to None.
+
+    model_name : str, optional
+        The name of the registered model in the champion store. Defaults to None, which
+        takes it from a 'models:/<name>/<version>' model path.
+
+    model_version : str, optional
+        The version of the registered model in the champion store. Defaults to None, which
+        takes it from a 'models:/<name>/<version>' model path.
+
+    champion_ttl : float, optional
+        Seconds after which the stored results are evaluated again. Defaults to None, which
+        keeps them until the model, the test data or the parameters change.
+
+    test_data : pandas.DataFrame, optional
+        The test dataset already in memory, e.g. passed by a pipeline step in the same process.
+        When set, the rows are taken from it instead of being read from `test_data_path`, and
+        the champion store fingerprints its rows instead of the files. Defaults to None.
+
+    pos_label : int or str, optional
+        The positive label of the binary metrics and of the threshold sweep scores. A label
+        missing from the test labels, or from the model classes for a threshold sweep, raises
+        a ValueError. Defaults to 1.
+
+    run_id : str, optional
+        An MLflow run created by the caller, e.g. with `MlflowClient.create_run`. The
+        telemetry is logged to it through a client and no run is started, so evaluations
+        running in threads do not rely on the active run of the fluent API. Defaults to None,
+        which starts a run with `mlflow.start_run`.
     
     Returns
     --------
     None : The function saves the evaluation metrics to the specified result file.
     """
     # Start Logging with mlflow using context manager
-    with mlflow.start_run():
-        # Load the training data from the CSV files
+    with (nullcontext() if run_id else mlflow.start_run()), Telemetry.from_env('model_evaluator', run_id) as telemetry:
+        # Load the test data from the dataset files
         print('Loacating test dataset files...')
-        csv_files = glob.glob(os.path.join(test_data_path, '*.csv'))
-        print(f'Found {len(csv_files)} files in test dataset')
+        test_files, test_format = find_dataset_files(test_data_path) if test_data_path else ([], None)
+        print(f'Found {len(test_files)} {test_format} files in test dataset')
+        if telemetry.enabled:
+            telemetry.count('input_bytes', sum(os.path.getsize(file) for file in test_files))
 
-        print('Loading test dataset files...')
-        df = pd.concat([pd.read_csv(file) for file in csv_files], ignore_index=True)
-        print(f'Loaded files in dataframe with schema:')
-        print(df.info())
+        def read_test_data():
+            return test_data if test_data is not None else read_dataset_files(test_files, test_format, max_workers)
 
-        # Split the test data into features and labels
-        X_test = df.drop(outcome_label, axis=1)
-        y_test = df[outcome_label]
+        def iter_test_batches():
+            if test_data is not None:
+                return (test_data.iloc[start:start + batch_size] for start in range(0, len(test_data), batch_size))
+            return iter_dataset_chunks(test_files, batch_size, test_format)
 
         # Get the model and if not found then send the zero-metric
         metrics = {
@@ -59,37 +440,146 @@ def evaluate_model(model_id:str, model_path:str, test_data_path:str, outcome_lab
             "fnr": 1
         }
 
-        # Load the model from the model path
-        trained_model = load_model(model_path)
-
-        # Run model evaluation only if the model for the specified version is found
-        if trained_model is not None:
-            # Predict on the test data
-            y_pred = trained_model.predict(X_test)
-
-            # Calculate accuracy
-            accuracy = accuracy_score(y_test, y_pred)
-            recall = recall_score(y_test, y_pred)
-            precision = precision_score(y_test, y_pred)
-            f1_score = 2 * (accuracy * recall) / (accuracy + recall)
-            
-            # Prepare the results
-            metrics = {
-                "model_id": model_id,
-                "accuracy": accuracy,
-                "recall": recall,
-                "precision": precision,
-                "f1_score": f1_score,
-                "fpr": 1-precision,
-                "fnr": 1-recall
+        threshold_sweep = bool(threshold_grid_size)
+        keep_correct = bool(predictions_file)
+        correctness = PackedCorrectness() if keep_correct else None
+        if threshold_sweep and curves_file is None:
+            curves_file = os.path.splitext(result_file)[0] + '_curves.npz'
+        if slice_columns and slices_file is None:
+            slices_file = os.path.splitext(result_file)[0] + '_slices.csv'
+        artifact_paths = {"curves_file": curves_file, "slices_file": slices_file, "predictions_file": predictions_file}
+
+        # Look up the stored results of a registered model on the same test data
+        store, cached = None, None
+        if champion_store:
+            if not (model_name and model_version):
+                model_name, model_version = parse_model_uri(model_path)
+            if not (model_name and model_version):
+                raise ValueError("The champion store needs the model name and version, or a models:/<name>/<version> model path")
+            # The rows in memory are the ones evaluated, whatever the files hold
+            print('Fingerprinting test dataset...')
+            test_fingerprint = hash_frame(test_data) if test_data is not None else hash_files(test_files, test_data_path)
+            store = LocalChampionMetricsStore(champion_store, champion_ttl)
+            params = {
+                "outcome_label": outcome_label, "average": average, "threshold_grid_size": threshold_grid_size,
+                "bootstrap_resamples": bootstrap_resamples, "confidence_level": confidence_level, "seed": seed,
+                "slice_columns": slice_columns, "predictions": keep_correct, "pos_label": pos_label
             }
+            key = champion_key(model_name, model_version, test_fingerprint, params)
+            cached = store.get(key, artifact_paths)
+
+        if cached is not None:
+            print(f'Reusing the stored results of {model_name} version {model_version}')
+            metrics = {**cached, "model_id": model_id}
+            for artifact_key in ARTIFACT_KEYS:
+                if artifact_key in metrics:
+                    metrics[artifact_key] = os.path.relpath(artifact_paths[artifact_key], os.path.dirname(os.path.abspath(result_file)))
+        evaluated = cached is None
+        parallel = bool(num_workers and num_workers > 1)
+        if evaluated and parallel:
+            # Every worker process loads the model itself, so it is not deserialized here too
+            if is_local_path(model_path) and not os.path.exists(model_path):
+                raise FileNotFoundError(f"Model not found at '{model_path}'")
+        elif evaluated:
+            # Load the model from the model path
+            with telemetry.span('load'):
+                trained_model = load_model(model_path)
+            # Run model evaluation only if the model for the specified version is found
+            evaluated = trained_model is not None
+
+        if evaluated and parallel:
+            # Shard the test data across worker processes and merge their confusion counts
+            print(f'Evaluating test dataset on {num_workers} worker processes...')
+            if batch_size:
+                shards = iter_test_batches()
+            else:
+                with telemetry.span('load'):
+                    df = read_test_data()
+                bounds = np.linspace(0, len(df), num_workers + 1).astype(int)
+                shards = (df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]))
+            with telemetry.span('predict'):
+                counts, kept = parallel_confusion_counts(model_path, shards, outcome_label, num_workers, threshold_sweep, slice_columns, correctness, pos_label)
+            metrics = build_metrics(model_id, counts, average, pos_label)
+        elif evaluated and batch_size:
+            # Predict the test data batch by batch, keeping only the confusion counts
+            print(f'Evaluating test dataset in batches of {batch_size} rows...')
+            counts = new_counts(slice_columns)
+            kept = []
+            with telemetry.span('predict'):
+                for batch in iter_test_batches():
+                    collect_batch(predict_batch(trained_model, batch, outcome_label, counts, threshold_sweep, keep_correct, pos_label), kept, correctness)
+            metrics = build_metrics(model_id, counts, average, pos_label)
+        elif evaluated:
+            print('Loading test dataset files...')
+            with telemetry.span('load'):
+                df = read_test_data()
+            print(f'Loaded files in dataframe with schema:')
+            print(df.info())
+
+            # Predict on the test data and calculate all the metrics from a single confusion matrix
+            counts = new_counts(slice_columns)
+            kept = []
+            with telemetry.span('predict'):
+                collect_batch(predict_batch(trained_model, df, outcome_label, counts, threshold_sweep, keep_correct, pos_label), kept, correctness)
+            metrics = build_metrics(model_id, counts, average, pos_label)
+
+        if evaluated:
+            telemetry.count('rows', counts.total)
+
+        if evaluated and threshold_sweep:
+            # Sweep the thresholds over the scores of all the batches with a single sort
+            print(f'Sweeping {threshold_grid_size} thresholds over the positive class scores...')
+            with telemetry.span('metrics'):
+                curves = threshold_curves(
+                    np.concatenate([batch_kept["positives"] for batch_kept in kept]),
+                    np.concatenate([batch_kept["scores"] for batch_kept in kept]),
+                    threshold_grid_size
+                )
+            metrics["roc_auc"] = curves["roc_auc"]
+            metrics["average_precision"] = curves["average_precision"]
+
+            os.makedirs(os.path.dirname(curves_file), exist_ok=True)
+            save_curves(curves_file, curves)
+            metrics["curves_file"] = os.path.relpath(curves_file, os.path.dirname(os.path.abspath(result_file)))
+            print(f"Curves saved to {curves_file}")
+
+        if evaluated and slice_columns:
+            # The metrics of all the slices of a column are computed together from the slice matrices
+            with telemetry.span('metrics'):
+                slice_table = counts.slice_table(average, pos_label)
+            os.makedirs(os.path.dirname(slices_file), exist_ok=True)
+            slice_table.to_csv(slices_file, index=False)
+            metrics["slices_file"] = os.path.relpath(slices_file, os.path.dirname(os.path.abspath(result_file)))
+            print(f"Metrics of {len(slice_table)} slices saved to {slices_file}")
+
+        if evaluated and keep_correct:
+            # The digest of the labels in row order checks that two models saw the same test rows
+            os.makedirs(os.path.dirname(predictions_file), exist_ok=True)
+            correctness.save(predictions_file)
+            metrics["predictions_file"] = os.path.relpath(predictions_file, os.path.dirname(os.path.abspath(result_file)))
+            metrics["labels_digest"] = correctness.labels_digest
+            print(f"Correctness of {correctness.rows} rows saved to {predictions_file}")
+
+        if evaluated and bootstrap_resamples and counts.total:
+            # Resample the confusion matrix rather than predicting the resampled rows again
+            print(f'Bootstrapping {bootstrap_resamples} resamples of the confusion matrix...')
+            metrics["confidence_level"] = confidence_level
+            with telemetry.span('metrics'):
+                metrics["confidence_intervals"] = bootstrap_intervals(
+                    counts.matrix, counts.labels, average, pos_label,
+                    n_resamples=bootstrap_resamples, confidence_level=confidence_level, seed=seed
+                )
+
+        if store is not None and evaluated:
+            store.put(key, metrics, artifact_paths)
+            print(f'Stored the results of {model_name} version {model_version}')
 
         # Dump the final dictionary to a JSON string (or to a file)
         json_output = json.dumps(metrics, indent=4)
 
         # Save metrics to a JSON file for future comparison
         os.makedirs(os.path.dirname(result_file), exist_ok=True)
-        with open(result_file, 'w') as report_file:
+        with telemetry.span('write'), open(result_file, 'w') as report_file:
             report_file.write(json_output)
 
         print(f"Evaluation results:\n{json_output}")
@@ -99,13 +589,60 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--model_id', type=str, help='A string identiifer which can be used to recognize the results')    
     parser.add_argument('--model_path', type=str, help='Path containing the trained model')    
-    parser.add_argument('--test_data', type=str, help='Path to the test data CSV file')
+    parser.add_argument('--test_data', type=str, help='Path to the test data folder with CSV, parquet or feather files')
     parser.add_argument('--outcome_label', type=str, help='Name of the column with the outcome label')
     parser.add_argument('--result_file', type=str, help='Path to save the results JSON file')
+    parser.add_argument('--max_workers', type=int, default=None, help='Number of threads reading the test data files')
+    parser.add_argument('--batch_size', type=int, default=None, help='Predict the test data in batches of this many rows, default predicts it at once')
+    parser.add_argument('--num_workers', type=int, default=None, help='Number of worker processes predicting shards of the test data, default predicts in the current process')
+    parser.add_argument('--average', type=str, default='binary', choices=AVERAGES, help='How the per-class metrics are averaged, default is binary')
+    parser.add_argument('--pos_label', type=str, default='1', help='Positive label of the binary metrics and threshold sweep, integers are read as numbers, default is 1')
+    parser.add_argument('--threshold_grid_size', type=int, default=None, help='Sweep this many thresholds over the predicted probabilities and save ROC/PR curves, default only evaluates the hard labels')
+    parser.add_argument('--curves_file', type=str, default=None, help='Path to save the threshold sweep curves, default is next to the results file')
+    parser.add_argument('--bootstrap_resamples', type=int, default=None, help='Number of bootstrap resamples of the metric confidence intervals, default reports no intervals')
+    parser.add_argument('--confidence_level', type=float, default=0.95, help='Probability covered by the confidence intervals, default is 0.95')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the bootstrap resampling, default is 42')
+    parser.add_argument('--slice_columns', type=str, default=None, help='Comma separated columns whose values define slices with their own metrics')
+    parser.add_argument('--slices_file', type=str, default=None, help='Path to save the per-slice metrics CSV, default is next to the results file')
+    parser.add_argument('--predictions_file', type=str, default=None, help='Path to save the packed per-row correctness used by significance tests')
+    parser.add_argument('--save_predictions', type=str, default='false', help='Whether to save the packed per-row correctness next to the results file when no predictions file is given, default is false')
+    parser.add_argument('--champion_store', type=str, default=None, help='Directory storing the results of registered models to reuse them on the same test data')
+    parser.add_argument('--model_name', type=str, default=None, help='Name of the registered model in the champion store, default is taken from a models:/ path')
+    parser.add_argument('--model_version', type=str, default=None, help='Version of the registered model in the champion store, default is taken from a models:/ path')
+    parser.add_argument('--champion_ttl', type=float, default=None, help='Seconds after which stored results are evaluated again, default keeps them')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory caching the outputs of identical runs, default runs without cache')
+    parser.add_argument('--cache_max_bytes', type=int, default=None, help='Disk budget of the cache, least recently used entries are evicted beyond it')
 
     args = parser.parse_args()
     print('Printing received arguments...')
     for arg_name in vars(args):
         print(f"{arg_name}: {getattr(args, arg_name)}")
         
-    evaluate_model(args.model_id, args.model_path, args.test_data, args.outcome_label, args.result_file)
+    slice_columns = args.slice_columns.split(',') if args.slice_columns else None
+    pos_label = int(args.pos_label) if args.pos_label.lstrip('-').isdigit() else args.pos_label
+    predictions_file = args.predictions_file
+    if not predictions_file and args.save_predictions.lower() in ('1', 'true', 'yes'):
+        predictions_file = os.path.splitext(args.result_file)[0] + '_predictions.npz'
+    evaluate_args = dict(
+        model_id=args.model_id, model_path=args.model_path, test_data_path=args.test_data, outcome_label=args.outcome_label,
+        result_file=args.result_file, max_workers=args.max_workers, batch_size=args.batch_size, num_workers=args.num_workers,
+        average=args.average, threshold_grid_size=args.threshold_grid_size, curves_file=args.curves_file,
+        bootstrap_resamples=args.bootstrap_resamples, confidence_level=args.confidence_level, seed=args.seed,
+        slice_columns=slice_columns, slices_file=args.slices_file, predictions_file=predictions_file,
+        champion_store=args.champion_store, model_name=args.model_name, model_version=args.model_version, champion_ttl=args.champion_ttl,
+        pos_label=pos_label
+    )
+    if args.cache_dir:
+        # The artifacts saved next to the results by default are outputs of the cached step too
+        if args.threshold_grid_size and not args.curves_file:
+            evaluate_args['curves_file'] = os.path.splitext(args.result_file)[0] + '_curves.npz'
+        if slice_columns and not args.slices_file:
+            evaluate_args['slices_file'] = os.path.splitext(args.result_file)[0] + '_slices.csv'
+        StepCache(args.cache_dir, args.cache_max_bytes).run(
+            'model_evaluator', evaluate_model, evaluate_args,
+            input_args=['model_path', 'test_data_path'],
+            output_args=['result_file', 'curves_file', 'slices_file', 'predictions_file'],
+            ignored_args=['max_workers', 'batch_size', 'num_workers', 'champion_store', 'champion_ttl']
+        )
+    else:
+        evaluate_model(**evaluate_args)
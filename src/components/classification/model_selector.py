@@ -1,58 +1,394 @@
+from __future__ import annotations
 import argparse
+import glob
 import json
+import operator
 import os
-import mlflow
-import pandas as pd
+import re
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from components.classification.classification_metrics import load_correctness, load_curves, mcnemar_test, tpr_at_fpr
+from components.common.lazy_import import lazy_import
+from components.common.step_cache import StepCache
+from components.common.telemetry import Telemetry
 
-def compare_models(metrics_file_paths:str, constraint:str, output_path:str)->None:
+mlflow = lazy_import("mlflow")
+pd = lazy_import("pandas")
+
+# Supported criteria for selecting the best model, with the metric they rank and whether higher is better
+SELECTION_METRICS = {
+    'balanced': ('f1_score', True),
+    'minimize_fp': ('fpr', False),
+    'minimize_fn': ('fnr', False),
+    'roc_auc': ('roc_auc', True),
+    'max_tpr_at_fpr': ('tpr_at_max_fpr', True),
+}
+CONSTRAINTS = list(SELECTION_METRICS)
+
+# Metrics where a lower value is better, every other metric is maximized
+LOWER_IS_BETTER = {'fpr', 'fnr', 'operating_fpr'}
+
+# Comparisons allowed in the conditions of a constrained selection
+CONDITION_OPERATORS = {'<=': operator.le, '>=': operator.ge, '<': operator.lt, '>': operator.gt, '==': operator.eq}
+CONDITION_PATTERN = re.compile(r'^\s*(\w+)\s*(<=|>=|<|>|==)\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*$')
+
+def operating_point(report_path:str, report:dict, max_fpr:float)->dict:
+    """
+    Finds the best operating point of a model within a false positive budget from its curves.
+
+    Parameters
+    ----------
+    report_path : str
+        Path to the evaluation result file of the model.
+
+    report : dict
+        The evaluation results, with the `curves_file` saved by a threshold sweep.
+
+    max_fpr : float
+        The highest acceptable false positive rate.
+
+    Returns
+    -------
+    dict : The true positive rate, false positive rate and threshold of the operating point.
+    """
+    if 'curves_file' not in report:
+        raise ValueError(f"{report_path} has no curves, evaluate the model with a threshold sweep")
+
+    # The curves file is recorded relative to the report
+    curves = load_curves(os.path.join(os.path.dirname(report_path), report['curves_file']))
+    tpr, fpr, threshold = tpr_at_fpr(curves, max_fpr)
+    return {'tpr_at_max_fpr': tpr, 'operating_fpr': fpr, 'operating_threshold': threshold}
+
+def significance_test(candidate_path:str, candidate:dict, baseline_path:str, baseline:dict, significance_level:float)->dict:
+    """
+    Tests whether a candidate model is significantly more accurate than a baseline model.
+
+    McNemar's test compares the rows only one of the two models predicts correctly, read
+    from the packed correctness files saved by the evaluations.
+
+    Parameters
+    ----------
+    candidate_path : str
+        Path to the evaluation result file of the candidate model.
+
+    candidate : dict
+        The evaluation results of the candidate, with its `predictions_file`.
+
+    baseline_path : str
+        Path to the evaluation result file of the baseline model.
+
+    baseline : dict
+        The evaluation results of the baseline, with its `predictions_file`.
+
+    significance_level : float
+        The largest p-value at which the candidate is declared better.
+
+    Returns
+    -------
+    dict : The counts of rows only each model predicts correctly, the p-value and whether
+        the candidate is significantly better.
+    """
+    correctness = []
+    for report_path, report in [(candidate_path, candidate), (baseline_path, baseline)]:
+        if 'predictions_file' not in report:
+            raise ValueError(f"{report_path} has no predictions, evaluate the model with a predictions file")
+        # The predictions file is recorded relative to the report
+        correctness.append(load_correctness(os.path.join(os.path.dirname(report_path), report['predictions_file'])))
+
+    (candidate_correct, candidate_rows, candidate_digest), (baseline_correct, baseline_rows, baseline_digest) = correctness
+    if candidate_rows != baseline_rows or candidate_digest != baseline_digest:
+        raise ValueError(f"{candidate_path} and {baseline_path} are not evaluated on the same test rows")
+
+    candidate_only, baseline_only, p_value = mcnemar_test(candidate_correct, baseline_correct)
+    return {
+        'test': 'mcnemar',
+        'candidate_model_id': candidate['model_id'],
+        'baseline_model_id': baseline['model_id'],
+        'candidate_only_correct': candidate_only,
+        'baseline_only_correct': baseline_only,
+        'p_value': p_value,
+        'significance_level': significance_level,
+        'significant': bool(p_value < significance_level and candidate_only > baseline_only)
+    }
+
+def parse_condition(condition:str)->tuple:
+    """
+    Parses a condition of a constrained selection, such as 'fpr<=0.02'.
+
+    Parameters
+    ----------
+    condition : str
+        A metric name, a comparison among <=, >=, <, > and ==, and a number.
+
+    Returns
+    -------
+    tuple : The metric name, the comparison function and the number.
+    """
+    match = CONDITION_PATTERN.match(condition)
+    if match is None:
+        raise ValueError(f"Invalid condition '{condition}', expected e.g. 'fpr<=0.02'")
+    metric, comparison, value = match.groups()
+    return metric, CONDITION_OPERATORS[comparison], float(value)
+
+def feasible_models(metrics_df:pd.DataFrame, subject_to:list)->np.ndarray:
+    """
+    Finds the models meeting all the conditions of a constrained selection.
+
+    Parameters
+    ----------
+    metrics_df : pd.DataFrame
+        One row of metrics per model.
+
+    subject_to : list of str
+        The conditions, see `parse_condition`. Models with a missing metric fail its conditions.
+
+    Returns
+    -------
+    np.ndarray : Whether every model meets all the conditions.
+    """
+    feasible = np.ones(len(metrics_df), dtype=bool)
+    for metric, compare, value in map(parse_condition, subject_to or []):
+        if metric not in metrics_df:
+            raise ValueError(f"The condition on {metric} needs the metric in the evaluation results")
+        feasible &= compare(metrics_df[metric].to_numpy(dtype=float), value)
+    return feasible
+
+def pareto_front(points:np.ndarray)->np.ndarray:
+    """
+    Finds the non-dominated points, minimizing every column.
+
+    A point is dominated when another one is at most as large in every column and smaller
+    in one. Two columns use a sort-based sweep: after sorting by the first column, a point is
+    dominated exactly when an earlier point has a smaller second column, or an equal one
+    with a smaller first column. More columns use a sort-filter skyline: after sorting by
+    the sum of the columns no point can be dominated by a later one, so every point is only
+    compared, in a vectorised way, with the front found so far.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        A (n, d) array of the values to minimize. Missing values are worse than any other.
+
+    Returns
+    -------
+    np.ndarray : Whether every point is on the Pareto front.
+    """
+    points = np.asarray(points, dtype=float)
+    n_points = len(points)
+    if n_points == 0:
+        return np.zeros(0, dtype=bool)
+
+    # Missing values are replaced by a finite value worse than all the others of their column
+    missing = np.isnan(points)
+    largest = np.where(missing, -np.inf, points).max(axis=0)
+    points = np.where(missing, np.where(np.isinf(largest), 0.0, largest) + 1, points)
+
+    on_front = np.zeros(n_points, dtype=bool)
+    if points.shape[1] == 1:
+        on_front[:] = points[:, 0] == points[:, 0].min()
+    elif points.shape[1] == 2:
+        order = np.lexsort((points[:, 1], points[:, 0]))
+        first, second = points[order, 0], points[order, 1]
+        best_second = np.minimum.accumulate(second)
+        previous_best = np.r_[np.inf, best_second[:-1]]
+        # The first point reaching every running minimum has the smallest first column with it
+        record = np.r_[True, second[1:] < best_second[:-1]]
+        record_first = first[np.maximum.accumulate(np.where(record, np.arange(n_points), 0))]
+        previous_record_first = np.r_[np.inf, record_first[:-1]]
+        dominated = (previous_best < second) | ((previous_best == second) & (previous_record_first < first))
+        on_front[order] = ~dominated
+    else:
+        front = np.empty_like(points)
+        front_size = 0
+        for index in np.argsort(points.sum(axis=1), kind='stable'):
+            point = points[index]
+            found = front[:front_size]
+            if not np.any(np.all(found <= point, axis=1) & np.any(found < point, axis=1)):
+                front[front_size] = point
+                front_size += 1
+                on_front[index] = True
+    return on_front
+
+def find_report_files(reports_path:str)->list:
+    """
+    Finds the evaluation result files of the models to compare.
+
+    Parameters
+    ----------
+    reports_path : str
+        A folder with the JSON evaluation result files, or a glob pattern matching them.
+
+    Returns
+    -------
+    list of str : The sorted paths of the result files.
+    """
+    pattern = os.path.join(reports_path, '*.json') if os.path.isdir(reports_path) else reports_path
+    report_files = sorted(glob.glob(pattern))
+    if not report_files:
+        raise ValueError(f"No evaluation result files found in {reports_path}")
+    return report_files
+
+def load_reports(metrics_file_paths:list, max_fpr:float=None, max_workers:int=None)->list:
+    """
+    Loads evaluation result files concurrently.
+
+    Parameters
+    ----------
+    metrics_file_paths : list of str
+        Paths to the JSON evaluation result files.
+
+    max_fpr : float, optional
+        When set, the best operating point within this false positive rate is added to
+        every report from its curves, see `operating_point`.
+
+    max_workers : int, optional
+        Number of threads loading the files. Defaults to None, which lets the thread pool
+        pick its size.
+
+    Returns
+    -------
+    list of dict : The reports, in the order of the paths.
+    """
+    def load_report(file_path):
+        with open(file_path, 'r') as f:
+            report = json.load(f)
+        if max_fpr is not None:
+            report.update(operating_point(file_path, report, max_fpr))
+        return report
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(load_report, metrics_file_paths))
+
+def compare_models(metrics_file_paths, constraint:str, output_path:str, max_fpr:float=None, max_workers:int=None,
+                   objective:str=None, subject_to:list=None, pareto_metrics:list=None,
+                   significance_level:float=None, baseline_model_id:str=None)->None:
     """
     Compare models based on their metrics and select the best model according to a given constraint.
     
     Parameters
     ----------
-    metrics_file_paths : list of str
-        List of file paths to JSON files containing model metrics.
+    metrics_file_paths : list of str or str
+        List of file paths to JSON files containing model metrics or folders with the JSON
+        files, or a folder or a glob pattern matching them. Any number of models can be
+        compared. The curves and predictions files of a report are read from its folder.
     
     constraint : str
         The constraint to use for selecting the best model. 
         Options are 'minimize_fp' (minimize false positives), 
         'minimize_fn' (minimize false negatives), 
-        or 'balanced' to maximize the F1 score.
+        'balanced' to maximize the F1 score,
+        'roc_auc' to maximize the area under the ROC curve,
+        or 'max_tpr_at_fpr' to maximize the true positive rate at any threshold
+        with a false positive rate of at most `max_fpr`.
+        The last two need the models to be evaluated with a threshold sweep.
     
     output_path : str
         The file path where the comparison report will be saved.
+
+    max_fpr : float, optional
+        The false positive budget of the 'max_tpr_at_fpr' constraint.
+
+    max_workers : int, optional
+        Number of threads loading the result files.
+
+    objective : str, optional
+        A metric to optimize instead of the constraint's, e.g. 'fnr'. The rates 'fpr' and
+        'fnr' are minimized and the other metrics maximized.
+
+    subject_to : list of str, optional
+        Conditions every selected model must meet, e.g. ['fpr<=0.02'], see `parse_condition`.
+        Models failing them rank after all the others and are never selected.
+
+    pareto_metrics : list of str, optional
+        The metrics of the Pareto front written into the report, with the same directions as
+        `objective`. Defaults to ['fpr', 'fnr'].
+
+    significance_level : float, optional
+        When set, the best ranked model only replaces `baseline_model_id` as the best model
+        when McNemar's test finds it significantly more accurate at this level, see
+        `significance_test`. The models need to be evaluated with a predictions file.
+
+    baseline_model_id : str, optional
+        The model to keep unless a candidate is significantly better, e.g. the current champion.
     
     Returns
     -------
     None: The function saves the comparison report to the specified output path.
     """
     # Start Logging with mlflow using context manager
-    with mlflow.start_run():
-        # Load metrics from the provided JSON files
-        metrics = {}
-        for file_path in metrics_file_paths:
-            with open(file_path, 'r') as f:
-                metrics[file_path] = json.load(f)
-
-        # Convert the metrics dictionary to a DataFrame for comparison
-        metrics_df = pd.DataFrame(metrics).T
+    with mlflow.start_run(), Telemetry.from_env('model_selector') as telemetry:
+        if constraint == 'max_tpr_at_fpr' and max_fpr is None:
+            raise ValueError("The 'max_tpr_at_fpr' constraint needs max_fpr")
+
+        # Load metrics from the provided JSON files concurrently
+        if isinstance(metrics_file_paths, str):
+            metrics_file_paths = find_report_files(metrics_file_paths)
+        else:
+            # Results folders, e.g. the results output of every evaluator, hold the reports with their artifacts
+            metrics_file_paths = [
+                path for reports_path in metrics_file_paths
+                for path in (find_report_files(reports_path) if os.path.isdir(reports_path) else [reports_path])
+            ]
+        with telemetry.span('load'):
+            reports = load_reports(metrics_file_paths, max_fpr if constraint == 'max_tpr_at_fpr' else None, max_workers)
+        print(f'Loaded {len(reports)} evaluation result files')
+        telemetry.count('reports', len(reports))
+
+        # Convert the metrics to a DataFrame for comparison, indexed by the result files
+        metrics_df = pd.DataFrame(reports, index=metrics_file_paths)
         metrics_df.reset_index(level=0, inplace=True)
-        metrics_df['f1_score'] = metrics_df['f1_score'].astype(float)
-        metrics_df['fpr'] = metrics_df['fpr'].astype(float)
-        metrics_df['fnr'] = metrics_df['fnr'].astype(float)
 
         print("Metrics DataFrame:\n", metrics_df.info())
-        
-        # Find the best model by constraint
-        if constraint == 'minimize_fp':
-            best_model_row = metrics_df.loc[metrics_df['fpr'].idxmin()]
-        elif constraint == 'minimize_fn':
-            best_model_row = metrics_df.loc[metrics_df['fnr'].idxmin()]
+
+        # Rank all the models by the objective or constraint's metric in one pass,
+        # missing values and models failing the conditions rank last
+        if objective is not None:
+            metric, higher_is_better = objective, objective not in LOWER_IS_BETTER
         else:
-            best_model_row = metrics_df.loc[metrics_df['f1_score'].idxmax()]
+            metric, higher_is_better = SELECTION_METRICS.get(constraint, SELECTION_METRICS['balanced'])
+        if metric not in metrics_df:
+            raise ValueError(f"The '{objective or constraint}' selection needs the {metric} metric in the evaluation results")
+        scores = metrics_df[metric].to_numpy(dtype=float)
+        feasible = feasible_models(metrics_df, subject_to)
+        if not feasible.any():
+            raise ValueError(f"No model meets the conditions {subject_to}")
+        scores = np.where(np.isnan(scores) | ~feasible, -np.inf, scores if higher_is_better else -scores)
+        best_index = int(np.argmax(scores))
+        ranks = np.empty(len(scores), dtype=int)
+        ranks[np.argsort(-scores, kind='stable')] = np.arange(1, len(scores) + 1)
+        metrics_df['rank'] = ranks
+        if subject_to:
+            metrics_df['feasible'] = feasible
+
+        # Find the models not dominated on all the Pareto metrics at once
+        pareto_metrics = pareto_metrics or ['fpr', 'fnr']
+        missing = [name for name in pareto_metrics if name not in metrics_df]
+        if missing:
+            raise ValueError(f"The Pareto front needs the {missing} metrics in the evaluation results")
+        points = metrics_df[pareto_metrics].to_numpy(dtype=float)
+        directions = np.array([1.0 if name in LOWER_IS_BETTER else -1.0 for name in pareto_metrics])
+        metrics_df['pareto_optimal'] = pareto_front(points * directions)
 
         # Get the model name
-        best_model = best_model_row['model_id']
+        best_model = metrics_df.loc[best_index, 'model_id']
+
+        # Keep the baseline unless the best ranked model is significantly better
+        significance = None
+        if significance_level is not None:
+            baseline_rows = np.flatnonzero(metrics_df['model_id'].to_numpy() == baseline_model_id)
+            if len(baseline_rows) == 0:
+                raise ValueError(f"The significance test needs the baseline model '{baseline_model_id}' among the evaluation results")
+            baseline_index = int(baseline_rows[0])
+            if baseline_index != best_index:
+                with telemetry.span('metrics'):
+                    significance = significance_test(
+                        metrics_df.loc[best_index, 'index'], reports[best_index],
+                        metrics_df.loc[baseline_index, 'index'], reports[baseline_index],
+                        significance_level
+                    )
+                print(f"Significance test: {significance}")
+                if not significance['significant']:
+                    best_model = baseline_model_id
 
         # Generate a comparison report
         # Convert the dataframe to a list of dictionaries for the models
@@ -61,23 +397,39 @@ def compare_models(metrics_file_paths:str, constraint:str, output_path:str)->Non
         # Prepare the final dictionary
         final_output = {
             "models": models_list,
-            "best_model_id": best_model
+            "best_model_id": best_model,
+            "pareto_metrics": pareto_metrics,
+            "pareto_front": metrics_df.loc[metrics_df['pareto_optimal'], 'model_id'].tolist()
         }
+        if objective is not None or subject_to:
+            final_output["selection"] = {"metric": metric, "subject_to": subject_to or []}
+        if significance is not None:
+            final_output["significance_test"] = significance
 
         # Dump the final dictionary to a JSON string (or to a file)
         json_output = json.dumps(final_output, indent=4)
 
         # Save the comparison report
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w') as report_file:
+        with telemetry.span('write'), open(output_path, 'w') as report_file:
             report_file.write(json_output)
         print(f"Comparison report saved at {output_path}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--model1_report_path', type=str, help='Path to the evaluation result file of first model')
-    parser.add_argument('--model2_report_path', type=str, help='Path to the evaluation result file of second model')
-    parser.add_argument('--constraint', type=str, help='The criteria on which the best model selection is done')
+    parser.add_argument('--reports', type=str, action='append', default=None, help='Folder with the evaluation result files and artifacts of any number of models, or a glob pattern matching them, repeated for every folder')
+    parser.add_argument('--model1_report_path', type=str, default=None, help='Path to the evaluation result file of first model')
+    parser.add_argument('--model2_report_path', type=str, default=None, help='Path to the evaluation result file of second model')
+    parser.add_argument('--constraint', type=str, choices=CONSTRAINTS, help='The criteria on which the best model selection is done')
+    parser.add_argument('--max_fpr', type=float, default=None, help='The false positive budget of the max_tpr_at_fpr constraint')
+    parser.add_argument('--max_workers', type=int, default=None, help='Number of threads loading the evaluation result files')
+    parser.add_argument('--objective', type=str, default=None, help='Metric to optimize instead of the constraint, rates are minimized and other metrics maximized')
+    parser.add_argument('--subject_to', type=str, default=None, help='Comma separated conditions the selected model must meet, e.g. fpr<=0.02')
+    parser.add_argument('--pareto_metrics', type=str, default='fpr,fnr', help='Comma separated metrics of the Pareto front in the report, default is fpr,fnr')
+    parser.add_argument('--significance_level', type=float, default=None, help='Only replace the baseline model by a significantly better one at this level')
+    parser.add_argument('--baseline_model_id', type=str, default=None, help='Model kept as the best one unless a candidate is significantly better')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory caching the outputs of identical runs, default runs without cache')
+    parser.add_argument('--cache_max_bytes', type=int, default=None, help='Disk budget of the cache, least recently used entries are evicted beyond it')
     parser.add_argument('--comparison_report', type=str, help='File to save the comparison report and best model')
 
     args = parser.parse_args()
@@ -85,5 +437,21 @@ if __name__ == "__main__":
     for arg_name in vars(args):
         print(f"{arg_name}: {getattr(args, arg_name)}")
 
-    report_files = [args.model1_report_path, args.model2_report_path]
-    compare_models(report_files, args.constraint, args.comparison_report)
+    report_files = [path for reports in args.reports or [] for path in find_report_files(reports)]
+    report_files += [path for path in [args.model1_report_path, args.model2_report_path] if path]
+    subject_to = args.subject_to.split(',') if args.subject_to else None
+    compare_args = dict(
+        metrics_file_paths=report_files, constraint=args.constraint, output_path=args.comparison_report,
+        max_fpr=args.max_fpr, max_workers=args.max_workers, objective=args.objective, subject_to=subject_to,
+        pareto_metrics=args.pareto_metrics.split(','), significance_level=args.significance_level,
+        baseline_model_id=args.baseline_model_id
+    )
+    if args.cache_dir:
+        # The curves and predictions files referenced by the reports are read from their folders
+        StepCache(args.cache_dir, args.cache_max_bytes).run(
+            'model_selector', compare_models, compare_args,
+            input_args=['metrics_file_paths'], output_args=['output_path'], ignored_args=['max_workers'],
+            extra_inputs=sorted({os.path.dirname(os.path.abspath(path)) for path in report_files})
+        )
+    else:
+        compare_models(**compare_args)
@@ -0,0 +1,526 @@
+from __future__ import annotations
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from components.common.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# File extension of every supported dataset format
+DATASET_FORMATS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "feather": ".feather",
+}
+
+
+def _import_pyarrow():
+    """
+    Imports pyarrow, which is only needed for the columnar dataset formats.
+
+    Returns
+    -------
+    module : The pyarrow module.
+    """
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required to read or write the parquet and feather formats"
+        ) from e
+    return pyarrow
+
+
+def _check_format(data_format: str) -> None:
+    """
+    Checks that a dataset format is supported.
+
+    Parameters
+    ----------
+    data_format : str
+        The dataset format to check.
+
+    Returns
+    -------
+    None : The function raises a ValueError for unsupported formats.
+    """
+    if data_format not in DATASET_FORMATS:
+        raise ValueError(
+            f"Unsupported dataset format '{data_format}', expected one of {list(DATASET_FORMATS)}"
+        )
+
+
+def dataset_file_name(name: str, data_format: str) -> str:
+    """
+    Builds the file name of a dataset file in the given format.
+
+    Parameters
+    ----------
+    name : str
+        The file name without extension, e.g. 'train_data'.
+
+    data_format : str
+        One of the keys of `DATASET_FORMATS`.
+
+    Returns
+    -------
+    str : The file name with the extension of the format.
+    """
+    _check_format(data_format)
+    return f"{name}{DATASET_FORMATS[data_format]}"
+
+
+def find_dataset_files(data_path: str) -> tuple:
+    """
+    Finds the dataset files in a folder and detects their format from the file extension.
+
+    Parameters
+    ----------
+    data_path : str
+        The directory path where the dataset files are located.
+
+    Returns
+    -------
+    tuple : The sorted paths of the dataset files, so that every reader sees the same row
+        order, and their format. An empty folder is reported as 'csv'.
+    """
+    files_by_format = {}
+    for file in sorted(glob.glob(os.path.join(data_path, "*"))):
+        for data_format, extension in DATASET_FORMATS.items():
+            if file.endswith(extension):
+                files_by_format.setdefault(data_format, []).append(file)
+
+    if len(files_by_format) > 1:
+        raise ValueError(
+            f"Found more than one dataset format in {data_path}: {sorted(files_by_format)}"
+        )
+    if not files_by_format:
+        return [], "csv"
+    data_format, files = files_by_format.popitem()
+    return files, data_format
+
+
+def _read_file(file: str, data_format: str, dtype: dict = None, usecols: list = None) -> pd.DataFrame:
+    """
+    Reads a single dataset file.
+
+    Columnar files are memory-mapped and only the requested columns are read from them.
+
+    Parameters
+    ----------
+    file : str
+        The path of the file to read.
+
+    data_format : str
+        One of the keys of `DATASET_FORMATS`.
+
+    dtype : dict, optional
+        Explicit column types, which skips type inference for those columns.
+
+    usecols : list, optional
+        The columns to load, all columns are loaded when not set.
+
+    Returns
+    -------
+    pd.DataFrame : The loaded dataframe.
+    """
+    if data_format == "csv":
+        # Only pass the options that are set
+        read_kwargs = {}
+        if dtype is not None:
+            read_kwargs["dtype"] = dtype
+        if usecols is not None:
+            read_kwargs["usecols"] = usecols
+        return pd.read_csv(file, **read_kwargs)
+
+    pyarrow = _import_pyarrow()
+    if data_format == "parquet":
+        table = pyarrow.parquet.read_table(file, columns=usecols, memory_map=True)
+    else:
+        table = pyarrow.feather.read_table(file, columns=usecols, memory_map=True)
+    df = table.to_pandas()
+    return df.astype(dtype) if dtype is not None else df
+
+
+def _read_file_timed(file: str, data_format: str, dtype: dict, usecols: list) -> tuple:
+    """
+    Reads a single dataset file and measures the time it took.
+
+    Parameters
+    ----------
+    file : str
+        The path of the file to read.
+
+    data_format : str
+        One of the keys of `DATASET_FORMATS`.
+
+    dtype : dict
+        Explicit column types, or None.
+
+    usecols : list
+        The columns to load, or None for all columns.
+
+    Returns
+    -------
+    tuple : The loaded dataframe and the read time in seconds.
+    """
+    start = time.perf_counter()
+    df = _read_file(file, data_format, dtype, usecols)
+    return df, time.perf_counter() - start
+
+
+def read_dataset_files(
+    files: list,
+    data_format: str = "csv",
+    max_workers: int = None,
+    use_processes: bool = False,
+    dtype: dict = None,
+    usecols: list = None,
+    timings: dict = None,
+) -> pd.DataFrame:
+    """
+    Reads dataset files concurrently and concatenates them into one dataframe.
+
+    The files are parsed on a thread pool (or a process pool when `use_processes` is set,
+    which helps when parsing is bound by the GIL) and the frames are concatenated once, in
+    the order of `files`. The result is identical to reading the files one at a time
+    and concatenating them with `ignore_index=True`.
+
+    Parameters
+    ----------
+    files : list of str
+        The dataset files to read.
+
+    data_format : str, optional
+        One of the keys of `DATASET_FORMATS`. The default is 'csv'.
+
+    max_workers : int, optional
+        The size of the worker pool. Defaults to the executor's own default.
+
+    use_processes : bool, optional
+        Parse the files on a process pool instead of a thread pool. The default is False.
+
+    dtype : dict, optional
+        Explicit column types, which skips type inference for those columns.
+
+    usecols : list, optional
+        The columns to load, all columns are loaded when not set.
+
+    timings : dict, optional
+        When provided, the read time in seconds of every file is stored in it by file path.
+
+    Returns
+    -------
+    pd.DataFrame : The concatenated dataframe.
+    """
+    if len(files) <= 1:
+        results = [_read_file_timed(file, data_format, dtype, usecols) for file in files]
+    else:
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=max_workers) as executor:
+            results = list(
+                executor.map(
+                    _read_file_timed,
+                    files,
+                    [data_format] * len(files),
+                    [dtype] * len(files),
+                    [usecols] * len(files),
+                )
+            )
+
+    frames = []
+    for file, (df, seconds) in zip(files, results):
+        print(f"Read {len(df)} rows from {file} in {seconds:.3f}s")
+        if timings is not None:
+            timings[file] = seconds
+        frames.append(df)
+    del results
+
+    # A single file needs no concatenation, only a fresh index
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    return pd.concat(frames, ignore_index=True)
+
+
+def iter_dataset_chunks(
+    files: list,
+    chunk_size: int,
+    data_format: str = "csv",
+    dtype: dict = None,
+    usecols: list = None,
+):
+    """
+    Iterates over dataset files in chunks of rows, so that only one chunk is held in memory.
+
+    Parameters
+    ----------
+    files : list of str
+        The dataset files to read, in the given order.
+
+    chunk_size : int
+        The number of rows in each chunk.
+
+    data_format : str, optional
+        One of the keys of `DATASET_FORMATS`. The default is 'csv'.
+
+    dtype : dict, optional
+        Explicit column types, which skips type inference for those columns.
+
+    usecols : list, optional
+        The columns to load, all columns are loaded when not set.
+
+    Yields
+    ------
+    pd.DataFrame : The next chunk of rows.
+    """
+    if data_format == "csv":
+        read_kwargs = {}
+        if dtype is not None:
+            read_kwargs["dtype"] = dtype
+        if usecols is not None:
+            read_kwargs["usecols"] = usecols
+        for file in files:
+            with pd.read_csv(file, chunksize=chunk_size, **read_kwargs) as reader:
+                for chunk in reader:
+                    yield chunk
+        return
+
+    pyarrow = _import_pyarrow()
+    for file in files:
+        if data_format == "parquet":
+            batches = pyarrow.parquet.ParquetFile(file, memory_map=True).iter_batches(
+                batch_size=chunk_size, columns=usecols
+            )
+        else:
+            # The table is memory-mapped, so slicing it into batches does not load it
+            table = pyarrow.feather.read_table(file, columns=usecols, memory_map=True)
+            batches = table.to_batches(max_chunksize=chunk_size)
+        for batch in batches:
+            chunk = batch.to_pandas()
+            yield chunk.astype(dtype) if dtype is not None else chunk
+
+
+def _common_dtype(first, second):
+    """
+    Finds a column type holding the values of two column types.
+
+    Parameters
+    ----------
+    first : dtype
+        The first column type.
+
+    second : dtype
+        The second column type.
+
+    Returns
+    -------
+    dtype : The wider numeric type of two numeric types, e.g. float64 for int64 and
+        float64, and object for any other pair of different types.
+    """
+    if first == second:
+        return first
+    numeric = [isinstance(dtype, np.dtype) and dtype.kind in "iuf" for dtype in (first, second)]
+    if all(numeric):
+        return np.result_type(first, second)
+    return np.dtype(object)
+
+
+def _columnar_file_dtypes(file: str, data_format: str, usecols: list = None) -> dict:
+    """
+    Reads the column types of the chunks of a parquet or feather file from its schema.
+
+    Integer and boolean columns with missing values become float and object columns in
+    pandas, so they are typed for the missing values of the whole file.
+
+    Parameters
+    ----------
+    file : str
+        The dataset file.
+
+    data_format : str
+        'parquet' or 'feather'.
+
+    usecols : list, optional
+        The columns to type, all columns are typed when not set.
+
+    Returns
+    -------
+    dict : The column types.
+    """
+    pyarrow = _import_pyarrow()
+    if data_format == "parquet":
+        parquet_file = pyarrow.parquet.ParquetFile(file, memory_map=True)
+        schema = parquet_file.schema_arrow
+        metadata = parquet_file.metadata
+        has_nulls = {}
+        for index, name in enumerate(schema.names):
+            statistics = [metadata.row_group(group).column(index).statistics for group in range(metadata.num_row_groups)]
+            # Without statistics the column may have missing values
+            has_nulls[name] = any(stat is None or not stat.has_null_count or stat.null_count > 0 for stat in statistics)
+    else:
+        table = pyarrow.feather.read_table(file, memory_map=True)
+        schema = table.schema
+        has_nulls = {name: table.column(name).null_count > 0 for name in schema.names}
+
+    names = [name for name in schema.names if usecols is None or name in usecols]
+    dtypes = schema.empty_table().select(names).to_pandas().dtypes.to_dict()
+    for name in names:
+        field_type = schema.field(name).type
+        if has_nulls[name] and pyarrow.types.is_integer(field_type):
+            dtypes[name] = np.dtype(np.float64)
+        elif has_nulls[name] and pyarrow.types.is_boolean(field_type):
+            dtypes[name] = np.dtype(object)
+    return dtypes
+
+
+def scan_dataset_dtypes(files: list, chunk_size: int, data_format: str = "csv", usecols: list = None) -> dict:
+    """
+    Finds the column types holding every chunk of dataset files.
+
+    The types of a chunk are inferred from its own rows, so a column can be read as integers
+    in one chunk and as floats in a later one with missing values. Passing these types to
+    `iter_dataset_chunks` gives every chunk the same types, which columnar files need. CSV
+    files are read once in chunks to find them, parquet and feather files only read their
+    schema and null counts.
+
+    Parameters
+    ----------
+    files : list of str
+        The dataset files.
+
+    chunk_size : int
+        The number of rows in each chunk.
+
+    data_format : str, optional
+        One of the keys of `DATASET_FORMATS`. The default is 'csv'.
+
+    usecols : list, optional
+        The columns to type, all columns are typed when not set.
+
+    Returns
+    -------
+    dict : The type of every column.
+    """
+    if data_format == "csv":
+        all_dtypes = (chunk.dtypes.to_dict() for chunk in iter_dataset_chunks(files, chunk_size, data_format, usecols=usecols))
+    else:
+        all_dtypes = (_columnar_file_dtypes(file, data_format, usecols) for file in files)
+
+    dtypes = {}
+    for chunk_dtypes in all_dtypes:
+        for name, dtype in chunk_dtypes.items():
+            dtypes[name] = _common_dtype(dtypes[name], dtype) if name in dtypes else dtype
+    return dtypes
+
+
+class DatasetWriter:
+    """
+    Writes dataframes to a single dataset file, one chunk at a time.
+
+    CSV chunks are appended as text, parquet chunks are written as row groups and feather
+    chunks as record batches of an uncompressed Arrow IPC file, which can be memory-mapped
+    by the readers. Columnar files take the schema of the first non-empty chunk, so every
+    chunk must have the same column types, see `scan_dataset_dtypes`.
+
+    Parameters
+    ----------
+    file_path : str
+        The path of the file to write.
+
+    data_format : str, optional
+        One of the keys of `DATASET_FORMATS`. The default is 'csv'.
+    """
+
+    def __init__(self, file_path: str, data_format: str = "csv"):
+        _check_format(data_format)
+        self.file_path = file_path
+        self.data_format = data_format
+        self.rows = 0
+        self._file = None
+        self._writer = None
+        self._schema = None
+        self._empty = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        Appends a dataframe to the file.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The rows to write.
+
+        Returns
+        -------
+        None : The function writes the rows to the file.
+        """
+        if self.data_format == "csv":
+            write_header = self._file is None
+            if write_header:
+                self._file = open(self.file_path, "w", newline="")
+            df.to_csv(self._file, header=write_header, index=False)
+            self.rows += len(df)
+            return
+
+        # Empty chunks have no reliable column types, keep them only for an empty file
+        if len(df) == 0:
+            self._empty = df
+            return
+
+        pyarrow = _import_pyarrow()
+        try:
+            table = pyarrow.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+            raise ValueError(
+                f"The chunk does not match the column types of the previous chunks {self._schema}: {e}"
+            ) from e
+        if self._writer is None:
+            # A column of missing values has no type yet, keep it as text for the later chunks
+            for index, field in enumerate(table.schema):
+                if pyarrow.types.is_null(field.type):
+                    table = table.set_column(index, field.with_type(pyarrow.string()), table.column(index).cast(pyarrow.string()))
+            self._schema = table.schema
+            if self.data_format == "parquet":
+                self._writer = pyarrow.parquet.ParquetWriter(self.file_path, self._schema)
+            else:
+                self._writer = pyarrow.ipc.new_file(
+                    self.file_path,
+                    self._schema,
+                    options=pyarrow.ipc.IpcWriteOptions(compression=None),
+                )
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        """
+        Flushes and closes the file, writing an empty dataset if no rows were written.
+
+        Returns
+        -------
+        None : The function closes the file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        elif self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        elif self._empty is not None:
+            if self.data_format == "parquet":
+                self._empty.to_parquet(self.file_path, index=False)
+            else:
+                self._empty.reset_index(drop=True).to_feather(
+                    self.file_path, compression="uncompressed"
+                )
+            self._empty = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
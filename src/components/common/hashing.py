@@ -0,0 +1,91 @@
+import hashlib
+import os
+from components.common.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# Bytes read at a time when hashing files
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def hash_file(file_path: str, hasher=None, block_size: int = HASH_BLOCK_SIZE):
+    """
+    Feeds the content of a file to a hash in fixed-size blocks.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the file.
+
+    hasher : hashlib hash, optional
+        The hash to update. Defaults to None, which creates a new sha256 hash.
+
+    block_size : int, optional
+        The number of bytes read at a time, which bounds the memory used.
+
+    Returns
+    -------
+    hashlib hash : The updated hash.
+    """
+    hasher = hasher or hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hasher.update(block)
+    return hasher
+
+
+def hash_files(file_paths: list, root: str = None, block_size: int = HASH_BLOCK_SIZE) -> str:
+    """
+    Computes a sha256 fingerprint of the names and contents of files, streaming their contents.
+
+    The files are hashed in sorted order of their names, so the fingerprint only changes when
+    a file is added, removed, renamed or modified.
+
+    Parameters
+    ----------
+    file_paths : list of str
+        Paths of the files.
+
+    root : str, optional
+        The folder the names are taken relative to. Defaults to None, which only uses the
+        base names of the files.
+
+    block_size : int, optional
+        The number of bytes read at a time.
+
+    Returns
+    -------
+    str : The hexadecimal fingerprint.
+    """
+    names = {
+        (os.path.relpath(path, root) if root else os.path.basename(path)).replace(os.sep, "/"): path
+        for path in file_paths
+    }
+    hasher = hashlib.sha256()
+    for name in sorted(names):
+        # Length-prefixed names keep the boundaries between names and contents unambiguous
+        encoded = name.encode("utf-8")
+        hasher.update(len(encoded).to_bytes(8, "little"))
+        hasher.update(encoded)
+        hasher.update(os.path.getsize(names[name]).to_bytes(8, "little"))
+        hash_file(names[name], hasher, block_size)
+    return hasher.hexdigest()
+
+
+def hash_frame(df) -> str:
+    """
+    Computes a sha256 fingerprint of the column names, types and rows of a dataframe.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe, its index is ignored.
+
+    Returns
+    -------
+    str : The hexadecimal fingerprint.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(repr([(str(name), str(dtype)) for name, dtype in df.dtypes.items()]).encode("utf-8"))
+    hasher.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return hasher.hexdigest()
@@ -0,0 +1,42 @@
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is only imported on the first access to one of its attributes.
+
+    Every attribute is looked up on the imported module, which `importlib` keeps in
+    `sys.modules`, so the stand-in always sees the current attributes of the module, including
+    attributes patched in tests. Attributes set on the stand-in itself take precedence.
+
+    Parameters
+    ----------
+    name : str
+        The full name of the module, e.g. 'mlflow' or 'sklearn.model_selection'.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(importlib.import_module(self.__name__), name)
+
+    def __dir__(self) -> list:
+        return dir(importlib.import_module(self.__name__))
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Defers the import of a module until it is used.
+
+    Components import mlflow, pandas and scikit-learn through this function, so importing a
+    component, or running a code path that does not need them, does not pay their import time.
+
+    Parameters
+    ----------
+    name : str
+        The full name of the module.
+
+    Returns
+    -------
+    LazyModule : The stand-in of the module.
+    """
+    return LazyModule(name)
@@ -0,0 +1,308 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from components.common.hashing import hash_file, hash_files
+
+# Folder of the component packages whose source is part of every cache key
+COMPONENTS_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def hash_path(path: str, hasher) -> None:
+    """
+    Feeds a file, or every file of a folder with their relative names, to a hash.
+
+    Parameters
+    ----------
+    path : str
+        The file or folder. Paths that do not exist are hashed by name only.
+
+    hasher : hashlib hash
+        The hash to update.
+
+    Returns
+    -------
+    None : The function updates the hash.
+    """
+    if os.path.isdir(path):
+        files = [file for file in glob.glob(os.path.join(path, "**", "*"), recursive=True) if os.path.isfile(file)]
+        hasher.update(b"dir:" + hash_files(files, root=path).encode("ascii"))
+    elif os.path.isfile(path):
+        hasher.update(b"file:")
+        hash_file(path, hasher)
+    else:
+        hasher.update(b"missing:" + str(path).encode("utf-8"))
+
+
+def source_fingerprint(root: str = COMPONENTS_ROOT) -> str:
+    """
+    Computes a fingerprint of the Python sources of the components.
+
+    Parameters
+    ----------
+    root : str, optional
+        The folder of the component packages.
+
+    Returns
+    -------
+    str : The hexadecimal fingerprint.
+    """
+    return hash_files(glob.glob(os.path.join(root, "**", "*.py"), recursive=True), root=root)
+
+
+class StepCache:
+    """
+    Content-addressed cache of the outputs of pipeline steps in a local directory.
+
+    The key of a step run hashes the step name, its arguments, the contents of its input
+    files and folders, streamed in blocks, and the source of the components. On a hit the
+    stored outputs are copied to the output paths and the step is skipped. Every entry is
+    a folder with a `manifest.json` and a copy of every output, and the least recently used
+    entries are evicted when the cache exceeds its disk budget.
+
+    Parameters
+    ----------
+    root : str
+        The directory of the cache.
+
+    max_bytes : int, optional
+        The disk budget of the stored outputs. Defaults to None, which never evicts entries.
+    """
+
+    def __init__(self, root: str, max_bytes: int = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def key(self, step_name: str, kwargs: dict, input_args: list, output_args: list, ignored_args: list = None, extra_inputs: list = None) -> str:
+        """
+        Computes the cache key of a step run.
+
+        Parameters
+        ----------
+        step_name : str
+            The name of the step.
+
+        kwargs : dict
+            The arguments of the step.
+
+        input_args : list of str
+            The arguments holding input paths, or lists of input paths, whose contents are hashed.
+
+        output_args : list of str
+            The arguments holding output paths, which do not change the key.
+
+        ignored_args : list of str, optional
+            Arguments that do not change the outputs, such as the number of threads.
+
+        extra_inputs : list of str, optional
+            Other files or folders the step reads, such as files referenced by its inputs.
+
+        Returns
+        -------
+        str : The hexadecimal key.
+        """
+        hasher = hashlib.sha256()
+        hasher.update(step_name.encode("utf-8"))
+        hasher.update(source_fingerprint().encode("ascii"))
+
+        skipped = set(input_args) | set(output_args) | set(ignored_args or [])
+        params = {name: value for name, value in kwargs.items() if name not in skipped}
+        hasher.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+
+        for name in input_args:
+            paths = kwargs.get(name)
+            hasher.update(b"input:" + name.encode("utf-8"))
+            for path in paths if isinstance(paths, (list, tuple)) else [paths]:
+                if path is not None:
+                    hash_path(path, hasher)
+        for path in extra_inputs or []:
+            hash_path(path, hasher)
+
+        # Whether every output is requested changes which outputs the step writes
+        hasher.update(json.dumps([kwargs.get(name) is not None for name in output_args]).encode("utf-8"))
+        return hasher.hexdigest()
+
+    def _write_manifest(self, entry_path: str, manifest: dict) -> None:
+        """
+        Replaces the manifest of an entry atomically.
+
+        Parameters
+        ----------
+        entry_path : str
+            The folder of the entry.
+
+        manifest : dict
+            The manifest.
+
+        Returns
+        -------
+        None : The function writes the manifest.
+        """
+        manifest_file = os.path.join(entry_path, "manifest.json")
+        with open(manifest_file + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=4)
+        os.replace(manifest_file + ".tmp", manifest_file)
+
+    def restore(self, key: str, outputs: dict) -> bool:
+        """
+        Copies the stored outputs of a key to the output paths.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+
+        outputs : dict
+            The output path of every output argument.
+
+        Returns
+        -------
+        bool : Whether the key was found.
+        """
+        entry_path = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(entry_path, "manifest.json"), "r") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        for name, kind in manifest["outputs"].items():
+            stored, target = os.path.join(entry_path, "outputs", name), outputs.get(name)
+            if kind == "dir":
+                shutil.copytree(stored, target, dirs_exist_ok=True)
+            elif kind == "file":
+                if os.path.dirname(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(stored, target)
+
+        manifest["last_used"] = time.time()
+        self._write_manifest(entry_path, manifest)
+        return True
+
+    def store(self, key: str, step_name: str, outputs: dict) -> bool:
+        """
+        Stores the outputs of a step run under its key and evicts entries over the disk budget.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+
+        step_name : str
+            The name of the step.
+
+        outputs : dict
+            The output path of every output argument, missing outputs are recorded as absent.
+
+        Returns
+        -------
+        bool : Whether the entry was stored, outputs over the whole disk budget are not.
+        """
+        staging_path = tempfile.mkdtemp(dir=self.root, prefix=".staging-")
+        try:
+            os.makedirs(os.path.join(staging_path, "outputs"))
+            kinds, size = {}, 0
+            for name, path in outputs.items():
+                stored = os.path.join(staging_path, "outputs", name)
+                if path is not None and os.path.isdir(path):
+                    shutil.copytree(path, stored)
+                    kinds[name] = "dir"
+                    size += sum(os.path.getsize(file) for file in glob.glob(os.path.join(stored, "**", "*"), recursive=True) if os.path.isfile(file))
+                elif path is not None and os.path.isfile(path):
+                    shutil.copyfile(path, stored)
+                    kinds[name] = "file"
+                    size += os.path.getsize(stored)
+                else:
+                    kinds[name] = "absent"
+
+            # Outputs larger than the whole budget are not worth evicting everything else
+            if self.max_bytes is not None and size > self.max_bytes:
+                print(f"Not caching {step_name}, its {size} bytes of outputs exceed the cache budget")
+                return False
+
+            now = time.time()
+            self._write_manifest(staging_path, {"step": step_name, "created_at": now, "last_used": now, "size": size, "outputs": kinds})
+            entry_path = os.path.join(self.root, key)
+            shutil.rmtree(entry_path, ignore_errors=True)
+            os.rename(staging_path, entry_path)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+        self.evict()
+        return True
+
+    def evict(self) -> list:
+        """
+        Removes the least recently used entries until the cache fits its disk budget.
+
+        Returns
+        -------
+        list of str : The keys of the removed entries.
+        """
+        if self.max_bytes is None:
+            return []
+
+        entries = []
+        for key in os.listdir(self.root):
+            try:
+                with open(os.path.join(self.root, key, "manifest.json"), "r") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entries.append((manifest["last_used"], manifest["size"], key))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= size
+            evicted.append(key)
+        return evicted
+
+    def run(self, step_name: str, step, kwargs: dict, input_args: list, output_args: list, ignored_args: list = None, extra_inputs: list = None):
+        """
+        Runs a step unless its outputs for the same inputs, arguments and source are cached.
+
+        Parameters
+        ----------
+        step_name : str
+            The name of the step.
+
+        step : callable
+            The step, called with `kwargs`.
+
+        kwargs : dict
+            The arguments of the step.
+
+        input_args : list of str
+            The arguments holding input paths, see `key`.
+
+        output_args : list of str
+            The arguments holding output paths.
+
+        ignored_args : list of str, optional
+            Arguments that do not change the outputs.
+
+        extra_inputs : list of str, optional
+            Other files or folders the step reads.
+
+        Returns
+        -------
+        bool : Whether the outputs were restored from the cache.
+        """
+        key = self.key(step_name, kwargs, input_args, output_args, ignored_args, extra_inputs)
+        outputs = {name: kwargs.get(name) for name in output_args}
+        if self.restore(key, outputs):
+            print(f"Restored the outputs of {step_name} from the cache entry {key}")
+            return True
+
+        step(**kwargs)
+        if self.store(key, step_name, outputs):
+            print(f"Cached the outputs of {step_name} as entry {key}")
+        return False
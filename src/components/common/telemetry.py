@@ -0,0 +1,244 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from components.common.lazy_import import lazy_import
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+mlflow = lazy_import("mlflow")
+
+# Environment variables configuring the telemetry of the components and scripts
+TELEMETRY_FILE_ENV = "TELEMETRY_FILE"
+TELEMETRY_MLFLOW_ENV = "TELEMETRY_MLFLOW"
+
+# Shared context returned by the spans of disabled telemetry
+_NULL_SPAN = nullcontext()
+
+
+def peak_rss_mb() -> float:
+    """
+    Reads the peak resident set size of the current process.
+
+    Returns
+    -------
+    float : The peak resident set size in MiB, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB and macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class Telemetry:
+    """
+    Timed spans, counters and peak memory samples of a pipeline step.
+
+    Every finished span and event is written as a JSON line to the telemetry file, and a
+    summary line with the counters and the total time of every span is written on `close`.
+    The summary can also be logged to the active MLflow run in a single `log_metrics` call,
+    or to a given run in a single `log_batch` call of an `MlflowClient`.
+    Spans, counters and events are thread safe. When the telemetry is disabled they return
+    immediately, so components can call them unconditionally.
+
+    Parameters
+    ----------
+    step_name : str
+        The name of the step, written in every line.
+
+    file_path : str, optional
+        The JSON lines file, appended to. Defaults to None, which writes no lines.
+
+    log_to_mlflow : bool, optional
+        Whether `close` logs the summary as metrics of the active MLflow run. Defaults to False.
+
+    run_id : str, optional
+        The MLflow run the summary is logged to instead of the active run, e.g. by a step
+        running in a thread, where the active run of another thread must not be used.
+        Defaults to None.
+    """
+
+    def __init__(self, step_name: str, file_path: str = None, log_to_mlflow: bool = False, run_id: str = None):
+        self.step_name = step_name
+        self.file_path = file_path
+        self.log_to_mlflow = log_to_mlflow
+        self.run_id = run_id
+        self.enabled = bool(file_path or log_to_mlflow)
+        self.span_seconds = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._start = time.perf_counter()
+        if file_path:
+            if os.path.dirname(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            self._file = open(file_path, "a")
+
+    @classmethod
+    def from_env(cls, step_name: str, run_id: str = None) -> "Telemetry":
+        """
+        Creates the telemetry of a step configured by the environment.
+
+        `TELEMETRY_FILE` sets the JSON lines file and `TELEMETRY_MLFLOW=1` logs the summary to
+        MLflow. The telemetry is disabled when neither is set.
+
+        Parameters
+        ----------
+        step_name : str
+            The name of the step.
+
+        run_id : str, optional
+            The MLflow run the summary is logged to. Defaults to None, which uses the active run.
+
+        Returns
+        -------
+        Telemetry : The telemetry.
+        """
+        log_to_mlflow = os.environ.get(TELEMETRY_MLFLOW_ENV, "").lower() in ("1", "true", "yes")
+        return cls(step_name, os.environ.get(TELEMETRY_FILE_ENV) or None, log_to_mlflow, run_id)
+
+    def _write(self, record: dict) -> None:
+        """
+        Writes a JSON line to the telemetry file.
+
+        Parameters
+        ----------
+        record : dict
+            The fields of the line, the step name and time are added.
+
+        Returns
+        -------
+        None : The function writes the line.
+        """
+        if self._file is not None:
+            line = json.dumps({"step": self.step_name, "time": time.time(), **record}, default=str)
+            with self._lock:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def span(self, name: str):
+        """
+        Times a block of code, e.g. `with telemetry.span("predict"):`.
+
+        The time of all the spans with the same name is summed in the summary.
+
+        Parameters
+        ----------
+        name : str
+            The name of the span, e.g. 'load', 'split', 'predict', 'metrics' or 'write'.
+
+        Returns
+        -------
+        context manager : The span.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._timed_span(name)
+
+    @contextmanager
+    def _timed_span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.span_seconds[name] = self.span_seconds.get(name, 0.0) + seconds
+            self._write({"span": name, "seconds": seconds, "peak_rss_mb": peak_rss_mb()})
+
+    def count(self, name: str, value: float = 1) -> None:
+        """
+        Adds to a counter, e.g. the rows or bytes processed.
+
+        Parameters
+        ----------
+        name : str
+            The name of the counter.
+
+        value : float, optional
+            The amount added. Defaults to 1.
+
+        Returns
+        -------
+        None : The function updates the counter.
+        """
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def event(self, message: str, **fields) -> None:
+        """
+        Writes a message as a JSON line.
+
+        Parameters
+        ----------
+        message : str
+            The message.
+
+        **fields
+            Other fields of the line.
+
+        Returns
+        -------
+        None : The function writes the line.
+        """
+        if self.enabled:
+            self._write({"event": message, **fields})
+
+    def summary(self) -> dict:
+        """
+        Summarizes the spans, counters and peak memory of the step.
+
+        Returns
+        -------
+        dict : The total seconds of every span as '<span>_seconds', the counters, the total
+            seconds since the telemetry was created and the peak resident set size.
+        """
+        with self._lock:
+            summary = {f"{name}_seconds": seconds for name, seconds in self.span_seconds.items()}
+            summary.update(self.counters)
+        summary["total_seconds"] = time.perf_counter() - self._start
+        rss = peak_rss_mb()
+        if rss is not None:
+            summary["peak_rss_mb"] = rss
+        return summary
+
+    def close(self) -> None:
+        """
+        Writes the summary line, logs it to MLflow when configured and closes the file.
+
+        The telemetry records nothing more once closed.
+
+        Returns
+        -------
+        None : The function writes the summary.
+        """
+        if not self.enabled:
+            return
+        summary = self.summary()
+        self._write({"summary": summary})
+        if self.log_to_mlflow and self.run_id is not None:
+            timestamp = int(time.time() * 1000)
+            mlflow.MlflowClient().log_batch(self.run_id, metrics=[
+                mlflow.entities.Metric(f"telemetry.{name}", value, timestamp, 0) for name, value in summary.items()
+            ])
+        elif self.log_to_mlflow and mlflow.active_run() is not None:
+            # One batched call instead of one request per metric
+            mlflow.log_metrics({f"telemetry.{name}": value for name, value in summary.items()})
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        # Nothing more is recorded, so closing again does nothing
+        self.enabled = False
+
+    def __enter__(self) -> "Telemetry":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
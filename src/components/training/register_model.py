@@ -1,11 +1,13 @@
 import argparse
 import json
-import mlflow
-import mlflow.sklearn
 import os
+from components.common.lazy_import import lazy_import
+from components.common.telemetry import Telemetry
 
+mlflow = lazy_import("mlflow")
 
-def log_report(report: list, log_entry: str) -> None:
+
+def log_report(report: list, log_entry: str, telemetry: Telemetry = None) -> None:
     """
     Logs an entry to the report list.
 
@@ -17,12 +19,17 @@ def log_report(report: list, log_entry: str) -> None:
     log_entry : str
         The entry to log to the report list.
 
+    telemetry : Telemetry, optional
+        The telemetry the entry is also written to as an event.
+
     Returns
     -------
     None : The function logs the entry to the report list.
     """
     report.append(log_entry)
     print(log_entry)
+    if telemetry is not None:
+        telemetry.event(log_entry)
 
 
 def register_trained_model(
@@ -35,13 +42,17 @@ def register_trained_model(
     """
     Registers a trained model with MLflow if the comparison report shows better results.
 
+    The comparison report is checked before any MLflow work, so no run is started when the
+    registration is aborted. The MLflow model directory is logged as run artifacts and
+    registered as it is, without loading and serialising the model again.
+
     Parameters
     ----------
     comparison_report : str
         The path to the comparison report generated during model training.
 
     model_path : str
-        The path to the trained model.
+        The path to the trained MLflow model directory.
 
     model_name : str
         The name of the model.
@@ -56,49 +67,53 @@ def register_trained_model(
     -------
     None : The function registers the trained model with MLflow.
     """
-    # Start Logging with mlflow using context manager
-    with mlflow.start_run():
-        # enable autologging
-        mlflow.sklearn.autolog()
-
+    with Telemetry.from_env("register_model") as telemetry:
         print("Initializing model registration report...")
         registration_report = []
 
-        log_report(registration_report, "Starting model registration...")
+        log_report(registration_report, "Starting model registration...", telemetry)
         # check if the comparison report exists
         if os.path.exists(comparison_report):
             # Load the json comparison report
-            log_report(registration_report, "Loading json comparison report...")
+            log_report(registration_report, "Loading json comparison report...", telemetry)
             with open(comparison_report, "r") as f:
                 cp_report = json.load(f)
 
             if cp_report["best_model_id"] == model_id:
                 log_report(
-                    registration_report, "Trained model is better than existing."
-                )
-
-                # Load the trained model
-                log_report(registration_report, "Loading trained model...")
-                model = mlflow.sklearn.load_model(model_path)
-                log_report(registration_report, f"Loaded model: {model}")
-
-                # Register the model
-                log_report(registration_report, f"Registering model as: {model_name}")
-                mlflow.sklearn.log_model(
-                    sk_model=model,
-                    registered_model_name=model_name,
-                    artifact_path=model_name,
-                    serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE,
+                    registration_report, "Trained model is better than existing.", telemetry
                 )
-                log_report(registration_report, "Model registration complete.")
+                if not os.path.isfile(os.path.join(model_path, "MLmodel")):
+                    raise ValueError(f"{model_path} is not an MLflow model directory")
+
+                # Start Logging with mlflow using context manager
+                with mlflow.start_run() as run:
+                    # Copy the model directory to the run artifacts as it is
+                    log_report(registration_report, "Logging trained model files...", telemetry)
+                    with telemetry.span("write"):
+                        mlflow.log_artifacts(model_path, artifact_path=model_name)
+                    if telemetry.enabled:
+                        telemetry.count("model_bytes", sum(
+                            os.path.getsize(os.path.join(folder, name)) for folder, _, names in os.walk(model_path) for name in names
+                        ))
+
+                    # Register the model
+                    log_report(registration_report, f"Registering model as: {model_name}", telemetry)
+                    with telemetry.span("register"):
+                        model_version = mlflow.register_model(f"runs:/{run.info.run_id}/{model_name}", model_name)
+                    log_report(registration_report, f"Registered model version: {model_version.version}", telemetry)
+                    log_report(registration_report, "Model registration complete.", telemetry)
+
+                    # Log the telemetry to the run before it ends, closing again on exit does nothing
+                    telemetry.close()
             else:
                 log_report(
-                    registration_report, "Existing model is better than trained model."
+                    registration_report, "Existing model is better than trained model.", telemetry
                 )
-                log_report(registration_report, "Model registration aborted.")
+                log_report(registration_report, "Model registration aborted.", telemetry)
         else:
-            log_report(registration_report, "Comparison report not found.")
-            log_report(registration_report, "Model registration aborted.")
+            log_report(registration_report, "Comparison report not found.", telemetry)
+            log_report(registration_report, "Model registration aborted.", telemetry)
 
         # Save the report
         os.makedirs(os.path.dirname(register_report), exist_ok=True)
@@ -1,19 +1,198 @@
 import argparse
-import glob
 import os
-import pandas as pd
-import mlflow
-import mlflow.sklearn
-from sklearn.model_selection import train_test_split
+from contextlib import ExitStack
+from components.common.data_loader import DatasetWriter, dataset_file_name, find_dataset_files, iter_dataset_chunks, read_dataset_files, scan_dataset_dtypes
+from components.common.lazy_import import lazy_import
+from components.common.step_cache import StepCache
+from components.common.telemetry import Telemetry
+from components.training.split_strategies import SPLIT_STRATEGIES, make_assigner
 
-def split_dataset(input_data_path:str, train_path:str, test_path:str, split_ratio:float=0.7)->None:
+mlflow = lazy_import("mlflow")
+model_selection = lazy_import("sklearn.model_selection")
+
+def open_fold_writers(stack:ExitStack, folds_path:str, n_folds:int, output_format:str='csv')->list:
+    """
+    Creates the train and test folders of every fold and opens their dataset writers.
+
+    Parameters
+    ----------
+    stack : ExitStack
+        The exit stack closing the writers.
+
+    folds_path : str
+        The directory path where the `fold_<i>/train` and `fold_<i>/test` folders are created.
+
+    n_folds : int
+        The number of folds.
+
+    output_format : str, optional
+        The format of the fold datasets. The default value is 'csv'.
+
+    Returns
+    -------
+    list : The training and testing writers of every fold.
+    """
+    fold_writers = []
+    for fold in range(n_folds):
+        fold_train_path = os.path.join(folds_path, f'fold_{fold}', 'train')
+        fold_test_path = os.path.join(folds_path, f'fold_{fold}', 'test')
+        os.makedirs(fold_train_path, exist_ok=True)
+        os.makedirs(fold_test_path, exist_ok=True)
+
+        train_out = stack.enter_context(DatasetWriter(os.path.join(fold_train_path, dataset_file_name("train_data", output_format)), output_format))
+        test_out = stack.enter_context(DatasetWriter(os.path.join(fold_test_path, dataset_file_name("test_data", output_format)), output_format))
+        fold_writers.append((train_out, test_out))
+    return fold_writers
+
+def write_folds(df, folds, fold_writers:list)->None:
+    """
+    Writes rows to the fold datasets: every row goes to the test set of its own fold and to
+    the training set of all the other folds.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The rows to write.
+
+    folds : np.ndarray
+        The fold index of every row.
+
+    fold_writers : list
+        The training and testing writers of every fold, see `open_fold_writers`.
+
+    Returns
+    -------
+    None : The function writes the rows to the fold datasets.
+    """
+    for fold, (train_out, test_out) in enumerate(fold_writers):
+        in_fold = folds == fold
+        test_out.write(df[in_fold])
+        train_out.write(df[~in_fold])
+
+def stream_split(input_files:list, train_file:str, test_file:str, split_ratio:float=0.7, chunk_size:int=100000, seed:int=42, input_format:str='csv', output_format:str='csv', strategy:str='random', split_column:str=None, cutoff:str=None, folds_path:str=None, n_folds:int=None)->tuple:
+    """
+    Splits dataset files into training and testing files one chunk at a time.
+
+    With the 'random' strategy each row is sent to the training file when a uniform draw from
+    a generator seeded with `seed` is below `split_ratio`. The draws are consumed row by row,
+    so the split only depends on the seed and the row order, not on the chunk size. The
+    training fraction is binomial: for n rows it stays within
+    3 * sqrt(split_ratio * (1 - split_ratio) / n) of `split_ratio` with 99.7% probability
+    (about +/-0.0014 for a million rows at 0.7). The other strategies are described in
+    `split_strategies`. When `n_folds` is set, the K-fold datasets are written from the same
+    chunks, so the input is only read once.
+
+    Peak memory is bounded by a single chunk, independently of the input size. All files are
+    expected to share the same columns. Parquet and feather outputs need the same column
+    types in every chunk, so CSV inputs are read once more beforehand to find them.
+
+    Parameters
+    ----------
+    input_files : list of str
+        The dataset files to split, read in the given order.
+
+    train_file : str
+        The file path where the training rows will be written.
+
+    test_file : str
+        The file path where the testing rows will be written.
+
+    split_ratio : float, optional
+        The expected fraction of rows sent to the training file. The default value is 0.7.
+
+    chunk_size : int, optional
+        The number of rows read from the input at a time. The default value is 100000.
+
+    seed : int, optional
+        The seed of the random generator deciding the split. The default value is 42.
+
+    input_format : str, optional
+        The format of the input files. The default value is 'csv'.
+
+    output_format : str, optional
+        The format of the training and testing files. The default value is 'csv'.
+
+    strategy : str, optional
+        The split strategy: 'random', 'stratified', 'group' or 'temporal'.
+        The default value is 'random'.
+
+    split_column : str, optional
+        The stratum column of the 'stratified' strategy, the group key column of the
+        'group' strategy or the time column of the 'temporal' strategy.
+
+    cutoff : str, optional
+        The first time value of the testing file for the 'temporal' strategy.
+
+    folds_path : str, optional
+        The directory path where the K-fold datasets are written when `n_folds` is set.
+
+    n_folds : int, optional
+        The number of folds to write, no folds are written when not set.
+
+    Returns
+    -------
+    tuple : The number of rows written to the training and testing files.
+    """
+    assigner = make_assigner(strategy, [split_ratio, 1 - split_ratio], seed, split_column, cutoff)
+    fold_assigner = make_assigner(strategy, [1 / n_folds] * n_folds, seed + 1, split_column) if n_folds else None
+    with ExitStack() as stack:
+        train_out = stack.enter_context(DatasetWriter(train_file, output_format))
+        test_out = stack.enter_context(DatasetWriter(test_file, output_format))
+        fold_writers = open_fold_writers(stack, folds_path, n_folds, output_format) if n_folds else []
+
+        # Columnar files need the same column types in every chunk
+        dtype = scan_dataset_dtypes(input_files, chunk_size, input_format) if output_format != 'csv' else None
+        for chunk in iter_dataset_chunks(input_files, chunk_size, input_format, dtype):
+            is_train = assigner.assign(chunk) == 0
+            train_out.write(chunk[is_train])
+            test_out.write(chunk[~is_train])
+            if fold_assigner is not None:
+                write_folds(chunk, fold_assigner.assign(chunk), fold_writers)
+
+    return train_out.rows, test_out.rows
+
+def split_frame(df, split_ratio:float=0.7, seed:int=42, strategy:str='random', split_column:str=None, cutoff:str=None)->tuple:
+    """
+    Splits an in-memory dataframe into training and testing dataframes.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        The dataset.
+
+    split_ratio : float, optional
+        The ratio of the dataset to be used for training. The default value is 0.7.
+
+    seed : int, optional
+        The random seed used for the split. The default value is 42.
+
+    strategy : str, optional
+        How rows are split, see `split_dataset`. The default value is 'random'.
+
+    split_column : str, optional
+        The column used by the 'stratified', 'group' and 'temporal' strategies.
+
+    cutoff : str, optional
+        The first time value of the testing dataset for the 'temporal' strategy.
+
+    Returns
+    -------
+    tuple : The training and testing dataframes.
+    """
+    if strategy == 'random':
+        return model_selection.train_test_split(df, test_size=(1 - split_ratio), random_state=seed)
+    assigner = make_assigner(strategy, [split_ratio, 1 - split_ratio], seed, split_column, cutoff)
+    is_train = assigner.assign(df) == 0
+    return df[is_train], df[~is_train]
+
+def split_dataset(input_data_path:str, train_path:str, test_path:str, split_ratio:float=0.7, chunk_size:int=None, seed:int=42, max_workers:int=None, output_format:str='csv', strategy:str='random', split_column:str=None, cutoff:str=None, folds_path:str=None, n_folds:int=None, keep_frames:bool=False):
     """
     Splits a dataset into training and testing sets and saves them to specified paths.
 
     Parameters
     ----------
     input_data_path : str
-        The directory path where the input CSV files are located.
+        The directory path where the input CSV, parquet or feather files are located.
     
     train_path : str 
         The directory path where the training dataset will be saved.
@@ -24,40 +203,133 @@ def split_dataset(input_data_path:str, train_path:str, test_path:str, split_rati
     split_ratio : float, optional
         The ratio of the dataset to be used for training. 
         The default value is 0.7, meaning 70% of the data will be used for training and 30% for testing.
+
+    chunk_size : int, optional
+        When set, the dataset is streamed in chunks of this many rows instead of being loaded
+        in memory, and each row is assigned with a seeded random draw (see `stream_split`).
+        The default value is None, which loads the whole dataset in memory.
+
+    seed : int, optional
+        The random seed used for the split. The default value is 42.
+
+    max_workers : int, optional
+        The number of threads reading the input files concurrently in memory mode.
+        The default value is None, which lets the thread pool pick its size.
+
+    output_format : str, optional
+        The format of the training and testing datasets: 'csv', 'parquet' or 'feather'.
+        The columnar formats keep the column types and can be read back memory-mapped.
+        The default value is 'csv'.
+
+    strategy : str, optional
+        How rows are split: 'random' draws every row independently, 'stratified' keeps the
+        split ratio within every value of `split_column` (e.g. an imbalanced label),
+        'group' keeps all rows sharing a `split_column` value on the same side, so no entity
+        leaks between training and testing, and 'temporal' trains on the rows whose
+        `split_column` time is before `cutoff` and tests on the others, ignoring
+        `split_ratio`. The default value is 'random'.
+
+    split_column : str, optional
+        The column used by the 'stratified', 'group' and 'temporal' strategies.
+
+    cutoff : str, optional
+        The first time value of the testing dataset for the 'temporal' strategy,
+        e.g. '2024-01-01'.
+
+    folds_path : str, optional
+        The directory path where the K-fold datasets are saved as `fold_<i>/train` and
+        `fold_<i>/test` folders when `n_folds` is set.
+
+    n_folds : int, optional
+        The number of folds, assigned with the same strategy (random, stratified or group)
+        from the same read of the input as the train and test datasets. Every row is in the
+        test set of one fold and in the training set of the others. No folds are written
+        when not set.
+
+    keep_frames : bool, optional
+        Whether to return the training and testing dataframes in memory mode, so a caller in
+        the same process does not read them back from disk. The default value is False.
         
     Returns
     -------
-    None : The function saves the training and testing datasets to the specified paths.
+    tuple or None : The function saves the training and testing datasets to the specified paths,
+        and returns them as dataframes when `keep_frames` is set and `chunk_size` is not.
     """
     # Start Logging with mlflow using context manager
-    with mlflow.start_run():
+    with mlflow.start_run(), Telemetry.from_env('split_data') as telemetry:
         # enable autologging
         mlflow.sklearn.autolog()
 
-        # Load the training data from the CSV files
+        # Load the training data from the dataset files
         print('Loacating training feature dataset files...')
-        csv_files = glob.glob(os.path.join(input_data_path, '*.csv'))
-        print(f'Found {len(csv_files)} files in training feature dataset')
+        input_files, input_format = find_dataset_files(input_data_path)
+        print(f'Found {len(input_files)} {input_format} files in training feature dataset')
+        if telemetry.enabled:
+            telemetry.count('input_bytes', sum(os.path.getsize(file) for file in input_files))
+
+        # Create directories if they don't exist
+        os.makedirs(train_path, exist_ok=True)
+        os.makedirs(test_path, exist_ok=True)
+
+        train_file = os.path.join(train_path, dataset_file_name("train_data", output_format))
+        test_file = os.path.join(test_path, dataset_file_name("test_data", output_format))
+
+        if strategy not in SPLIT_STRATEGIES:
+            raise ValueError(f'Unknown split strategy {strategy}, expected one of {SPLIT_STRATEGIES}')
+        if n_folds:
+            if n_folds < 2:
+                raise ValueError(f'At least 2 folds are needed, got {n_folds}')
+            if strategy == 'temporal':
+                raise ValueError('Folds are not supported with the temporal split strategy')
+            if not folds_path:
+                raise ValueError('A folds path is needed to save the folds')
+
+        if chunk_size:
+            if not input_files:
+                raise ValueError(f'No dataset files found in {input_data_path}')
+
+            print(f'Streaming training feature dataset files in chunks of {chunk_size} rows...')
+            with telemetry.span('split'):
+                train_rows, test_rows = stream_split(input_files, train_file, test_file, split_ratio, chunk_size, seed, input_format, output_format, strategy, split_column, cutoff, folds_path, n_folds)
+            telemetry.count('train_rows', train_rows)
+            telemetry.count('test_rows', test_rows)
+            print(f"Train dataset with {train_rows} rows saved to {train_path}")
+            print(f"Test dataset with {test_rows} rows saved to {test_path}")
+            if n_folds:
+                print(f"{n_folds} folds saved to {folds_path}")
+            return
 
         print('Loading training feature dataset files...')
-        df = pd.concat([pd.read_csv(file) for file in csv_files], ignore_index=True)
+        with telemetry.span('load'):
+            df = read_dataset_files(input_files, input_format, max_workers)
         print(f'Loaded files in dataframe with schema:')
         print(df.info())
 
         # Split the dataset
-        train_df, test_df = train_test_split(df, test_size=(1 - split_ratio), random_state=42)
+        with telemetry.span('split'):
+            train_df, test_df = split_frame(df, split_ratio, seed, strategy, split_column, cutoff)
+        telemetry.count('train_rows', len(train_df))
+        telemetry.count('test_rows', len(test_df))
 
-        # Create directories if they don't exist
-        os.makedirs(train_path, exist_ok=True)
-        os.makedirs(test_path, exist_ok=True)
-
-        train_file = os.path.join(train_path, "train_data.csv")
-        train_df.to_csv(train_file, index=False)
+        with telemetry.span('write'), DatasetWriter(train_file, output_format) as train_out:
+            train_out.write(train_df)
         print(f"Train dataset with {train_df.size} saved to {train_path}")
 
-        test_file = os.path.join(test_path, "test_data.csv")
-        test_df.to_csv(test_file, index=False)        
+        with telemetry.span('write'), DatasetWriter(test_file, output_format) as test_out:
+            test_out.write(test_df)
         print(f"Test dataset with {test_df.size} saved to {test_path}")
+        if not keep_frames:
+            del train_df, test_df
+
+        # Write the folds from the same in-memory copy, one fold at a time
+        if n_folds:
+            fold_assigner = make_assigner(strategy, [1 / n_folds] * n_folds, seed + 1, split_column)
+            with telemetry.span('write'), ExitStack() as stack:
+                write_folds(df, fold_assigner.assign(df), open_fold_writers(stack, folds_path, n_folds, output_format))
+            print(f"{n_folds} folds saved to {folds_path}")
+
+        if keep_frames:
+            return train_df, test_df
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -65,10 +337,33 @@ if __name__ == "__main__":
     parser.add_argument('--train_output', type=str, help='File path to save the training dataset')
     parser.add_argument('--test_output', type=str, help='File path to save the testing dataset')
     parser.add_argument('--split_ratio', type=float, default=0.7, help='Train-test split ratio, default is 0.7')
+    parser.add_argument('--chunk_size', type=int, default=None, help='Stream the dataset in chunks of this many rows, default loads it in memory')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed used for the split, default is 42')
+    parser.add_argument('--max_workers', type=int, default=None, help='Number of threads reading the input files, default lets the pool decide')
+    parser.add_argument('--output_format', type=str, default='csv', choices=['csv', 'parquet', 'feather'], help='Format of the train and test datasets, default is csv')
+    parser.add_argument('--split_strategy', type=str, default='random', choices=SPLIT_STRATEGIES, help='How rows are split, default is random')
+    parser.add_argument('--split_column', type=str, default=None, help='Stratum column for stratified splits, group key column for group splits or time column for temporal splits')
+    parser.add_argument('--cutoff', type=str, default=None, help='First time value of the test dataset for temporal splits')
+    parser.add_argument('--folds_output', type=str, default=None, help='Folder path to save the K-fold datasets')
+    parser.add_argument('--n_folds', type=int, default=None, help='Number of folds to save, default saves no folds')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory caching the outputs of identical runs, default runs without cache')
+    parser.add_argument('--cache_max_bytes', type=int, default=None, help='Disk budget of the cache, least recently used entries are evicted beyond it')
 
     args = parser.parse_args()
     print('Printing received arguments...')
     for arg_name in vars(args):
         print(f"{arg_name}: {getattr(args, arg_name)}")
 
-    split_dataset(args.input_data, args.train_output, args.test_output, args.split_ratio)
+    split_args = dict(
+        input_data_path=args.input_data, train_path=args.train_output, test_path=args.test_output,
+        split_ratio=args.split_ratio, chunk_size=args.chunk_size, seed=args.seed, max_workers=args.max_workers,
+        output_format=args.output_format, strategy=args.split_strategy, split_column=args.split_column,
+        cutoff=args.cutoff, folds_path=args.folds_output, n_folds=args.n_folds
+    )
+    if args.cache_dir:
+        StepCache(args.cache_dir, args.cache_max_bytes).run(
+            'split_data', split_dataset, split_args,
+            input_args=['input_data_path'], output_args=['train_path', 'test_path', 'folds_path'], ignored_args=['max_workers']
+        )
+    else:
+        split_dataset(**split_args)
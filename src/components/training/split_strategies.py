@@ -0,0 +1,286 @@
+from __future__ import annotations
+import numpy as np
+from components.common.lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+# Names of the supported split strategies
+SPLIT_STRATEGIES = ["random", "stratified", "group", "temporal"]
+
+
+def _normalize_keys(values: pd.Series) -> np.ndarray:
+    """
+    Converts column values to a representation that is stable across chunks.
+
+    Chunked readers may infer an integer column as float in one chunk and as integer in
+    another, so numeric values are compared as float64 and anything else as strings.
+
+    Parameters
+    ----------
+    values : pd.Series
+        The column values.
+
+    Returns
+    -------
+    np.ndarray : The normalized values.
+    """
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype="float64", na_value=np.nan)
+    return values.astype(str).where(values.notna(), None).to_numpy(dtype=object)
+
+
+class RandomAssigner:
+    """
+    Assigns every row to a bucket with an independent seeded random draw.
+
+    The draws are consumed row by row, so the assignment depends on the seed and the row
+    order but not on how the rows are chunked.
+
+    Parameters
+    ----------
+    weights : list of float
+        The expected fraction of rows in every bucket, summing to 1.
+
+    seed : int
+        The seed of the random generator.
+    """
+
+    def __init__(self, weights: list, seed: int):
+        self.boundaries = np.cumsum(weights)[:-1]
+        self.rng = np.random.default_rng(seed)
+
+    def assign(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        Assigns the rows of a chunk to buckets.
+
+        Parameters
+        ----------
+        chunk : pd.DataFrame
+            The next rows of the dataset.
+
+        Returns
+        -------
+        np.ndarray : The bucket index of every row.
+        """
+        return np.searchsorted(self.boundaries, self.rng.random(len(chunk)), side="right")
+
+
+class GroupAssigner:
+    """
+    Assigns whole groups to buckets by hashing the group key with a seed.
+
+    All rows sharing a key land in the same bucket, whatever chunk they are read in, so
+    no entity leaks between buckets and no state is kept between chunks. The weights apply
+    to the number of groups, so the row fractions are only close to them when groups are
+    many and of similar size.
+
+    Parameters
+    ----------
+    weights : list of float
+        The expected fraction of groups in every bucket, summing to 1.
+
+    column : str
+        The column holding the group key.
+
+    seed : int
+        The seed mixed into the hash.
+    """
+
+    def __init__(self, weights: list, column: str, seed: int):
+        self.boundaries = np.cumsum(weights)[:-1]
+        self.column = column
+        self.hash_key = f"{seed:016d}"[-16:]
+        self.seed_mix = np.uint64(seed & 0xFFFFFFFFFFFFFFFF)
+
+    def assign(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        Assigns the rows of a chunk to buckets.
+
+        Parameters
+        ----------
+        chunk : pd.DataFrame
+            The next rows of the dataset.
+
+        Returns
+        -------
+        np.ndarray : The bucket index of every row.
+        """
+        keys = _normalize_keys(chunk[self.column])
+        hashes = pd.util.hash_array(keys, hash_key=self.hash_key, categorize=True)
+        # Numeric keys are hashed without the key, so mix the seed in and hash again
+        hashes = pd.util.hash_array(hashes ^ self.seed_mix)
+        positions = (hashes >> np.uint64(11)) * 2.0**-53
+        return np.searchsorted(self.boundaries, positions, side="right")
+
+
+class StratifiedAssigner:
+    """
+    Assigns rows to buckets with per-stratum counters, keeping every bucket's share of each
+    stratum within one row of its weight.
+
+    Within a stratum, the k-th row lands at position frac(offset + k * step) of the unit
+    interval, where the offset is drawn once per stratum and `step` is the weight of the
+    last bucket. Only the offset and the row count of every stratum are kept, so memory
+    grows with the number of strata, not with the number of rows. Rows are visited in a
+    seeded random order within each chunk, so sorted inputs do not bias the assignment.
+    The weights must either be two arbitrary weights or all equal.
+
+    Parameters
+    ----------
+    weights : list of float
+        The fraction of every stratum in every bucket, summing to 1.
+
+    column : str
+        The column holding the stratum, usually the outcome label.
+
+    seed : int
+        The seed of the random generator.
+    """
+
+    def __init__(self, weights: list, column: str, seed: int):
+        if len(weights) > 2 and not np.allclose(weights, weights[0]):
+            raise ValueError("Stratified assignment needs two weights or equal weights")
+        self.boundaries = np.cumsum(weights)[:-1]
+        self.step = weights[-1]
+        self.column = column
+        self.rng = np.random.default_rng(seed)
+        self.strata = {}
+        self.offsets = np.empty(0)
+        self.counts = np.empty(0, dtype=np.int64)
+
+    def _stratum_indices(self, uniques: np.ndarray) -> np.ndarray:
+        """
+        Looks up the counter index of every stratum, registering the new ones.
+
+        Parameters
+        ----------
+        uniques : np.ndarray
+            The distinct strata of a chunk.
+
+        Returns
+        -------
+        np.ndarray : The counter index of every stratum.
+        """
+        indices = np.empty(len(uniques), dtype=np.int64)
+        new_strata = 0
+        for i, stratum in enumerate(uniques):
+            # NaN is not equal to itself, so give missing values a stable key
+            key = None if pd.isna(stratum) else stratum
+            if key not in self.strata:
+                self.strata[key] = len(self.strata)
+                new_strata += 1
+            indices[i] = self.strata[key]
+
+        if new_strata:
+            self.offsets = np.concatenate([self.offsets, self.rng.random(new_strata)])
+            self.counts = np.concatenate([self.counts, np.zeros(new_strata, dtype=np.int64)])
+        return indices
+
+    def assign(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        Assigns the rows of a chunk to buckets and updates the per-stratum counters.
+
+        Parameters
+        ----------
+        chunk : pd.DataFrame
+            The next rows of the dataset.
+
+        Returns
+        -------
+        np.ndarray : The bucket index of every row.
+        """
+        order = self.rng.permutation(len(chunk))
+        keys = _normalize_keys(chunk[self.column])[order]
+        codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+        strata = self._stratum_indices(uniques)[codes]
+
+        # Rank of every row within its stratum, continuing from the previous chunks
+        ranks = self.counts[strata] + pd.Series(codes).groupby(codes).cumcount().to_numpy()
+        positions = np.modf(self.offsets[strata] + ranks * self.step)[0]
+        np.add.at(self.counts, strata, 1)
+
+        buckets = np.empty(len(chunk), dtype=np.intp)
+        buckets[order] = np.searchsorted(self.boundaries, positions, side="right")
+        return buckets
+
+
+class TemporalAssigner:
+    """
+    Assigns rows before a cutoff to the first bucket and the other rows to the second one.
+
+    Numeric columns are compared with the cutoff as numbers, other columns as timestamps.
+    Rows with a missing value are never before the cutoff, so they go to the second bucket.
+
+    Parameters
+    ----------
+    column : str
+        The column holding the time of every row.
+
+    cutoff : str
+        The first time value of the second bucket.
+    """
+
+    def __init__(self, column: str, cutoff: str):
+        self.column = column
+        self.cutoff = cutoff
+
+    def assign(self, chunk: pd.DataFrame) -> np.ndarray:
+        """
+        Assigns the rows of a chunk to buckets.
+
+        Parameters
+        ----------
+        chunk : pd.DataFrame
+            The next rows of the dataset.
+
+        Returns
+        -------
+        np.ndarray : The bucket index of every row.
+        """
+        values = chunk[self.column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            before = values < float(self.cutoff)
+        else:
+            before = pd.to_datetime(values) < pd.Timestamp(self.cutoff)
+        return np.where(before.to_numpy(dtype=bool), 0, 1)
+
+
+def make_assigner(strategy: str, weights: list, seed: int, column: str = None, cutoff: str = None):
+    """
+    Creates the row assigner of a split strategy.
+
+    Parameters
+    ----------
+    strategy : str
+        One of `SPLIT_STRATEGIES`.
+
+    weights : list of float
+        The expected fraction of rows in every bucket, summing to 1.
+
+    seed : int
+        The random seed of the assignment.
+
+    column : str, optional
+        The stratum column for 'stratified', the group key column for 'group' or the time
+        column for 'temporal'.
+
+    cutoff : str, optional
+        The first time value of the second bucket for 'temporal', which ignores the weights.
+
+    Returns
+    -------
+    object : An assigner with an `assign(chunk)` method returning bucket indices.
+    """
+    if strategy == "random":
+        return RandomAssigner(weights, seed)
+    if strategy not in SPLIT_STRATEGIES:
+        raise ValueError(f"Unknown split strategy '{strategy}', expected one of {SPLIT_STRATEGIES}")
+    if not column:
+        raise ValueError(f"The '{strategy}' split strategy needs a split column")
+    if strategy == "stratified":
+        return StratifiedAssigner(weights, column, seed)
+    if strategy == "group":
+        return GroupAssigner(weights, column, seed)
+    if cutoff is None:
+        raise ValueError("The 'temporal' split strategy needs a cutoff")
+    return TemporalAssigner(column, cutoff)
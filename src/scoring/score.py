@@ -0,0 +1,1222 @@
+"""
+Scoring script of the registered classification model for Azure ML online endpoints.
+
+The endpoint calls `init` once per worker, which loads the MLflow model of the deployment,
+and `run` for every request. Requests are parsed with orjson when it is installed and their
+rows are copied into a preallocated float array in the order of the model features, instead
+of building a DataFrame per request. Models that need other column types fall back to a
+DataFrame. Concurrent requests can be micro-batched into one `predict` call. The script can
+also serve the model locally over HTTP for load tests.
+
+Besides JSON, requests can be sent as a NumPy `.npy` buffer (`application/x-npy`), decoded
+without copying, or an Arrow IPC stream (`application/vnd.apache.arrow.stream`), copied column
+by column into the feature array. The response uses the first of these content types listed
+in the Accept header, or else the content type of the request.
+
+Deploy it with:
+    python src/scripts/deploy_online_endpoint.py ... --scoring_file src/scoring/score.py
+
+Serve a model locally with:
+    python src/scoring/score.py --model_path <mlflow model folder> --port 5001
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import queue
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Raw HTTP access of the Azure ML inference server, installed with azureml-defaults
+    from azureml.contrib.services.aml_request import rawhttp
+    from azureml.contrib.services.aml_response import AMLResponse
+except ImportError:
+    rawhttp = None
+    AMLResponse = None
+
+# Rows of the feature array preallocated for every serving thread
+INITIAL_BUFFER_ROWS = 64
+
+# Environment variables configuring the micro-batching of concurrent requests
+MAX_BATCH_ROWS_ENV = "SCORING_MAX_BATCH_ROWS"
+MAX_LATENCY_MS_ENV = "SCORING_MAX_LATENCY_MS"
+
+# Environment variables configuring the prediction cache
+CACHE_ENTRIES_ENV = "SCORING_CACHE_ENTRIES"
+CACHE_TTL_SECONDS_ENV = "SCORING_CACHE_TTL_SECONDS"
+
+# JSON lines file of the request telemetry, named like the telemetry of the components
+TELEMETRY_FILE_ENV = "TELEMETRY_FILE"
+
+# Content types of the requests and responses
+JSON_CONTENT_TYPE = "application/json"
+NPY_CONTENT_TYPE = "application/x-npy"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+CONTENT_TYPES = (JSON_CONTENT_TYPE, NPY_CONTENT_TYPE, ARROW_CONTENT_TYPE)
+
+# Scorer of the deployed model, set by init
+scorer = None
+
+# Prediction cache kept across init calls, cleared when the model version changes
+prediction_cache = None
+
+# Request counters and latencies, set by init
+request_telemetry = None
+
+
+def loads(raw_data):
+    """
+    Parses a JSON request, with orjson when it is installed.
+
+    Parameters
+    ----------
+    raw_data : str or bytes
+        The JSON text.
+
+    Returns
+    -------
+    object : The parsed request.
+    """
+    if orjson is not None:
+        return orjson.loads(raw_data)
+    return json.loads(raw_data)
+
+
+def dumps(value) -> str:
+    """
+    Encodes a response as JSON text, with orjson when it is installed.
+
+    Parameters
+    ----------
+    value : object
+        The response, which may hold NumPy arrays.
+
+    Returns
+    -------
+    str : The JSON text.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+    return json.dumps(value.tolist() if isinstance(value, np.ndarray) else value)
+
+
+def read_npy(body) -> np.ndarray:
+    """
+    Decodes a NumPy `.npy` buffer without copying its values.
+
+    Parameters
+    ----------
+    body : bytes
+        The buffer.
+
+    Returns
+    -------
+    numpy.ndarray : A read-only view of the array in the buffer.
+    """
+    stream = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    except ValueError as error:
+        raise ValueError(f"The request is not a valid .npy buffer: {error}") from error
+    if dtype.hasobject:
+        raise ValueError("The .npy request holds Python objects")
+    count = int(np.prod(shape))
+    if len(body) - stream.tell() < count * dtype.itemsize:
+        raise ValueError("The .npy request is truncated")
+    values = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+    return values.reshape(shape, order="F" if fortran_order else "C")
+
+
+def encode(predictions: np.ndarray, content_type: str) -> bytes:
+    """
+    Encodes the predictions of a request in a response content type.
+
+    Parameters
+    ----------
+    predictions : numpy.ndarray
+        The predicted classes.
+
+    content_type : str
+        One of `CONTENT_TYPES`.
+
+    Returns
+    -------
+    bytes : The response body.
+    """
+    if content_type == NPY_CONTENT_TYPE:
+        stream = io.BytesIO()
+        np.lib.format.write_array(stream, np.ascontiguousarray(predictions), allow_pickle=False)
+        return stream.getvalue()
+    if content_type == ARROW_CONTENT_TYPE:
+        import pyarrow as pa
+
+        table = pa.table({"prediction": predictions})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return dumps(predictions).encode("utf-8")
+
+
+def media_type(header: str) -> str:
+    """
+    Extracts the media type of a Content-Type header, e.g. 'application/json; charset=utf-8'.
+
+    Parameters
+    ----------
+    header : str
+        The header, may be None.
+
+    Returns
+    -------
+    str : The lower case media type, '' when the header is not set.
+    """
+    return (header or "").split(";")[0].strip().lower()
+
+
+def response_type(content_type: str, accept: str = None) -> str:
+    """
+    Chooses the content type of a response.
+
+    Parameters
+    ----------
+    content_type : str
+        The media type of the request.
+
+    accept : str, optional
+        The Accept header of the request. Defaults to None.
+
+    Returns
+    -------
+    str : The first supported type of the Accept header, or else the request type.
+    """
+    for accepted in (accept or "").split(","):
+        if media_type(accepted) in CONTENT_TYPES:
+            return media_type(accepted)
+    return content_type if content_type in CONTENT_TYPES else JSON_CONTENT_TYPE
+
+
+def model_version(model_dir: str) -> str:
+    """
+    Fingerprints the version of an MLflow model from its MLmodel file.
+
+    The MLmodel file holds the unique id of the saved model, so every new model version gets
+    a new fingerprint while redeploying the same version keeps it.
+
+    Parameters
+    ----------
+    model_dir : str
+        The MLflow model folder.
+
+    Returns
+    -------
+    str : The hexadecimal fingerprint.
+    """
+    with open(os.path.join(model_dir, "MLmodel"), "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def find_model_dir(root: str) -> str:
+    """
+    Finds the MLflow model folder, holding an MLmodel file, in a model directory.
+
+    Parameters
+    ----------
+    root : str
+        The model directory, e.g. the AZUREML_MODEL_DIR of a deployment.
+
+    Returns
+    -------
+    str : The path of the MLflow model folder.
+    """
+    for folder, _, names in os.walk(root):
+        if "MLmodel" in names:
+            return folder
+    raise FileNotFoundError(f"No MLflow model found in {root}")
+
+
+class PredictionCache:
+    """
+    Bounded cache of the predictions of feature rows with least recently used and time to
+    live eviction.
+
+    A row is keyed by the blake2b hash of its float64 values in the order of the model
+    features, keyed with the model version. The same row therefore gets the same key
+    whatever the JSON formatting or column order of the request, and never matches the
+    predictions of another model. Setting another model version clears the cache.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        The number of cached rows, the least recently used are evicted beyond it.
+        The default value is 100000.
+
+    ttl_seconds : float, optional
+        The time after which a cached prediction is predicted again. Defaults to None,
+        which keeps the predictions until they are evicted.
+
+    version : str, optional
+        The version of the model. The default value is ''.
+    """
+
+    def __init__(self, max_entries: int = 100000, ttl_seconds: float = None, version: str = ""):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.set_version(version)
+
+    def set_version(self, version: str) -> None:
+        """
+        Sets the version of the model, clearing the cached predictions of another version.
+
+        Parameters
+        ----------
+        version : str
+            The version of the model.
+
+        Returns
+        -------
+        None : The function updates the cache.
+        """
+        with self._lock:
+            if getattr(self, "version", None) != version:
+                self._entries.clear()
+            self.version = version
+            self._hash_key = hashlib.blake2b(version.encode("utf-8"), digest_size=32).digest()
+
+    def keys(self, features: np.ndarray) -> list:
+        """
+        Computes the keys of the rows of a feature array.
+
+        Parameters
+        ----------
+        features : numpy.ndarray
+            The features in the order of the model.
+
+        Returns
+        -------
+        list of bytes : The key of every row.
+        """
+        # Adding zero turns -0.0 into 0.0 so both get the same key
+        values = np.ascontiguousarray(features, dtype=np.float64) + 0.0
+        return [hashlib.blake2b(row.tobytes(), digest_size=16, key=self._hash_key).digest() for row in values]
+
+    def get(self, keys: list) -> list:
+        """
+        Looks up the predictions of rows.
+
+        Parameters
+        ----------
+        keys : list of bytes
+            The keys of the rows.
+
+        Returns
+        -------
+        list : The cached prediction of every row, or None when it is not cached.
+        """
+        now = time.monotonic()
+        found = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl_seconds is not None and now - entry[1] > self.ttl_seconds:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    found.append(None)
+                else:
+                    self.hits += 1
+                    self._entries.move_to_end(key)
+                    found.append(entry[0])
+        return found
+
+    def put(self, keys: list, predictions: list) -> None:
+        """
+        Caches the predictions of rows, evicting the least recently used rows beyond the bound.
+
+        Parameters
+        ----------
+        keys : list of bytes
+            The keys of the rows.
+
+        predictions : list
+            The prediction of every row.
+
+        Returns
+        -------
+        None : The function updates the cache.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key, prediction in zip(keys, predictions):
+                self._entries[key] = (prediction, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """
+        Reports the size and counters of the cache.
+
+        Returns
+        -------
+        dict : The number of entries, hits, misses and evictions, and the model version.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "version": self.version,
+            }
+
+
+class RequestTelemetry:
+    """
+    Counters and latencies of the scored requests, optionally written as JSON lines.
+
+    The scoring script is deployed without the components package, so this is a small
+    counterpart of `components.common.telemetry.Telemetry` writing the same 'step' and 'time'
+    fields. Every request is written as a line with its latency, rows and content type, as
+    is every request answered with a server error, and a summary line is written on `close`.
+
+    Parameters
+    ----------
+    file_path : str, optional
+        The JSON lines file, appended to. Defaults to None, which only keeps the counters.
+    """
+
+    def __init__(self, file_path: str = None):
+        self.requests = 0
+        self.errors = 0
+        self.server_errors = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+        self._file = None
+        if file_path:
+            if os.path.dirname(file_path):
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            self._file = open(file_path, "a")
+
+    def record(self, seconds: float, rows: int, content_type: str, error: Exception = None) -> None:
+        """
+        Records a scored request.
+
+        Parameters
+        ----------
+        seconds : float
+            The time taken to score the request.
+
+        rows : int
+            The number of predicted rows, 0 when the request failed.
+
+        content_type : str
+            The content type of the request.
+
+        error : Exception, optional
+            The error of a failed request. Defaults to None.
+
+        Returns
+        -------
+        None : The function updates the counters.
+        """
+        with self._lock:
+            self.requests += 1
+            self.errors += error is not None
+            self.rows += rows
+            self.seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            if self._file is not None:
+                record = {"span": "score", "seconds": seconds, "rows": rows, "content_type": content_type}
+                if error is not None:
+                    record["error"] = str(error)
+                self._write(record)
+
+    def record_server_error(self, error: Exception) -> None:
+        """
+        Records a request answered with a server error.
+
+        Parameters
+        ----------
+        error : Exception
+            The unexpected error of the request.
+
+        Returns
+        -------
+        None : The function updates the counters.
+        """
+        with self._lock:
+            self.server_errors += 1
+            if self._file is not None:
+                self._write({"event": "server_error", "error": f"{type(error).__name__}: {error}"})
+
+    def _write(self, record: dict) -> None:
+        # Called with the lock held
+        self._file.write(json.dumps({"step": "score", "time": time.time(), **record}) + "\n")
+        self._file.flush()
+
+    def stats(self) -> dict:
+        """
+        Reports the counters and latencies of the requests.
+
+        Returns
+        -------
+        dict : The number of requests, errors, server errors and rows, and the mean and
+            maximum latency in milliseconds.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests, "errors": self.errors, "server_errors": self.server_errors, "rows": self.rows,
+                "mean_ms": 1000 * self.seconds / self.requests if self.requests else None,
+                "max_ms": 1000 * self.max_seconds,
+            }
+
+    def close(self) -> None:
+        """
+        Writes the summary line and closes the file.
+
+        Returns
+        -------
+        None : The function closes the file.
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            self._write({"summary": {
+                "requests": self.requests, "errors": self.errors, "server_errors": self.server_errors,
+                "rows": self.rows, "score_seconds": self.seconds,
+            }})
+            self._file.close()
+            self._file = None
+
+
+class _BatchedRequest:
+    """
+    Features of a request waiting in a micro-batch, and their predictions or error.
+    """
+    __slots__ = ("features", "done", "predictions", "error")
+
+    def __init__(self, features: np.ndarray):
+        self.features = features
+        self.done = threading.Event()
+        self.predictions = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Groups the rows of concurrent requests into one vectorised `predict` call.
+
+    A background thread takes the first waiting request and keeps collecting requests until
+    the batch has `max_batch_rows` rows or the first request has waited `max_latency_ms`.
+    The window adapts to the arrival rate through an exponentially weighted mean of the
+    time between requests: the batch is closed when no request arrives within twice the
+    mean gap, and when requests are further apart than the latency budget they are
+    predicted at once without waiting. The predictions are split back to the requests in
+    order. When a batch fails, its requests are predicted one by one so only the faulty
+    request gets the error.
+
+    Parameters
+    ----------
+    predict : callable
+        The vectorised prediction of a feature array.
+
+    max_batch_rows : int, optional
+        The number of rows after which a batch is predicted. The default value is 64.
+
+    max_latency_ms : float, optional
+        The longest time a request waits for other requests. The default value is 5.
+
+    smoothing : float, optional
+        The weight of the latest gap between requests in their mean. The default value is 0.1.
+    """
+
+    def __init__(self, predict, max_batch_rows: int = 64, max_latency_ms: float = 5.0, smoothing: float = 0.1):
+        self.predict = predict
+        self.max_batch_rows = max_batch_rows
+        self.max_latency = max_latency_ms / 1000
+        self.smoothing = smoothing
+        # Traffic is assumed sparse until requests arrive close together
+        self.mean_gap = self.max_latency
+        self.batches = 0
+        self.requests = 0
+        self._last_arrival = None
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, features: np.ndarray) -> np.ndarray:
+        """
+        Predicts the rows of a request as part of the next batch, waiting for the result.
+
+        Parameters
+        ----------
+        features : numpy.ndarray
+            The features of the request, not changed until the predictions are returned.
+
+        Returns
+        -------
+        numpy.ndarray : The predictions of the rows.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            if self._last_arrival is not None:
+                self.mean_gap += self.smoothing * (now - self._last_arrival - self.mean_gap)
+            self._last_arrival = now
+
+        request = _BatchedRequest(features)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.predictions
+
+    def close(self) -> None:
+        """
+        Stops the background thread once the waiting requests are predicted.
+
+        Returns
+        -------
+        None : The function stops the batcher.
+        """
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, rows = [first], len(first.features)
+            deadline = time.perf_counter() + self.max_latency
+            stopping = False
+            while rows < self.max_batch_rows:
+                # Only wait for requests expected within the latency budget
+                timeout = min(deadline - time.perf_counter(), 2 * self.mean_gap) if self.mean_gap < self.max_latency else 0
+                try:
+                    request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+                rows += len(request.features)
+            self._predict(batch)
+            if stopping:
+                return
+
+    def _predict(self, batch: list) -> None:
+        """
+        Predicts a batch of requests and hands every request its predictions.
+
+        Parameters
+        ----------
+        batch : list of _BatchedRequest
+            The requests.
+
+        Returns
+        -------
+        None : The function sets the predictions or error of every request.
+        """
+        self.batches += 1
+        self.requests += len(batch)
+        try:
+            features = batch[0].features if len(batch) == 1 else np.concatenate([request.features for request in batch])
+            predictions = self.predict(features)
+            start = 0
+            for request in batch:
+                request.predictions = predictions[start:start + len(request.features)]
+                start += len(request.features)
+        except Exception as error:
+            if len(batch) == 1:
+                batch[0].error = error
+            else:
+                for request in batch:
+                    try:
+                        request.predictions = self.predict(request.features)
+                    except Exception as request_error:
+                        request.error = request_error
+        for request in batch:
+            request.done.set()
+
+
+class Scorer:
+    """
+    Scores JSON requests with a scikit-learn model loaded once.
+
+    A request is either a list of rows, `{"data": rows}`, or the MLflow split format
+    `{"input_data": {"columns": [...], "data": rows}}`. With column names, the columns are
+    reordered to the features the model was fitted on. Rows are copied into a float array
+    that every serving thread allocates once and grows when a request has more rows.
+
+    Parameters
+    ----------
+    model : object
+        The fitted model.
+
+    feature_names : list of str, optional
+        The features of the model in order. Defaults to the `feature_names_in_` of the model.
+
+    batcher : MicroBatcher, optional
+        The micro-batcher predicting the feature arrays of concurrent requests together.
+        Defaults to None, which predicts every request on its own.
+
+    cache : PredictionCache, optional
+        The cache of the predictions of numeric rows. Defaults to None, which predicts
+        every row.
+    """
+
+    def __init__(self, model, feature_names: list = None, batcher: MicroBatcher = None, cache: PredictionCache = None):
+        self.model = model
+        self.batcher = batcher
+        self.cache = cache
+        if feature_names is None and hasattr(model, "feature_names_in_"):
+            feature_names = list(model.feature_names_in_)
+        self.feature_names = feature_names
+        self._local = threading.local()
+
+    def parse(self, request) -> tuple:
+        """
+        Extracts the rows and column names of a parsed request.
+
+        Parameters
+        ----------
+        request : dict or list
+            The parsed JSON request.
+
+        Returns
+        -------
+        tuple : The list of rows and the list of column names, or None when not given.
+        """
+        columns = None
+        if isinstance(request, dict):
+            if "input_data" in request:
+                request = request["input_data"]
+                if isinstance(request, dict):
+                    columns = request.get("columns")
+                    request = request.get("data")
+            elif "data" in request:
+                columns = request.get("columns")
+                request = request["data"]
+        if not isinstance(request, list):
+            raise ValueError("The request has no list of rows")
+        if request and not isinstance(request[0], list):
+            request = [request]
+        return request, columns
+
+    def _buffer(self, rows: int, width: int) -> np.ndarray:
+        """
+        Returns the feature array of the current thread, grown to hold a number of rows.
+
+        Parameters
+        ----------
+        rows : int
+            The number of rows.
+
+        width : int
+            The number of features.
+
+        Returns
+        -------
+        numpy.ndarray : A view of the first rows of the array.
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[1] != width:
+            buffer = np.empty((max(rows, INITIAL_BUFFER_ROWS), width), dtype=np.float64)
+            self._local.buffer = buffer
+        elif buffer.shape[0] < rows:
+            # Double the array so growing to a large request takes few allocations
+            buffer = np.empty((max(rows, 2 * buffer.shape[0]), width), dtype=np.float64)
+            self._local.buffer = buffer
+        return buffer[:rows]
+
+    def features(self, rows: list, columns: list = None):
+        """
+        Builds the model input of a request.
+
+        Parameters
+        ----------
+        rows : list of list
+            The rows of the request.
+
+        columns : list of str, optional
+            The column names of the rows.
+
+        Returns
+        -------
+        numpy.ndarray or pandas.DataFrame : The features in the order of the model, as a
+            view of the preallocated array, or a DataFrame when the values are not numeric.
+        """
+        width = len(columns) if columns else len(rows[0]) if rows else len(self.feature_names or [])
+        try:
+            values = self._buffer(len(rows), width)
+            values[:] = rows
+        except (TypeError, ValueError):
+            # Models with text or categorical columns need a DataFrame
+            import pandas as pd
+            return pd.DataFrame(rows, columns=columns or self.feature_names)
+
+        if columns and self.feature_names and list(columns) != self.feature_names:
+            missing = [name for name in self.feature_names if name not in columns]
+            if missing:
+                raise ValueError(f"The request misses the features {missing}")
+            position = {name: index for index, name in enumerate(columns)}
+            values = values[:, [position[name] for name in self.feature_names]]
+        return values
+
+    def array_features(self, values: np.ndarray) -> np.ndarray:
+        """
+        Checks a decoded array of features, which is used as the model input without copying
+        when it holds float64 values.
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            A row or an array of rows, in the order of the model features.
+
+        Returns
+        -------
+        numpy.ndarray : The features as a two dimensional array.
+        """
+        if values.ndim == 1:
+            values = values.reshape(1, -1)
+        if values.ndim != 2:
+            raise ValueError(f"The request has {values.ndim} dimensions instead of 2")
+        if self.feature_names and values.shape[1] != len(self.feature_names):
+            raise ValueError(f"The request has {values.shape[1]} features instead of {len(self.feature_names)}")
+        if values.dtype.kind not in "biuf":
+            raise ValueError(f"The request holds {values.dtype} values instead of numbers")
+        return values.astype(np.float64, copy=False)
+
+    def table_features(self, table):
+        """
+        Builds the model input of an Arrow table.
+
+        Parameters
+        ----------
+        table : pyarrow.Table
+            The decoded request, with one column per feature.
+
+        Returns
+        -------
+        numpy.ndarray or pandas.DataFrame : The features in the order of the model, as a
+            view of the preallocated array, or a DataFrame when the values are not numeric.
+        """
+        # The column names of a table are rebuilt on every access
+        columns = table.column_names
+        names = self.feature_names or columns
+        missing = sorted(set(names) - set(columns))
+        if missing:
+            raise ValueError(f"The request misses the features {missing}")
+        values = self._buffer(table.num_rows, len(names))
+        try:
+            for index, name in enumerate(names):
+                # Copies the column straight from the Arrow buffers
+                values[:, index] = table.column(name).to_numpy()
+        except (TypeError, ValueError):
+            return table.select(names).to_pandas()
+        return values
+
+    def decode(self, body, content_type: str = JSON_CONTENT_TYPE):
+        """
+        Decodes the model input of a request.
+
+        Parameters
+        ----------
+        body : str or bytes
+            The request.
+
+        content_type : str, optional
+            The media type of the request, JSON is assumed for any other type.
+            The default value is 'application/json'.
+
+        Returns
+        -------
+        numpy.ndarray or pandas.DataFrame : The features in the order of the model, None
+            when the request has no rows.
+        """
+        if content_type == NPY_CONTENT_TYPE:
+            values = self.array_features(read_npy(body))
+        elif content_type == ARROW_CONTENT_TYPE:
+            import pyarrow as pa
+
+            try:
+                table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+            except pa.ArrowInvalid as error:
+                raise ValueError(f"The request is not a valid Arrow IPC stream: {error}") from error
+            values = self.table_features(table)
+        else:
+            rows, columns = self.parse(loads(body))
+            return self.features(rows, columns) if rows else None
+        return values if len(values) else None
+
+    def predict(self, features) -> np.ndarray:
+        """
+        Predicts the class of every row.
+
+        Parameters
+        ----------
+        features : numpy.ndarray or pandas.DataFrame
+            The model input.
+
+        Returns
+        -------
+        numpy.ndarray : The predicted classes.
+        """
+        if self.batcher is not None and isinstance(features, np.ndarray):
+            return self.batcher.submit(features)
+        return self.model.predict(features)
+
+    def score(self, raw_data, content_type: str = JSON_CONTENT_TYPE) -> np.ndarray:
+        """
+        Decodes a request and predicts its rows.
+
+        Parameters
+        ----------
+        raw_data : str or bytes
+            The request.
+
+        content_type : str, optional
+            The media type of the request. The default value is 'application/json'.
+
+        Returns
+        -------
+        numpy.ndarray : The predicted classes.
+        """
+        features = self.decode(raw_data, content_type)
+        if features is None:
+            return np.empty(0)
+        if self.cache is None or not isinstance(features, np.ndarray):
+            return self.predict(features)
+
+        # Only the rows missing from the cache are predicted
+        keys = self.cache.keys(features)
+        cached = self.cache.get(keys)
+        missing = [index for index, prediction in enumerate(cached) if prediction is None]
+        if not missing:
+            return np.array(cached)
+        predicted = self.predict(features if len(missing) == len(keys) else features[missing])
+        self.cache.put([keys[index] for index in missing], predicted.tolist())
+        if len(missing) == len(keys):
+            return predicted
+        for index, prediction in zip(missing, predicted.tolist()):
+            cached[index] = prediction
+        return np.array(cached)
+
+
+def load_scorer(model_path: str, max_batch_rows: int = 0, max_latency_ms: float = 5.0, cache: PredictionCache = None) -> Scorer:
+    """
+    Loads the scikit-learn flavor of an MLflow model into a scorer.
+
+    Parameters
+    ----------
+    model_path : str
+        The MLflow model folder, or a directory holding it.
+
+    max_batch_rows : int, optional
+        The batch size of the micro-batcher, see `MicroBatcher`. The default value is 0,
+        which predicts every request on its own.
+
+    max_latency_ms : float, optional
+        The longest time a request waits in a micro-batch. The default value is 5.
+
+    cache : PredictionCache, optional
+        The prediction cache, set to the version of the loaded model. Defaults to None.
+
+    Returns
+    -------
+    Scorer : The scorer.
+    """
+    import mlflow.sklearn
+
+    model_dir = find_model_dir(model_path)
+    model = mlflow.sklearn.load_model(model_dir)
+    if cache is not None:
+        cache.set_version(model_version(model_dir))
+    # The preallocated arrays have no column names, the feature order is checked by the scorer
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+    batcher = MicroBatcher(model.predict, max_batch_rows, max_latency_ms) if max_batch_rows > 0 else None
+    return Scorer(model, batcher=batcher, cache=cache)
+
+
+def init(model_path: str = None, max_batch_rows: int = None, max_latency_ms: float = None, cache_entries: int = None,
+         cache_ttl_seconds: float = None, telemetry_file: str = None):
+    """
+    Loads the deployed model once per endpoint worker.
+
+    Azure ML calls it without arguments, so every setting left as None is read from the
+    environment: the model from `AZUREML_MODEL_DIR`, concurrent requests are micro-batched
+    when `SCORING_MAX_BATCH_ROWS` is set, waiting at most `SCORING_MAX_LATENCY_MS`
+    milliseconds, predictions are cached when `SCORING_CACHE_ENTRIES` is set, for at most
+    `SCORING_CACHE_TTL_SECONDS` seconds, and every request is written to the JSON lines file
+    `TELEMETRY_FILE` when it is set.
+
+    Parameters
+    ----------
+    model_path : str, optional
+        The MLflow model folder, or a directory holding it. Defaults to None.
+
+    max_batch_rows : int, optional
+        The batch size of the micro-batcher, 0 disables it. Defaults to None.
+
+    max_latency_ms : float, optional
+        The longest time a request waits in a micro-batch. Defaults to None.
+
+    cache_entries : int, optional
+        The number of rows in the prediction cache, 0 disables it. Defaults to None.
+
+    cache_ttl_seconds : float, optional
+        The time to live of the cached predictions. Defaults to None.
+
+    telemetry_file : str, optional
+        The JSON lines file of the request telemetry. Defaults to None.
+
+    Returns
+    -------
+    None : The function sets the scorer of the module.
+    """
+    global scorer, prediction_cache, request_telemetry
+    if model_path is None:
+        model_path = os.environ["AZUREML_MODEL_DIR"]
+    if max_batch_rows is None:
+        max_batch_rows = int(os.environ.get(MAX_BATCH_ROWS_ENV, 0))
+    if max_latency_ms is None:
+        max_latency_ms = float(os.environ.get(MAX_LATENCY_MS_ENV, 5.0))
+    if cache_entries is None:
+        cache_entries = int(os.environ.get(CACHE_ENTRIES_ENV, 0))
+    if cache_ttl_seconds is None and os.environ.get(CACHE_TTL_SECONDS_ENV):
+        cache_ttl_seconds = float(os.environ[CACHE_TTL_SECONDS_ENV])
+    if telemetry_file is None:
+        telemetry_file = os.environ.get(TELEMETRY_FILE_ENV) or None
+
+    if request_telemetry is not None:
+        request_telemetry.close()
+    request_telemetry = RequestTelemetry(telemetry_file)
+    if cache_entries > 0:
+        if prediction_cache is None:
+            prediction_cache = PredictionCache(cache_entries, cache_ttl_seconds)
+        else:
+            prediction_cache.max_entries, prediction_cache.ttl_seconds = cache_entries, cache_ttl_seconds
+    else:
+        prediction_cache = None
+    scorer = load_scorer(model_path, max_batch_rows, max_latency_ms, prediction_cache)
+    print(f"Loaded model with features {scorer.feature_names}")
+
+
+def timed_score(raw_data, content_type: str = JSON_CONTENT_TYPE) -> np.ndarray:
+    """
+    Scores a request with the scorer of the module, recording its latency.
+
+    Parameters
+    ----------
+    raw_data : str or bytes
+        The request body.
+
+    content_type : str, optional
+        The media type of the body. The default value is 'application/json'.
+
+    Returns
+    -------
+    numpy.ndarray : The predicted classes of the rows.
+    """
+    start = time.perf_counter()
+    try:
+        predictions = scorer.score(raw_data, content_type)
+    except Exception as error:
+        request_telemetry.record(time.perf_counter() - start, 0, content_type, error)
+        raise
+    request_telemetry.record(time.perf_counter() - start, len(predictions), content_type)
+    return predictions
+
+
+def score_request(body, content_type: str = None, accept: str = None) -> tuple:
+    """
+    Scores the body of an HTTP request.
+
+    Parameters
+    ----------
+    body : bytes
+        The request body.
+
+    content_type : str, optional
+        The Content-Type header, JSON is assumed when it is not set. Defaults to None.
+
+    accept : str, optional
+        The Accept header. Defaults to None.
+
+    Returns
+    -------
+    tuple : The response body and its content type.
+    """
+    request_type = media_type(content_type) or JSON_CONTENT_TYPE
+    predictions = timed_score(body, request_type)
+    return_type = response_type(request_type, accept)
+    return encode(predictions, return_type), return_type
+
+
+def run(raw_data):
+    """
+    Scores a request of the online endpoint.
+
+    On Azure ML the raw HTTP request is passed, so binary requests are decoded as they are
+    and the response is returned without being encoded as a JSON string again.
+
+    Parameters
+    ----------
+    raw_data : str or bytes or azureml.contrib.services.aml_request.AMLRequest
+        The JSON request, or the HTTP request.
+
+    Returns
+    -------
+    str or AMLResponse : The predicted classes as a JSON list, or the HTTP response.
+    """
+    if isinstance(raw_data, (str, bytes)):
+        return dumps(timed_score(raw_data))
+    try:
+        body, content_type = score_request(raw_data.get_data(), raw_data.headers.get("Content-Type"), raw_data.headers.get("Accept"))
+    except ValueError as error:
+        return AMLResponse(str(error), 400)
+    except Exception as error:
+        request_telemetry.record_server_error(error)
+        return AMLResponse(f"{type(error).__name__}: {error}", 500)
+    return AMLResponse(body, 200, {"Content-Type": content_type})
+
+
+if rawhttp is not None:
+    run = rawhttp(run)
+
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler serving `run` on POST /score, the request, cache and batching counters on
+    GET /stats and a liveness check on GET /.
+    """
+    # Keep connections open between the requests of a client
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            stats = {"requests": request_telemetry.stats(), "cache": scorer.cache.stats() if scorer.cache is not None else None}
+            if scorer.batcher is not None:
+                stats["batcher"] = {"batches": scorer.batcher.batches, "requests": scorer.batcher.requests}
+            self._respond(200, dumps(stats).encode("utf-8"), "application/json")
+            return
+        self._respond(200, b"Healthy")
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") != "/score":
+            self._respond(404, b"Not found")
+            return
+        try:
+            response, content_type = score_request(body, self.headers.get("Content-Type"), self.headers.get("Accept"))
+        except ValueError as error:
+            self._respond(400, str(error).encode("utf-8"))
+            return
+        except Exception as error:
+            # Errors of the model, decoders or batcher are answered instead of dropping the connection
+            request_telemetry.record_server_error(error)
+            self._respond(500, f"{type(error).__name__}: {error}".encode("utf-8"))
+            return
+        self._respond(200, response, content_type)
+
+    def _respond(self, status: int, body: bytes, content_type: str = "text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging costs more than scoring small requests
+        pass
+
+
+class ScoringServer(ThreadingHTTPServer):
+    """
+    HTTP server scoring every connection on its own thread.
+    """
+    daemon_threads = True
+    # Many load test clients connect at once
+    request_queue_size = 128
+
+
+def serve(model_path: str, host: str = "127.0.0.1", port: int = 5001, max_batch_rows: int = 0, max_latency_ms: float = 5.0,
+          cache_entries: int = 0, cache_ttl_seconds: float = None, telemetry_file: str = None) -> ScoringServer:
+    """
+    Loads a model and creates a local HTTP server scoring it, one thread per connection.
+
+    Parameters
+    ----------
+    model_path : str
+        The MLflow model folder, or a directory holding it.
+
+    host : str, optional
+        The address to listen on. The default value is '127.0.0.1'.
+
+    port : int, optional
+        The port to listen on, 0 picks a free port. The default value is 5001.
+
+    max_batch_rows : int, optional
+        The batch size of the micro-batcher, 0 disables it. The default value is 0.
+
+    max_latency_ms : float, optional
+        The longest time a request waits in a micro-batch. The default value is 5.
+
+    cache_entries : int, optional
+        The number of rows in the prediction cache, 0 disables it. The default value is 0.
+
+    cache_ttl_seconds : float, optional
+        The time to live of the cached predictions. Defaults to None.
+
+    telemetry_file : str, optional
+        The JSON lines file of the request telemetry. Defaults to None, which reads it from
+        `TELEMETRY_FILE` when set.
+
+    Returns
+    -------
+    ScoringServer : The server, started with `serve_forever`.
+    """
+    init(model_path, max_batch_rows, max_latency_ms, cache_entries, cache_ttl_seconds, telemetry_file)
+    return ScoringServer((host, port), ScoringRequestHandler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model_path", type=str, help="Path to the MLflow model folder")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=5001, help="Port to listen on")
+    parser.add_argument("--max_batch_rows", type=int, default=0, help="Rows of a micro-batch of concurrent requests, 0 disables micro-batching")
+    parser.add_argument("--max_latency_ms", type=float, default=5.0, help="Longest time a request waits in a micro-batch")
+    parser.add_argument("--cache_entries", type=int, default=0, help="Rows in the prediction cache, 0 disables the cache")
+    parser.add_argument("--cache_ttl_seconds", type=float, default=None, help="Time to live of the cached predictions")
+    parser.add_argument("--telemetry_file", type=str, default=None, help="JSON lines file of the request telemetry")
+    args = parser.parse_args()
+
+    server = serve(args.model_path, args.host, args.port, args.max_batch_rows, args.max_latency_ms, args.cache_entries, args.cache_ttl_seconds,
+                   args.telemetry_file)
+    print(f"Scoring {args.model_path} on http://{args.host}:{server.server_address[1]}/score")
+    server.serve_forever()
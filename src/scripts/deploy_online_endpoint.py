@@ -1,6 +1,7 @@
 import argparse
 import json
 import os
+import sys
 from azure.identity import DefaultAzureCredential
 from azure.ai.ml import MLClient
 from azure.ai.ml.entities import (
@@ -9,9 +10,18 @@ from azure.ai.ml.entities import (
     CodeConfiguration,
 )
 from azure.core.exceptions import ResourceNotFoundError
+try:
+    from components.common.telemetry import Telemetry
+except ImportError:
+    # Run as a file, e.g. python src/scripts/deploy_online_endpoint.py, without the src folder on the path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from components.common.telemetry import Telemetry
 
 
-def deploy_model(args):
+def deploy_model(args, telemetry: Telemetry = None):
+    # Spans of the endpoint, deployment and traffic updates, disabled by default
+    telemetry = telemetry or Telemetry("deploy_online_endpoint")
+
     # Set up authentication
     credential = DefaultAzureCredential()
 
@@ -26,11 +36,13 @@ def deploy_model(args):
     # Check if the endpoint exists
     endpoint_name = args.endpoint_name
     try:
-        endpoint = ml_client.online_endpoints.get(endpoint_name)
+        with telemetry.span("get_endpoint"):
+            endpoint = ml_client.online_endpoints.get(endpoint_name)
         print(f"Endpoint '{endpoint_name}' already exists.")
         if args.delete_if_existing:
             print(f"Deleting existing endpoint '{endpoint_name}'.")
-            ml_client.online_endpoints.begin_delete(name=endpoint_name).wait()
+            with telemetry.span("delete_endpoint"):
+                ml_client.online_endpoints.begin_delete(name=endpoint_name).wait()
             print(f"Endpoint '{endpoint_name}' deleted.")
             endpoint = None
         else:
@@ -47,6 +59,7 @@ def deploy_model(args):
             print(
                 f"Workspace '{args.workspace_name}' does not have a private endpoint enabled. Exiting deployment."
             )
+            telemetry.event("Workspace has no private endpoint", workspace_name=args.workspace_name)
             return
 
     # Create endpoint if it doesn't exist
@@ -57,7 +70,8 @@ def deploy_model(args):
             auth_mode=args.auth_mode,
             public_network_access="enabled" if args.public_endpoint else "disabled",
         )
-        ml_client.online_endpoints.begin_create_or_update(endpoint).wait()
+        with telemetry.span("create_endpoint"):
+            ml_client.online_endpoints.begin_create_or_update(endpoint).wait()
         print(f"Endpoint '{endpoint.name}' created.")
 
     # Get the model
@@ -99,13 +113,16 @@ def deploy_model(args):
 
     # Create or update the deployment
     print(f"Creating or updating deployment '{args.deployment_name}'.")
-    ml_client.online_deployments.begin_create_or_update(deployment).wait()
+    with telemetry.span("deploy"):
+        ml_client.online_deployments.begin_create_or_update(deployment).wait()
+    telemetry.count("instances", args.instance_count)
     print(f"Deployment '{args.deployment_name}' completed.")
 
     # Set the deployment as default
     allocation = json.loads(args.traffic_allocation) if args.traffic_allocation else {}
     endpoint.traffic = allocation
-    ml_client.online_endpoints.begin_create_or_update(endpoint).wait()
+    with telemetry.span("update_traffic"):
+        ml_client.online_endpoints.begin_create_or_update(endpoint).wait()
     print(
         f"Deployment '{args.deployment_name}' set as default for endpoint '{endpoint_name}'."
     )
@@ -186,11 +203,12 @@ if __name__ == "__main__":
         "--scoring_file",
         type=str,
         default=None,
-        help="Path to the custom scoring script",
+        help="Path to the custom scoring script, e.g. src/scoring/score.py",
     )
 
     args = parser.parse_args()
     print("Printing received arguments...")
     for arg_name in vars(args):
         print(f"{arg_name}: {getattr(args, arg_name)}")
-    deploy_model(args)
+    with Telemetry.from_env("deploy_online_endpoint") as telemetry:
+        deploy_model(args, telemetry)
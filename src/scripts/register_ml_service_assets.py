@@ -1,18 +1,27 @@
 import argparse
 import os
+import sys
 from azure.identity import DefaultAzureCredential
 from azure.ai.ml import MLClient, load_environment, load_component
+try:
+    from components.common.telemetry import Telemetry
+except ImportError:
+    # Run as a file, e.g. python src/scripts/register_ml_service_assets.py, without the src folder on the path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from components.common.telemetry import Telemetry
 
 
-def register_environments(ml_client, src_path, ignore_list=[]):
+def register_environments(ml_client, src_path, ignore_list=[], telemetry: Telemetry = None):
     """
     Register the custom environments in the workspace.
 
     :param ml_client: The MLClient object to use to register the environments
     :param src_path: The path to the source code folder
     :param ignore_list: The list of environment folder names to ignore
+    :param telemetry: The telemetry timing the registrations, disabled by default
     :return: None
     """
+    telemetry = telemetry or Telemetry("register_ml_service_assets")
 
     # Get the root environment definition folder
     env_root = os.path.join(src_path, "environments")
@@ -37,19 +46,23 @@ def register_environments(ml_client, src_path, ignore_list=[]):
 
         print(f"Registering environment {env_asset.name} ...")
         # Create or update the environment in the workspace
-        ml_client.environments.create_or_update(env_asset)
+        with telemetry.span("register_environment"):
+            ml_client.environments.create_or_update(env_asset)
+        telemetry.count("environments")
         print(f"Environment '{env_asset.name}' registered in workspace.")
 
 
-def register_components(ml_client, src_path, ignore_list=[]):
+def register_components(ml_client, src_path, ignore_list=[], telemetry: Telemetry = None):
     """
     Register the custom components in the workspace.
 
     :param ml_client: The MLClient object to use to register the components
     :param src_path: The path to the source code folder
     :param ignore_list: The list of component definition file names to ignore
+    :param telemetry: The telemetry timing the registrations, disabled by default
     :return: None
     """
+    telemetry = telemetry or Telemetry("register_ml_service_assets")
 
     # Get the root component definition folder
     comp_root = os.path.join(src_path, "components")
@@ -65,7 +78,9 @@ def register_components(ml_client, src_path, ignore_list=[]):
 
                 print(f"Registering component {comp_asset.name} ...")
                 # Create or update the component in the workspace
-                ml_client.components.create_or_update(comp_asset)
+                with telemetry.span("register_component"):
+                    ml_client.components.create_or_update(comp_asset)
+                telemetry.count("components")
                 print(f"Component '{comp_asset.name}' registered in workspace.")
 
 
@@ -99,23 +114,27 @@ def get_ml_client(args) -> MLClient:
     return ml_client
 
 
-def main(args):
+def main(args, telemetry: Telemetry = None):
     """
     Main function to register the Azure ML Service assets.
 
     :param args: The arguments containing the subscription_id, resource_group, workspace_name, src_path
+    :param telemetry: The telemetry of the connection and registrations, disabled by default
     :return: None
     """
+    telemetry = telemetry or Telemetry("register_ml_service_assets")
+
     # Get the ml_client based on the credentials
     print(f"Connecting to Azure ML Service...")
-    ml_client = get_ml_client(args)
+    with telemetry.span("connect"):
+        ml_client = get_ml_client(args)
 
     if args.asset_type == "environments":
         print(f"Registering custom environments...")
-        register_environments(ml_client, args.src_path)
+        register_environments(ml_client, args.src_path, telemetry=telemetry)
     elif args.asset_type == "components":
         print(f"Registering custom components...")
-        register_components(ml_client, args.src_path)
+        register_components(ml_client, args.src_path, telemetry=telemetry)
     
 
 if __name__ == "__main__":
@@ -147,4 +166,5 @@ if __name__ == "__main__":
     print("Printing received arguments...")
     for arg_name in vars(args):
         print(f"{arg_name}: {getattr(args, arg_name)}")
-    main(args)
+    with Telemetry.from_env("register_ml_service_assets") as telemetry:
+        main(args, telemetry)
@@ -0,0 +1,266 @@
+"""
+Runs the training pipeline components end to end in one local process.
+
+The split, evaluation, selection and registration steps are imported and run as a DAG on a
+thread pool instead of being submitted as separate jobs, so mlflow, pandas and scikit-learn
+are imported once and the test split is passed to the evaluations as an in-memory dataframe.
+The evaluations of the candidate models do not depend on each other and run in parallel.
+Each of them logs to its own run created with an MlflowClient, as the active run of the fluent
+`mlflow.start_run` API is only kept per thread by recent mlflow versions.
+Runs and registered models are tracked in a local MLflow file store by default.
+
+Usage (from the src folder):
+    python -m scripts.run_local_pipeline --input_data ../data --output_path ../outputs
+        --outcome_label label --model trained=../model --model champion=models:/my-model/3
+        --trained_model_id trained --model_name my-model
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import mlflow
+from components.classification.model_evaluator import evaluate_model
+from components.classification.model_selector import compare_models
+from components.training.register_model import register_trained_model
+from components.common.telemetry import Telemetry
+from components.training.split_data import split_dataset
+
+
+class LocalDag:
+    """
+    Directed acyclic graph of steps run on a thread pool as soon as their dependencies finish.
+
+    Every step is called with the results of its dependencies, keyed by their names, and its
+    wall time is recorded. The first failing step stops the scheduling of the others and its
+    exception is raised once the running steps finish.
+
+    Parameters
+    ----------
+    max_workers : int, optional
+        The number of steps run at the same time. Defaults to None, which lets the thread
+        pool pick its size.
+
+    telemetry : Telemetry, optional
+        The telemetry every step is recorded in as a span. Defaults to None.
+    """
+
+    def __init__(self, max_workers: int = None, telemetry: Telemetry = None):
+        self.max_workers = max_workers
+        self.telemetry = telemetry or Telemetry("local_pipeline")
+        self.steps = {}
+
+    def add(self, name: str, step, depends_on: list = None) -> None:
+        """
+        Adds a step to the graph.
+
+        Parameters
+        ----------
+        name : str
+            The unique name of the step.
+
+        step : callable
+            The step, called with a dict of the results of its dependencies.
+
+        depends_on : list of str, optional
+            The names of the steps that must finish first, which must already be added.
+
+        Returns
+        -------
+        None : The function adds the step.
+        """
+        if name in self.steps:
+            raise ValueError(f"Step {name} is already in the pipeline")
+        missing = [dependency for dependency in depends_on or [] if dependency not in self.steps]
+        if missing:
+            raise ValueError(f"Step {name} depends on unknown steps {missing}")
+        self.steps[name] = (step, list(depends_on or []))
+
+    def run(self) -> tuple:
+        """
+        Runs every step once all of its dependencies have finished.
+
+        Returns
+        -------
+        tuple : The result and the wall time in seconds of every step, keyed by step name.
+        """
+        results, timings = {}, {}
+
+        def timed(name, step, inputs):
+            start = time.perf_counter()
+            try:
+                with self.telemetry.span(name):
+                    return step(inputs)
+            finally:
+                timings[name] = time.perf_counter() - start
+
+        pending = dict(self.steps)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, (step, depends_on) in list(pending.items()):
+                    if all(dependency in results for dependency in depends_on):
+                        print(f"Starting step {name}...")
+                        inputs = {dependency: results[dependency] for dependency in depends_on}
+                        running[executor.submit(timed, name, step, inputs)] = name
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        # Let the running steps finish but start no new ones
+                        wait(running)
+                        raise future.exception()
+                    results[name] = future.result()
+                    print(f"Finished step {name} in {timings[name]:.3f} s")
+        return results, timings
+
+
+def run_local_pipeline(input_data_path: str, output_path: str, outcome_label: str, models: dict, trained_model_id: str = None,
+                       model_name: str = None, constraint: str = 'balanced', split_ratio: float = 0.7, seed: int = 42,
+                       strategy: str = 'random', split_column: str = None, cutoff: str = None, output_format: str = 'csv',
+                       average: str = 'binary', tracking_uri: str = None, max_workers: int = None) -> dict:
+    """
+    Splits a dataset, evaluates candidate models on its test split, selects the best one and
+    registers the trained model when it is the best, all in the current process.
+
+    Parameters
+    ----------
+    input_data_path : str
+        The directory of the input dataset files.
+
+    output_path : str
+        The directory of the splits, reports, registration report and step timings.
+
+    outcome_label : str
+        The name of the outcome column.
+
+    models : dict
+        The path or MLflow URI of every candidate model, keyed by model id.
+
+    trained_model_id : str, optional
+        The id of the trained model to register when it is selected. Defaults to None,
+        which skips the registration.
+
+    model_name : str, optional
+        The name under which the trained model is registered.
+
+    constraint : str, optional
+        The selection constraint, see `compare_models`. The default value is 'balanced'.
+
+    split_ratio, seed, strategy, split_column, cutoff, output_format : optional
+        The split options, see `split_dataset`.
+
+    average : str, optional
+        How the evaluation metrics are averaged over the classes, see `evaluate_model`.
+
+    tracking_uri : str, optional
+        The MLflow tracking URI. Defaults to None, which uses a file store in `output_path`.
+
+    max_workers : int, optional
+        The number of steps run at the same time. Defaults to None.
+
+    Returns
+    -------
+    dict : The wall time in seconds of every step.
+    """
+    if trained_model_id is not None and (trained_model_id not in models or not model_name):
+        raise ValueError("The trained model id must be one of the models, and a model name is needed to register it")
+
+    output_path = os.path.abspath(output_path)
+    if tracking_uri is None:
+        os.environ.setdefault("MLFLOW_ALLOW_FILE_STORE", "true")
+        tracking_uri = f"file:{os.path.join(output_path, 'mlruns')}"
+    mlflow.set_tracking_uri(tracking_uri)
+    print(f"Tracking runs in {tracking_uri}")
+
+    train_path = os.path.join(output_path, "train")
+    test_path = os.path.join(output_path, "test")
+    report_files = {model_id: os.path.join(output_path, "reports", f"{model_id}.json") for model_id in models}
+    comparison_report = os.path.join(output_path, "comparison_report.json")
+
+    telemetry = Telemetry.from_env("local_pipeline")
+    dag = LocalDag(max_workers, telemetry)
+    dag.add("split_data", lambda inputs: split_dataset(
+        input_data_path, train_path, test_path, split_ratio=split_ratio, seed=seed, output_format=output_format,
+        strategy=strategy, split_column=split_column, cutoff=cutoff, keep_frames=True
+    ))
+
+    client = mlflow.MlflowClient()
+    experiment_id = client.get_experiment_by_name("Default").experiment_id
+
+    def evaluate_step(model_id):
+        def evaluate(inputs):
+            run_id = client.create_run(experiment_id, run_name=f"evaluate_{model_id}").info.run_id
+            status = "FAILED"
+            try:
+                # The test split is passed in memory, its files are not read back
+                evaluate_model(
+                    model_id, models[model_id], test_path, outcome_label, report_files[model_id],
+                    average=average, test_data=inputs["split_data"][1], run_id=run_id
+                )
+                status = "FINISHED"
+            finally:
+                client.set_terminated(run_id, status)
+        return evaluate
+
+    for model_id in models:
+        dag.add(f"evaluate_{model_id}", evaluate_step(model_id), depends_on=["split_data"])
+
+    dag.add("select_model", lambda inputs: compare_models(
+        [report_files[model_id] for model_id in models], constraint, comparison_report
+    ), depends_on=[f"evaluate_{model_id}" for model_id in models])
+
+    if trained_model_id is not None:
+        dag.add("register_model", lambda inputs: register_trained_model(
+            comparison_report, models[trained_model_id], model_name, trained_model_id,
+            os.path.join(output_path, "register_report.txt")
+        ), depends_on=["select_model"])
+
+    start = time.perf_counter()
+    with telemetry:
+        _, timings = dag.run()
+    timings = {name: timings[name] for name in dag.steps}
+    timings["total"] = time.perf_counter() - start
+
+    with open(os.path.join(output_path, "timings.json"), "w") as f:
+        json.dump(timings, f, indent=4)
+    print("Step timings:")
+    for name, seconds in timings.items():
+        print(f"{name:>30}{seconds:>10.3f} s")
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input_data', type=str, help='Path to the input dataset folder')
+    parser.add_argument('--output_path', type=str, help='Folder of the splits, reports and timings')
+    parser.add_argument('--outcome_label', type=str, help='Name of the outcome column')
+    parser.add_argument('--model', type=str, action='append', help='Candidate model as <model_id>=<path or models:/ URI>, repeated for every model')
+    parser.add_argument('--trained_model_id', type=str, default=None, help='Id of the trained model registered when it is selected')
+    parser.add_argument('--model_name', type=str, default=None, help='Name under which the trained model is registered')
+    parser.add_argument('--constraint', type=str, default='balanced', help='Selection constraint of compare_models')
+    parser.add_argument('--split_ratio', type=float, default=0.7, help='Ratio of the rows used for training')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed of the split')
+    parser.add_argument('--strategy', type=str, default='random', help='Split strategy: random, stratified, group or temporal')
+    parser.add_argument('--split_column', type=str, default=None, help='Column used by the stratified, group and temporal strategies')
+    parser.add_argument('--cutoff', type=str, default=None, help='First time value of the test split for the temporal strategy')
+    parser.add_argument('--output_format', type=str, default='csv', help='Format of the splits: csv, parquet or feather')
+    parser.add_argument('--average', type=str, default='binary', help='How the metrics are averaged over the classes')
+    parser.add_argument('--tracking_uri', type=str, default=None, help='MLflow tracking URI, a file store in the output path by default')
+    parser.add_argument('--max_workers', type=int, default=None, help='Number of steps run at the same time')
+
+    args = parser.parse_args()
+    print("Printing received arguments...")
+    for arg_name in vars(args):
+        print(f"{arg_name}: {getattr(args, arg_name)}")
+
+    run_local_pipeline(
+        args.input_data, args.output_path, args.outcome_label,
+        dict(model.split('=', 1) for model in args.model or []),
+        trained_model_id=args.trained_model_id, model_name=args.model_name, constraint=args.constraint,
+        split_ratio=args.split_ratio, seed=args.seed, strategy=args.strategy, split_column=args.split_column,
+        cutoff=args.cutoff, output_format=args.output_format, average=args.average,
+        tracking_uri=args.tracking_uri, max_workers=args.max_workers
+    )
@@ -1,9 +1,17 @@
 import argparse
+import os
+import sys
 from ast import parse
 from datetime import datetime
 import json
 from azure.identity import DefaultAzureCredential
 from azure.ai.ml import MLClient, load_job
+try:
+    from components.common.telemetry import Telemetry
+except ImportError:
+    # Run as a file, e.g. python src/scripts/run_training_pipeline.py, without the src folder on the path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from components.common.telemetry import Telemetry
 
 def get_ml_client(args) -> MLClient:
     """
@@ -32,16 +40,20 @@ def get_ml_client(args) -> MLClient:
 
     return ml_client
 
-def main(args):
+def main(args, telemetry: Telemetry = None):
     """
     Main function to run the paynet training pipeline.
 
     :param args: The arguments containing the subscription_id, resource_group, workspace_name, src_path
+    :param telemetry: The telemetry of the connect, load and submit spans, disabled by default
     :return: None
     """
+    telemetry = telemetry or Telemetry("run_training_pipeline")
+
     # Get the ml_client based on the credentials
     print(f"Connecting to Azure ML Service...")
-    ml_client = get_ml_client(args)
+    with telemetry.span("connect"):
+        ml_client = get_ml_client(args)
 
     # Load the json data in dictionary format
     with open(args.pipeline_parameter_path, "r") as json_file:
@@ -57,10 +69,11 @@ def main(args):
     print(transform_pipeline_parameters)
 
     # Load the pipeline job from the YAML file and override the input parameters    
-    pipeline_job = load_job(
-        source=args.pipeline_definition_path,
-        params_override=transform_pipeline_parameters
-    )
+    with telemetry.span("load"):
+        pipeline_job = load_job(
+            source=args.pipeline_definition_path,
+            params_override=transform_pipeline_parameters
+        )
 
     # Modify the name of the job
     # If you are trying to create a new job, use a different name. If you are trying to update an existing job, 
@@ -73,12 +86,14 @@ def main(args):
 
     # Now the pipeline is ready for execution
     # Submit the job
-    pipeline_job = ml_client.jobs.create_or_update(
-        pipeline_job, 
-        experiment_name=args.experiment_name
-    )
+    with telemetry.span("submit"):
+        pipeline_job = ml_client.jobs.create_or_update(
+            pipeline_job, 
+            experiment_name=args.experiment_name
+        )
     
     print(f"Pipeline job submitted. Job ID: {pipeline_job.name}")
+    telemetry.event("Pipeline job submitted", job_name=pipeline_job.name, studio_url=pipeline_job.studio_url)
     print(f"Pipeline job can be tracked by {pipeline_job.studio_url}")
 
 
@@ -96,4 +111,5 @@ if __name__ == "__main__":
     print("Printing received arguments...")
     for arg_name in vars(args):
         print(f"{arg_name}: {getattr(args, arg_name)}")
-    main(args)
\ No newline at end of file
+    with Telemetry.from_env("run_training_pipeline") as telemetry:
+        main(args, telemetry)
\ No newline at end of file
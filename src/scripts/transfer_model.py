@@ -1,7 +1,15 @@
 import argparse
+import os
+import sys
 from azure.identity import DefaultAzureCredential
 from azure.ai.ml import MLClient
 import mlflow
+try:
+    from components.common.telemetry import Telemetry
+except ImportError:
+    # Run as a file, e.g. python src/scripts/transfer_model.py, without the src folder on the path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from components.common.telemetry import Telemetry
 
 
 def download_model(ml_client, model_name, model_version, local_folder):
@@ -80,33 +88,38 @@ def get_ml_client(args) -> MLClient:
     return ml_client
 
 
-def main(args):
+def main(args, telemetry: Telemetry = None):
     """
     Main function to perform the operation based on the arguments.
 
     :param args: The arguments containing the subscription_id, resource_group, workspace_name, model_name, model_version, local_folder, operation
+    :param telemetry: The telemetry of the connect, download and upload spans, disabled by default
     """
+    telemetry = telemetry or Telemetry("transfer_model")
 
     # Get the MLClient object
-    ml_client = get_ml_client(args)
+    with telemetry.span("connect"):
+        ml_client = get_ml_client(args)
 
     if args.operation == "download":
         # Download the model from Azure ML workspace
-        ml_client.models.download(
-            ml_client=ml_client,
-            model_name=args.model_name,
-            model_version=args.model_version,
-            local_path=args.local_folder,
-        )
+        with telemetry.span("download"):
+            ml_client.models.download(
+                ml_client=ml_client,
+                model_name=args.model_name,
+                model_version=args.model_version,
+                local_path=args.local_folder,
+            )
         print(f"Model downloaded to {args.local_folder}")
     elif args.operation == "upload":
         # Upload the model to Azure ML workspace
-        ml_client.models.upload(
-            ml_client=ml_client,
-            model_name=args.model_name,
-            model_version=args.model_version,
-            model_path=args.local_folder,
-        )
+        with telemetry.span("upload"):
+            ml_client.models.upload(
+                ml_client=ml_client,
+                model_name=args.model_name,
+                model_version=args.model_version,
+                model_path=args.local_folder,
+            )
         print(f"Model uploaded to Azure ML workspace")
     else:
         print(f"Invalid operation: {args.operation}")
@@ -144,4 +157,5 @@ if __name__ == "__main__":
     print("Printing received arguments...")
     for arg_name in vars(args):
         print(f"{arg_name}: {getattr(args, arg_name)}")
-    main(args)
+    with Telemetry.from_env("transfer_model") as telemetry:
+        main(args, telemetry)
@@ -1,9 +1,26 @@
 import argparse
+import asyncio
+import itertools
 import json
-import ast
-from jsondiff import diff
-from azure.identity import DefaultAzureCredential
-from azure.ai.ml import MLClient, load_environment, load_component
+import os
+import ssl
+import sys
+import time
+import urllib.request
+from urllib.parse import urlsplit
+try:
+    from components.common.telemetry import Telemetry
+except ImportError:
+    # Run as a file, e.g. python src/scripts/validate_online_endpoint.py, without the src folder on the path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from components.common.telemetry import Telemetry
+
+# Content types of the request corpus files by extension, JSON for the others
+CONTENT_TYPES = {".npy": "application/x-npy", ".arrow": "application/vnd.apache.arrow.stream"}
+
+# Upper bounds in milliseconds of the buckets of the latency histogram
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf")]
+
 
 def compare_json(json1, json2) -> bool:
     """
@@ -17,13 +34,31 @@ def compare_json(json1, json2) -> bool:
     print(f"Json1: {json1}")
     print(f"Json2: {json2}")    
 
+    from jsondiff import diff
+
     # Compare the json objects and return true if they are equal and there is no difference
     difference = diff(json1, json2)
     print(f"Diff: {difference}")
     return difference == {}
 
 
-def get_ml_client(args) -> MLClient:
+def parse_response(scoring_response: str):
+    """
+    Parse the JSON response of the endpoint.
+
+    Scoring scripts returning a string have their response encoded as a JSON string again,
+    while raw HTTP scoring scripts return the JSON itself, so a string is parsed twice.
+
+    :param scoring_response: The response text of the endpoint
+    :return: The parsed json object
+    """
+    result = json.loads(scoring_response)
+    if isinstance(result, str):
+        result = json.loads(result)
+    return result
+
+
+def get_ml_client(args):
     """
     Get the MLClient object based on the DefaultAzureCredential authentication.
     For the authentication to work, session should be already logged in using AzureCLI.
@@ -31,6 +66,9 @@ def get_ml_client(args) -> MLClient:
     :param args: The arguments containing the subscription_id, resource_group, workspace_name
     :return: The MLClient object
     """
+    # The Azure SDK is not needed to validate a local scoring server
+    from azure.identity import DefaultAzureCredential
+    from azure.ai.ml import MLClient
 
     # Authenticate using DefaultAzureCredential
     # Should be already logged in using AzureCLI in the session
@@ -53,27 +91,355 @@ def get_ml_client(args) -> MLClient:
     return ml_client
 
 
-def main(args):
+def get_endpoint_target(ml_client, endpoint_name: str, deployment_name: str) -> tuple:
+    """
+    Get the scoring URI of an endpoint and the headers sending requests to one of its deployments.
+
+    The deployment header bypasses the traffic allocation, so a deployment can be load tested
+    before it receives traffic.
+
+    :param ml_client: The MLClient object
+    :param endpoint_name: The name of the endpoint
+    :param deployment_name: The name of the deployment, all deployments share the traffic when None
+    :return: The scoring URI and the request headers
+    """
+    endpoint = ml_client.online_endpoints.get(endpoint_name)
+    keys = ml_client.online_endpoints.get_keys(endpoint_name)
+    # Key authentication returns keys and token authentication an access token
+    token = getattr(keys, "primary_key", None) or keys.access_token
+    headers = {"Authorization": f"Bearer {token}"}
+    if deployment_name:
+        headers["azureml-model-deployment"] = deployment_name
+    return endpoint.scoring_uri, headers
+
+
+def load_corpus(path: str) -> list:
+    """
+    Load the request corpus replayed by the load test.
+
+    The corpus is a request file, a JSON lines file with one request per line, or a folder of
+    request files. Files ending with .npy or .arrow are sent with their binary content type.
+
+    :param path: The path to the file or folder
+    :return: The list of request bodies and content types
+    """
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+        paths = [file_path for file_path in paths if os.path.isfile(file_path)]
+    else:
+        paths = [path]
+
+    corpus = []
+    for file_path in paths:
+        extension = os.path.splitext(file_path)[1].lower()
+        with open(file_path, "rb") as file:
+            body = file.read()
+        if extension == ".jsonl":
+            corpus.extend((line, "application/json") for line in body.splitlines() if line.strip())
+        else:
+            corpus.append((body, CONTENT_TYPES.get(extension, "application/json")))
+    if not corpus:
+        raise ValueError(f"No requests found in '{path}'")
+    return corpus
+
+
+def post(scoring_uri: str, body: bytes, headers: dict = None, timeout: float = 60) -> str:
+    """
+    Send a single request to a scoring URI.
+
+    :param scoring_uri: The scoring URI
+    :param body: The request body
+    :param headers: The request headers, JSON content is assumed when not set
+    :param timeout: The timeout of the request in seconds
+    :return: The response text
+    """
+    headers = {"Content-Type": "application/json", **(headers or {})}
+    request = urllib.request.Request(scoring_uri, data=body, headers=headers)
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read().decode("utf-8")
+
+
+class KeepAliveConnection:
+    """
+    HTTP/1.1 connection kept open between the requests of a load test worker.
+
+    The connection is opened on the first request and again after an error or when the
+    server closes it.
+
+    :param scoring_uri: The scoring URI, http or https
+    :param timeout: The timeout of a request in seconds
+    """
+
+    def __init__(self, scoring_uri: str, timeout: float):
+        url = urlsplit(scoring_uri)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self.target = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def request(self, body: bytes, headers: dict) -> int:
+        """
+        Send a POST request and read the whole response.
+
+        :param body: The request body
+        :param headers: The request headers
+        :return: The status code of the response
+        """
+        try:
+            return await asyncio.wait_for(self._request(body, headers), self.timeout)
+        except BaseException:
+            # The response may be partly read, so the connection cannot be reused
+            self.close()
+            raise
+
+    async def _request(self, body: bytes, headers: dict) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        lines = [f"POST {self.target} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("The server closed the connection")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip().lower()
+
+        if response_headers.get("transfer-encoding") == "chunked":
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        if response_headers.get("connection") == "close":
+            self.close()
+        return status
+
+    def close(self) -> None:
+        """
+        Close the connection, the next request opens a new one.
+
+        :return: None
+        """
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = None
+        self.writer = None
+
+
+def percentile(sorted_values: list, quantile: float) -> float:
+    """
+    Get a percentile of sorted values by the nearest rank.
+
+    :param sorted_values: The values sorted in increasing order
+    :param quantile: The percentile, between 0 and 100
+    :return: The percentile, None when there are no values
+    """
+    if not sorted_values:
+        return None
+    rank = max(int(-(-quantile * len(sorted_values) // 100)), 1)
+    return sorted_values[rank - 1]
+
+
+def latency_histogram(latencies_ms: list) -> dict:
+    """
+    Count the latencies in the buckets of HISTOGRAM_BUCKETS_MS.
+
+    :param latencies_ms: The latencies in milliseconds
+    :return: The number of latencies of every bucket, keyed by its upper bound, e.g. '<=10ms'
+    """
+    counts = [0] * len(HISTOGRAM_BUCKETS_MS)
+    for latency in latencies_ms:
+        counts[next(index for index, bound in enumerate(HISTOGRAM_BUCKETS_MS) if latency <= bound)] += 1
+    return {
+        (f"<={bound:g}ms" if bound != float("inf") else f">{HISTOGRAM_BUCKETS_MS[-2]:g}ms"): count
+        for bound, count in zip(HISTOGRAM_BUCKETS_MS, counts)
+    }
+
+
+async def replay_corpus(scoring_uri: str, corpus: list, headers: dict = None, concurrency: int = 8,
+                        total_requests: int = 1000, timeout: float = 60) -> dict:
+    """
+    Replay a request corpus against a scoring URI from concurrent workers.
+
+    Every worker sends its requests one after the other over its own kept-alive connection,
+    so the workers hold a pool of `concurrency` connections. The corpus is replayed in turn
+    until `total_requests` requests are sent.
+
+    :param scoring_uri: The scoring URI
+    :param corpus: The request bodies and content types, see load_corpus
+    :param headers: The headers of every request, e.g. the authorization
+    :param concurrency: The number of concurrent workers
+    :param total_requests: The number of requests sent
+    :param timeout: The timeout of a request in seconds
+    :return: The summary of the load test, see summarize
+    """
+    next_request = itertools.count()
+    latencies_ms = []
+    errors = {}
+
+    async def worker():
+        connection = KeepAliveConnection(scoring_uri, timeout)
+        try:
+            while (index := next(next_request)) < total_requests:
+                body, content_type = corpus[index % len(corpus)]
+                start = time.perf_counter()
+                try:
+                    status = await connection.request(body, {"Content-Type": content_type, **(headers or {})})
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as error:
+                    status = type(error).__name__
+                latency_ms = (time.perf_counter() - start) * 1000
+                if status == 200:
+                    latencies_ms.append(latency_ms)
+                else:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies_ms, errors, time.perf_counter() - start)
+
+
+def summarize(latencies_ms: list, errors: dict, seconds: float) -> dict:
+    """
+    Summarize the latencies and errors of a load test.
+
+    :param latencies_ms: The latencies in milliseconds of the successful requests
+    :param errors: The number of failed requests by status code or error name
+    :param seconds: The duration of the load test
+    :return: The number of requests, the error rate, the throughput of successful requests
+        per second, the p50, p90, p99 and max latencies and the latency histogram
+    """
+    latencies_ms = sorted(latencies_ms)
+    failed = sum(errors.values())
+    requests = len(latencies_ms) + failed
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": failed / requests if requests else 0.0,
+        "seconds": seconds,
+        "throughput": len(latencies_ms) / seconds if seconds else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p90_ms": percentile(latencies_ms, 90),
+        "p99_ms": percentile(latencies_ms, 99),
+        "max_ms": latencies_ms[-1] if latencies_ms else None,
+        "histogram": latency_histogram(latencies_ms),
+    }
+
+
+def check_slos(summary: dict, max_p99_ms: float = None, min_throughput: float = None, max_error_rate: float = 0.0) -> list:
+    """
+    Check the summary of a load test against latency, throughput and error rate SLOs.
+
+    :param summary: The summary of the load test, see summarize
+    :param max_p99_ms: The highest p99 latency in milliseconds, not checked when None
+    :param min_throughput: The lowest number of successful requests per second, not checked when None
+    :param max_error_rate: The highest share of failed requests
+    :return: The list of the missed SLOs, empty when all are met
+    """
+    failures = []
+    if max_p99_ms is not None and (summary["p99_ms"] is None or summary["p99_ms"] > max_p99_ms):
+        p99_ms = "unknown" if summary["p99_ms"] is None else f"{summary['p99_ms']:.2f}"
+        failures.append(f"p99 latency {p99_ms} ms is above {max_p99_ms} ms")
+    if min_throughput is not None and summary["throughput"] < min_throughput:
+        failures.append(f"Throughput {summary['throughput']:.1f} requests/s is below {min_throughput} requests/s")
+    if summary["error_rate"] > max_error_rate:
+        failures.append(f"Error rate {summary['error_rate']:.2%} is above {max_error_rate:.2%}")
+    return failures
+
+
+def load_test(args, scoring_uri: str, headers: dict, telemetry: Telemetry = None) -> None:
+    """
+    Load test a scoring URI with the request corpus and validate the SLOs.
+
+    :param args: The arguments containing the corpus, concurrency, number of requests and SLOs
+    :param scoring_uri: The scoring URI
+    :param headers: The headers of every request
+    :param telemetry: The telemetry of the load test span and its counters, disabled by default
+    :return: None
+    """
+    telemetry = telemetry or Telemetry("validate_online_endpoint")
+    corpus = load_corpus(args.request_corpus or args.request_data)
+    print(f"Sending {args.requests} requests of a corpus of {len(corpus)} over {args.concurrency} concurrent connections...")
+    with telemetry.span("load_test"):
+        summary = asyncio.run(replay_corpus(scoring_uri, corpus, headers, args.concurrency, args.requests, args.timeout))
+    telemetry.count("requests", summary["requests"])
+    telemetry.count("errors", sum(summary["errors"].values()))
+    telemetry.event("Load test finished", **{name: value for name, value in summary.items() if name != "histogram"})
+
+    print(f"Requests: {summary['requests']}, errors: {summary['errors']}, error rate: {summary['error_rate']:.2%}")
+    print(f"Throughput: {summary['throughput']:.1f} requests/s")
+    if summary["max_ms"] is not None:
+        print(f"Latency ms: p50 {summary['p50_ms']:.2f}, p90 {summary['p90_ms']:.2f}, p99 {summary['p99_ms']:.2f}, max {summary['max_ms']:.2f}")
+    print("Latency histogram:")
+    for bucket, count in summary["histogram"].items():
+        print(f"  {bucket:>9}: {count}")
+    if args.load_test_report:
+        with open(args.load_test_report, "w") as file:
+            json.dump(summary, file, indent=2)
+
+    failures = check_slos(summary, args.max_p99_ms, args.min_throughput, args.max_error_rate)
+    assert not failures, "The load test missed the SLOs: " + "; ".join(failures)
+    print("The load test met the SLOs")
+
+
+def main(args, telemetry: Telemetry = None):
     """
     Main function to call the Azure ML endpoint and validate result.
 
     :param args: The arguments containing the subscription_id, resource_group, workspace_name etc.
+    :param telemetry: The telemetry of the connect, invoke and load test spans, disabled by default
     :return: None
     """
-    # Get the ml_client based on the credentials
-    print(f"Connecting to Azure ML Service...")
-    ml_client = get_ml_client(args)
+    telemetry = telemetry or Telemetry("validate_online_endpoint")
+    if args.scoring_uri:
+        # A local or already known scoring server, e.g. src/scoring/score.py
+        scoring_uri = args.scoring_uri
+        headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else {}
+        ml_client = None
+    else:
+        # Get the ml_client based on the credentials
+        print(f"Connecting to Azure ML Service...")
+        with telemetry.span("connect"):
+            ml_client = get_ml_client(args)
+        scoring_uri, headers = None, None
 
-    # Invoke the end point using the ml_client
-    print(f"Invoking the endpoint '{args.endpoint_name}'...")
-    scoring_response = ml_client.online_endpoints.invoke(
-        endpoint_name=args.endpoint_name, 
-        deployment_name=args.deployment_name,
-        request_file=args.request_data
-    )
+    if args.load_test:
+        if ml_client is not None:
+            scoring_uri, headers = get_endpoint_target(ml_client, args.endpoint_name, args.deployment_name)
+        print(f"Load testing '{scoring_uri}'...")
+        load_test(args, scoring_uri, headers, telemetry)
+        return
+
+    if ml_client is None:
+        print(f"Invoking '{scoring_uri}'...")
+        with open(args.request_data, "rb") as file, telemetry.span("invoke"):
+            scoring_response = post(scoring_uri, file.read(), headers, args.timeout)
+    else:
+        # Invoke the end point using the ml_client
+        print(f"Invoking the endpoint '{args.endpoint_name}'...")
+        with telemetry.span("invoke"):
+            scoring_response = ml_client.online_endpoints.invoke(
+                endpoint_name=args.endpoint_name,
+                deployment_name=args.deployment_name,
+                request_file=args.request_data
+            )
 
     print("Response Received...")
-    actual_result = ast.literal_eval(scoring_response)
+    actual_result = parse_response(scoring_response)
     print("Response: ", actual_result)
     
     # Read the expected result from the response data file
@@ -82,9 +448,9 @@ def main(args):
     print("Expected Result: ", expected_result)
 
     # Compare the expected result with the actual result in json format
-    assert compare_json(
-        json.loads(actual_result), json.loads(expected_result)
-    ), "The response data does not match the expected result"
+    matches = compare_json(actual_result, json.loads(expected_result))
+    telemetry.count("mismatches", int(not matches))
+    assert matches, "The response data does not match the expected result"
 
     print("The response data matches the expected result")
     print("Validation successful!")
@@ -117,9 +483,51 @@ if __name__ == "__main__":
     parser.add_argument(
         "--response_data", type=str, help="The path to the response data json file"
     )
+    parser.add_argument(
+        "--scoring_uri",
+        type=str,
+        default=None,
+        help="Scoring URI called instead of the Azure ML endpoint, e.g. http://127.0.0.1:5001/score of src/scoring/score.py",
+    )
+    parser.add_argument(
+        "--api_key", type=str, default=None, help="Key or token of the scoring URI, if any"
+    )
+    parser.add_argument(
+        "--load_test",
+        action="store_true",
+        help="Load test the deployment with the request corpus instead of validating one response",
+    )
+    parser.add_argument(
+        "--request_corpus",
+        type=str,
+        default=None,
+        help="Request file, JSON lines file or folder of request files replayed by the load test, defaults to --request_data",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Number of concurrent connections of the load test"
+    )
+    parser.add_argument(
+        "--requests", type=int, default=1000, help="Number of requests sent by the load test"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=60, help="Timeout of a request in seconds"
+    )
+    parser.add_argument(
+        "--max_p99_ms", type=float, default=None, help="SLO of the p99 latency in milliseconds"
+    )
+    parser.add_argument(
+        "--min_throughput", type=float, default=None, help="SLO of the successful requests per second"
+    )
+    parser.add_argument(
+        "--max_error_rate", type=float, default=0.0, help="SLO of the share of failed requests"
+    )
+    parser.add_argument(
+        "--load_test_report", type=str, default=None, help="Path to the JSON summary of the load test"
+    )
 
     args = parser.parse_args()
     print("Printing received arguments...")
     for arg_name in vars(args):
         print(f"{arg_name}: {getattr(args, arg_name)}")
-    main(args)
+    with Telemetry.from_env("validate_online_endpoint") as telemetry:
+        main(args, telemetry)
@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from src.components.classification import champion_store
+from src.components.classification.champion_store import LocalChampionMetricsStore, champion_key, parse_model_uri
+
+class TestChampionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store = LocalChampionMetricsStore(os.path.join(self.test_dir, "store"))
+        self.key = champion_key("fraud", "3", "fingerprint", {"average": "binary"})
+        self.metrics = {"model_id": "champion", "accuracy": 0.9, "curves_file": "results_curves.npz"}
+        self.curves_file = os.path.join(self.test_dir, "results_curves.npz")
+        with open(self.curves_file, "wb") as f:
+            f.write(b"curves")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_get_returns_stored_metrics_and_restores_artifacts(self):
+        assert self.store.get(self.key) is None
+        self.store.put(self.key, self.metrics, {"curves_file": self.curves_file})
+
+        restored_file = os.path.join(self.test_dir, "restored", "curves.npz")
+        assert self.store.get(self.key, {"curves_file": restored_file}) == self.metrics
+        with open(restored_file, "rb") as f:
+            assert f.read() == b"curves"
+
+        # Another version, test data or parameters miss
+        for key in [champion_key("fraud", "4", "fingerprint", {"average": "binary"}),
+                    champion_key("fraud", "3", "other", {"average": "binary"}),
+                    champion_key("fraud", "3", "fingerprint", {"average": "macro"})]:
+            assert self.store.get(key, {"curves_file": restored_file}) is None
+
+    def test_stale_entries_are_invalidated(self):
+        self.store.put(self.key, {"accuracy": 0.9})
+
+        with mock.patch.object(champion_store, "CHAMPION_SCHEMA_VERSION", champion_store.CHAMPION_SCHEMA_VERSION + 1):
+            assert self.store.get(self.key) is None
+        assert self.store.get(self.key) is None
+
+        self.store.put(self.key, {"accuracy": 0.9})
+        with open(os.path.join(self.store._entry_path(self.key), "entry.json"), "r") as f:
+            created_at = json.load(f)["created_at"]
+        expiring_store = LocalChampionMetricsStore(self.store.root, ttl_seconds=60)
+        with mock.patch.object(champion_store.time, "time", return_value=created_at + 59):
+            assert expiring_store.get(self.key) == {"accuracy": 0.9}
+        with mock.patch.object(champion_store.time, "time", return_value=created_at + 61):
+            assert expiring_store.get(self.key) is None
+        assert self.store.get(self.key) is None
+
+    def test_invalidate_by_model_name(self):
+        other_key = champion_key("churn", "1", "fingerprint")
+        self.store.put(self.key, {"accuracy": 0.9})
+        self.store.put(other_key, {"accuracy": 0.8})
+
+        assert self.store.invalidate("fraud") == 1
+        assert self.store.get(self.key) is None
+        assert self.store.get(other_key) == {"accuracy": 0.8}
+        assert self.store.invalidate() == 1
+
+    def test_parse_model_uri(self):
+        assert parse_model_uri("models:/fraud/3") == ("fraud", "3")
+        assert parse_model_uri("models:/fraud/latest") == (None, None)
+        assert parse_model_uri("path/to/model") == (None, None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import hashlib
+import math
+import unittest
+import numpy as np
+from sklearn.metrics import accuracy_score, average_precision_score, f1_score, precision_score, recall_score, roc_auc_score, roc_curve
+from src.components.classification.classification_metrics import ConfusionCounts, PackedCorrectness, bootstrap_intervals, mcnemar_test, metrics_from_matrix, threshold_curves, tpr_at_fpr
+
+class TestClassificationMetrics(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.y_true = rng.integers(0, 3, size=5000)
+        # Predictions agreeing with the labels 70% of the time
+        self.y_pred = np.where(rng.random(5000) < 0.7, self.y_true, rng.integers(0, 3, size=5000))
+
+    def assert_metrics_equal(self, actual, expected):
+        # Averages over labels registered in another order may differ in the last bit
+        self.assertEqual(actual.keys(), expected.keys())
+        for name, value in expected.items():
+            self.assertAlmostEqual(actual[name], value, places=12, msg=name)
+
+    def test_binary_metrics_match_sklearn(self):
+        y_true = (self.y_true == 1).astype(int)
+        y_pred = (self.y_pred == 1).astype(int)
+        counts = ConfusionCounts()
+        counts.update(y_true, y_pred)
+        metrics = counts.metrics()
+
+        self.assertAlmostEqual(metrics['accuracy'], accuracy_score(y_true, y_pred))
+        self.assertAlmostEqual(metrics['recall'], recall_score(y_true, y_pred))
+        self.assertAlmostEqual(metrics['precision'], precision_score(y_true, y_pred))
+        self.assertAlmostEqual(metrics['f1_score'], f1_score(y_true, y_pred))
+
+        tn, fp, fn, tp = ((y_true == 0) & (y_pred == 0)).sum(), ((y_true == 0) & (y_pred == 1)).sum(), \
+            ((y_true == 1) & (y_pred == 0)).sum(), ((y_true == 1) & (y_pred == 1)).sum()
+        self.assertAlmostEqual(metrics['fpr'], fp / (fp + tn))
+        self.assertAlmostEqual(metrics['fnr'], fn / (fn + tp))
+
+    def test_multiclass_averages_match_sklearn(self):
+        counts = ConfusionCounts()
+        counts.update(self.y_true, self.y_pred)
+
+        for average in ['micro', 'macro', 'weighted']:
+            with self.subTest(average=average):
+                metrics = counts.metrics(average)
+                self.assertAlmostEqual(metrics['recall'], recall_score(self.y_true, self.y_pred, average=average))
+                self.assertAlmostEqual(metrics['precision'], precision_score(self.y_true, self.y_pred, average=average))
+                self.assertAlmostEqual(metrics['f1_score'], f1_score(self.y_true, self.y_pred, average=average))
+
+    def test_batches_and_merges_match_single_pass(self):
+        whole = ConfusionCounts()
+        whole.update(self.y_true, self.y_pred)
+
+        merged = ConfusionCounts()
+        for start in range(0, 5000, 1300):
+            part = ConfusionCounts()
+            part.update(self.y_true[start:start + 1300][::-1], self.y_pred[start:start + 1300][::-1])
+            merged.merge(part)
+        self.assertEqual(merged.total, 5000)
+        for average in ['binary', 'macro']:
+            self.assert_metrics_equal(merged.metrics(average), whole.metrics(average))
+
+        # String labels go through the hash-based encoding and are registered in another order
+        named = ConfusionCounts()
+        names = np.array(['cat', 'dog', 'fish'])
+        named.update(names[self.y_true], names[self.y_pred])
+        self.assert_metrics_equal(named.metrics('weighted'), whole.metrics('weighted'))
+
+    def test_missing_positive_label_gives_zero_metrics(self):
+        counts = ConfusionCounts()
+        counts.update([0, 0, 0], [0, 0, 0])
+        metrics = counts.metrics()
+
+        self.assertEqual(metrics['accuracy'], 1.0)
+        self.assertEqual(metrics['recall'], 0.0)
+        self.assertEqual(metrics['precision'], 0.0)
+        self.assertEqual(metrics['f1_score'], 0.0)
+
+    def test_positive_label_not_among_the_labels_raises(self):
+        y_true, y_pred = ['fraud', 'legit', 'legit'], ['fraud', 'fraud', 'legit']
+        counts = ConfusionCounts()
+        counts.update(y_true, y_pred)
+
+        # scikit-learn rejects the default positive label of string labels too
+        with self.assertRaises(ValueError):
+            precision_score(y_true, y_pred)
+        with self.assertRaises(ValueError):
+            counts.metrics()
+        self.assertAlmostEqual(counts.metrics(pos_label='fraud')['precision'], precision_score(y_true, y_pred, pos_label='fraud'))
+
+    def test_stacked_matrices_are_evaluated_together(self):
+        counts = ConfusionCounts()
+        counts.update(self.y_true, self.y_pred)
+        stacked = metrics_from_matrix(np.stack([counts.matrix, 2 * counts.matrix]), counts.labels, 'macro')
+
+        np.testing.assert_allclose(stacked['f1_score'], [counts.metrics('macro')['f1_score']] * 2)
+
+    def test_threshold_curves_match_sklearn(self):
+        # Rounded scores have many ties between the positives and negatives
+        rng = np.random.default_rng(1)
+        y_true = rng.random(5000) < 0.3
+        scores = np.round(np.clip(y_true * 0.3 + rng.random(5000) * 0.8, 0, 1), 2)
+        curves = threshold_curves(y_true, scores, grid_size=21)
+
+        self.assertAlmostEqual(curves['roc_auc'], roc_auc_score(y_true, scores))
+        self.assertAlmostEqual(curves['average_precision'], average_precision_score(y_true, scores))
+        fpr, tpr, _ = roc_curve(y_true, scores, drop_intermediate=False)
+        for max_fpr in [0.01, 0.1, 0.5]:
+            self.assertAlmostEqual(tpr_at_fpr(curves, max_fpr)[0], tpr[fpr <= max_fpr].max())
+
+        for index in [0, 7, 20]:
+            y_pred = scores >= curves['grid_thresholds'][index]
+            self.assertAlmostEqual(curves['grid_precision'][index], precision_score(y_true, y_pred, zero_division=0))
+            self.assertAlmostEqual(curves['grid_recall'][index], recall_score(y_true, y_pred))
+            self.assertAlmostEqual(curves['grid_accuracy'][index], accuracy_score(y_true, y_pred))
+
+
+    def test_tpr_at_fpr_with_tied_scores_on_a_straight_segment(self):
+        # Every score is shared by a positive and a negative, so the ROC curve is a diagonal
+        y_true = np.array([1, 0] * 50, dtype=bool)
+        scores = np.repeat(np.linspace(1, 0.01, 50), 2)
+        curves = threshold_curves(y_true, scores)
+
+        self.assertEqual(len(curves['fpr']), 2)
+        tpr, fpr, threshold = tpr_at_fpr(curves, 0.5)
+        self.assertEqual((tpr, fpr), (0.5, 0.5))
+        self.assertEqual(np.mean(scores[~y_true] >= threshold), 0.5)
+
+    def test_bootstrap_intervals_match_row_resampling(self):
+        counts = ConfusionCounts()
+        counts.update(self.y_true, self.y_pred)
+        intervals = bootstrap_intervals(counts.matrix, counts.labels, 'macro', n_resamples=2000, block_size=300)
+
+        # Resampling the rows gives the same intervals up to the Monte Carlo error
+        rng = np.random.default_rng(7)
+        indices = rng.integers(0, 5000, size=(2000, 5000))
+        accuracies = (self.y_true[indices] == self.y_pred[indices]).mean(axis=1)
+        lower, upper = np.quantile(accuracies, [0.025, 0.975])
+        self.assertAlmostEqual(intervals['accuracy']['lower'], lower, delta=0.003)
+        self.assertAlmostEqual(intervals['accuracy']['upper'], upper, delta=0.003)
+
+        # The blocks are seeded independently of the threads evaluating them
+        assert bootstrap_intervals(counts.matrix, counts.labels, 'macro', n_resamples=2000, block_size=300, max_workers=1) == intervals
+
+    def test_packed_correctness_of_uneven_batches(self):
+        rng = np.random.default_rng(4)
+        correct = rng.random(1003) < 0.8
+        label_hashes = rng.integers(0, 2**63, size=1003).astype(np.uint64)
+
+        packed = PackedCorrectness()
+        for rows in np.split(np.arange(1003), [3, 10, 500, 501, 990]):
+            packed.update(correct[rows], label_hashes[rows])
+
+        # The bits and digest do not depend on the batches
+        np.testing.assert_array_equal(packed.packed(), np.packbits(correct))
+        assert packed.rows == 1003
+        assert packed.labels_digest == hashlib.sha256(label_hashes.tobytes()).hexdigest()
+
+    def test_mcnemar_test_on_packed_bits(self):
+        rng = np.random.default_rng(3)
+        for rows, accuracy_b in [(1003, 0.75), (200001, 0.795)]:
+            correct_a = rng.random(rows) < 0.8
+            correct_b = rng.random(rows) < accuracy_b
+            only_a, only_b, p_value = mcnemar_test(np.packbits(correct_a), np.packbits(correct_b))
+
+            assert only_a == (correct_a & ~correct_b).sum()
+            assert only_b == (correct_b & ~correct_a).sum()
+            if only_a + only_b <= 1000:
+                # Exact two-sided binomial test of the discordant rows
+                discordant = only_a + only_b
+                tail = sum(math.comb(discordant, k) for k in range(min(only_a, only_b) + 1)) / 2 ** discordant
+                self.assertAlmostEqual(p_value, min(1.0, 2 * tail))
+            else:
+                statistic = (abs(only_a - only_b) - 1) ** 2 / (only_a + only_b)
+                self.assertAlmostEqual(p_value, math.erfc(math.sqrt(statistic / 2)))
+
+        self.assertEqual(mcnemar_test(np.packbits(correct_a), np.packbits(correct_a)), (0, 0, 1.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,7 +6,13 @@ from unittest.mock import patch, MagicMock
 import pandas as pd
 import json
 import os
-from src.components.classification.model_evaluator import evaluate_model
+import numpy as np
+import mlflow.sklearn
+from sklearn.dummy import DummyClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import recall_score, roc_auc_score
+from src.components.classification.classification_metrics import load_correctness, load_curves
+from src.components.classification.model_evaluator import evaluate_model, load_model
 
 
 # Test class for testing evaluate_model function including cleanup code for any files or folders generated during the test execution
@@ -23,8 +29,8 @@ class TestEvaluateModel(unittest.TestCase):
 
     @mock.patch("src.components.classification.model_evaluator.mlflow")
     @mock.patch("src.components.classification.model_evaluator.load_model")
-    @mock.patch("src.components.classification.model_evaluator.glob.glob")
-    @mock.patch("src.components.classification.model_evaluator.pd.read_csv")
+    @mock.patch("components.common.data_loader.glob.glob")
+    @mock.patch("components.common.data_loader.pd.read_csv")
     @mock.patch("src.components.classification.model_evaluator.os.makedirs")
     def test_evaluate_model_no_model(
         self,
@@ -69,8 +75,8 @@ class TestEvaluateModel(unittest.TestCase):
 
     @mock.patch("src.components.classification.model_evaluator.mlflow")
     @mock.patch("src.components.classification.model_evaluator.load_model")
-    @mock.patch("src.components.classification.model_evaluator.glob.glob")
-    @mock.patch("src.components.classification.model_evaluator.pd.read_csv")
+    @mock.patch("components.common.data_loader.glob.glob")
+    @mock.patch("components.common.data_loader.pd.read_csv")
     @mock.patch("src.components.classification.model_evaluator.os.makedirs")
     def test_evaluate_model_with_model(
         self,
@@ -114,3 +120,247 @@ class TestEvaluateModel(unittest.TestCase):
         assert results["f1_score"] == 1.0
         assert results["fpr"] == 0.0
         assert results["fnr"] == 0.0
+
+    def create_test_data(self):
+        # Create a noisy test dataset split in two files and a model trained on it
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({"feature1": rng.normal(size=1000), "feature2": rng.normal(size=1000)})
+        df["outcome"] = (df["feature1"] + rng.normal(size=1000) > 0.5).astype(int)
+        test_data_path = os.path.join(self.test_dir, "test_data")
+        os.mkdir(test_data_path)
+        df.iloc[:600].to_csv(os.path.join(test_data_path, "part-0.csv"), index=False)
+        df.iloc[600:].to_csv(os.path.join(test_data_path, "part-1.csv"), index=False)
+
+        model = LogisticRegression().fit(df[["feature1", "feature2"]], df["outcome"])
+        return test_data_path, model
+
+    def read_results(self, result_file):
+        with open(result_file, "r") as f:
+            return json.load(f)
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    @mock.patch("src.components.classification.model_evaluator.load_model")
+    def test_evaluate_model_in_batches(self, mock_load_model, mock_mlflow):
+        test_data_path, model = self.create_test_data()
+        mock_model = MagicMock(wraps=model)
+        mock_load_model.return_value = mock_model
+
+        # Evaluate at once and in batches
+        full_result_file = os.path.join(self.test_dir, "full_results.json")
+        batch_result_file = os.path.join(self.test_dir, "batch_results.json")
+        evaluate_model("model_1", "path/to/model", test_data_path, "outcome", full_result_file)
+        mock_model.predict.reset_mock()
+        evaluate_model("model_1", "path/to/model", test_data_path, "outcome", batch_result_file, batch_size=64)
+
+        full_results = self.read_results(full_result_file)
+        batch_results = self.read_results(batch_result_file)
+
+        # Batches never exceed the batch size and the metrics are identical
+        batch_sizes = [len(call.args[0]) for call in mock_model.predict.call_args_list]
+        assert max(batch_sizes) == 64
+        assert sum(batch_sizes) == 1000
+        assert 0 < full_results["accuracy"] < 1
+        assert batch_results == full_results
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    def test_evaluate_model_on_worker_processes(self, mock_mlflow):
+        test_data_path, model = self.create_test_data()
+        model_path = os.path.join(self.test_dir, "model")
+        mlflow.sklearn.save_model(model, model_path)
+
+        # Evaluate in a single process and sharded across worker processes
+        single_result_file = os.path.join(self.test_dir, "single_results.json")
+        evaluate_model("model_1", model_path, test_data_path, "outcome", single_result_file)
+        single_results = self.read_results(single_result_file)
+
+        for batch_size in [None, 128]:
+            with self.subTest(batch_size=batch_size):
+                parallel_result_file = os.path.join(self.test_dir, "parallel_results.json")
+                # Only the worker processes load the model
+                with mock.patch("src.components.classification.model_evaluator.load_model", wraps=load_model) as parent_load_model:
+                    evaluate_model("model_1", model_path, test_data_path, "outcome", parallel_result_file, batch_size=batch_size, num_workers=2)
+                parent_load_model.assert_not_called()
+
+                assert self.read_results(parallel_result_file) == single_results
+
+        with self.assertRaises(FileNotFoundError):
+            evaluate_model("model_1", os.path.join(self.test_dir, "missing"), test_data_path, "outcome", single_result_file, num_workers=2)
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    @mock.patch("src.components.classification.model_evaluator.load_model")
+    def test_evaluate_model_threshold_sweep(self, mock_load_model, mock_mlflow):
+        test_data_path, model = self.create_test_data()
+        mock_model = MagicMock(wraps=model)
+        mock_model.classes_ = model.classes_
+        mock_load_model.return_value = mock_model
+
+        # Evaluate the hard labels, then sweep the thresholds at once and in batches
+        label_result_file = os.path.join(self.test_dir, "label_results.json")
+        evaluate_model("model_1", "path/to/model", test_data_path, "outcome", label_result_file)
+        for batch_size in [None, 128]:
+            with self.subTest(batch_size=batch_size):
+                mock_model.predict.reset_mock()
+                mock_model.predict_proba.reset_mock()
+                result_file = os.path.join(self.test_dir, f"sweep_results_{batch_size}.json")
+                evaluate_model("model_1", "path/to/model", test_data_path, "outcome", result_file, batch_size=batch_size, threshold_grid_size=11)
+
+                # The probabilities are predicted once per row and give the same hard labels
+                mock_model.predict.assert_not_called()
+                assert sum(len(call.args[0]) for call in mock_model.predict_proba.call_args_list) == 1000
+                results = self.read_results(result_file)
+                for name, value in self.read_results(label_result_file).items():
+                    assert results[name] == value
+
+                # The curves are saved next to the results and match scikit-learn
+                df = pd.concat([pd.read_csv(os.path.join(test_data_path, f"part-{i}.csv")) for i in range(2)])
+                scores = model.predict_proba(df[["feature1", "feature2"]])[:, 1]
+                self.assertAlmostEqual(results["roc_auc"], roc_auc_score(df["outcome"], scores))
+                curves = load_curves(os.path.join(self.test_dir, results["curves_file"]))
+                assert results["curves_file"] == f"sweep_results_{batch_size}_curves.npz"
+                assert len(curves["grid_thresholds"]) == 11
+                self.assertAlmostEqual(curves["grid_recall"][5], recall_score(df["outcome"], scores >= 0.5))
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    @mock.patch("src.components.classification.model_evaluator.load_model")
+    def test_evaluate_model_threshold_sweep_pos_label(self, mock_load_model, mock_mlflow):
+        test_data_path, model = self.create_test_data()
+        mock_load_model.return_value = model
+
+        # The scores and positives of the sweep follow the positive label
+        result_file = os.path.join(self.test_dir, "results.json")
+        evaluate_model("model_1", "path/to/model", test_data_path, "outcome", result_file, threshold_grid_size=11, pos_label=0)
+        results = self.read_results(result_file)
+        df = pd.concat([pd.read_csv(os.path.join(test_data_path, f"part-{i}.csv")) for i in range(2)])
+        scores = model.predict_proba(df[["feature1", "feature2"]])[:, 0]
+        self.assertAlmostEqual(results["roc_auc"], roc_auc_score(df["outcome"] == 0, scores))
+        self.assertAlmostEqual(results["recall"], recall_score(df["outcome"], model.predict(df[["feature1", "feature2"]]), pos_label=0))
+
+        # A positive label the model cannot predict has no scores
+        with self.assertRaises(ValueError):
+            evaluate_model("model_1", "path/to/model", test_data_path, "outcome", result_file, threshold_grid_size=11, pos_label="fraud")
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    @mock.patch("src.components.classification.model_evaluator.load_model")
+    def test_evaluate_model_confidence_intervals(self, mock_load_model, mock_mlflow):
+        test_data_path, model = self.create_test_data()
+        mock_model = MagicMock(wraps=model)
+        mock_load_model.return_value = mock_model
+
+        result_file = os.path.join(self.test_dir, "results.json")
+        evaluate_model("model_1", "path/to/model", test_data_path, "outcome", result_file, bootstrap_resamples=500, confidence_level=0.9)
+        results = self.read_results(result_file)
+
+        # The model predicts once and every metric lies within its interval
+        assert mock_model.predict.call_count == 1
+        assert results["confidence_level"] == 0.9
+        for name in ["accuracy", "recall", "precision", "f1_score", "fpr", "fnr"]:
+            interval = results["confidence_intervals"][name]
+            assert interval["lower"] < results[name] < interval["upper"]
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    @mock.patch("src.components.classification.model_evaluator.load_model")
+    def test_evaluate_model_slices(self, mock_load_model, mock_mlflow):
+        # A segment feature with 7 values and the rounded first feature with hundreds of values
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({"feature1": rng.normal(size=1000).round(2), "segment": np.arange(1000) % 7})
+        df["outcome"] = (df["feature1"] + rng.normal(size=1000) > 0.5).astype(int)
+        test_data_path = os.path.join(self.test_dir, "test_data")
+        os.mkdir(test_data_path)
+        df.to_csv(os.path.join(test_data_path, "test_data.csv"), index=False)
+        model = LogisticRegression().fit(df[["feature1", "segment"]], df["outcome"])
+        mock_load_model.return_value = model
+
+        for batch_size in [None, 128]:
+            with self.subTest(batch_size=batch_size):
+                result_file = os.path.join(self.test_dir, "results.json")
+                evaluate_model("model_1", "path/to/model", test_data_path, "outcome", result_file, batch_size=batch_size, slice_columns=["segment", "feature1"])
+                results = self.read_results(result_file)
+                slices = pd.read_csv(os.path.join(self.test_dir, results["slices_file"]))
+
+                # Every value of the columns has a slice whose metrics match evaluating it alone
+                assert results["slices_file"] == "results_slices.csv"
+                assert len(slices) == 7 + df["feature1"].nunique()
+                assert slices.groupby("slice_column")["rows"].sum().tolist() == [1000, 1000]
+                segment = slices[(slices["slice_column"] == "segment") & (slices["slice_value"] == 3)].iloc[0]
+                rows = df[df["segment"] == 3]
+                y_pred = model.predict(rows[["feature1", "segment"]])
+                assert segment["rows"] == len(rows)
+                self.assertAlmostEqual(segment["recall"], recall_score(rows["outcome"], y_pred))
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    @mock.patch("src.components.classification.model_evaluator.load_model")
+    def test_evaluate_model_predictions_file(self, mock_load_model, mock_mlflow):
+        test_data_path, model = self.create_test_data()
+        mock_load_model.return_value = model
+
+        digests = set()
+        for batch_size in [None, 128, 125]:
+            with self.subTest(batch_size=batch_size):
+                result_file = os.path.join(self.test_dir, "results.json")
+                predictions_file = os.path.join(self.test_dir, "predictions", "model_1.npz")
+                evaluate_model("model_1", "path/to/model", test_data_path, "outcome", result_file, batch_size=batch_size, predictions_file=predictions_file)
+                results = self.read_results(result_file)
+
+                # The packed bits hold the correctness of every row in test data order
+                correct, rows, labels_digest = load_correctness(os.path.join(self.test_dir, results["predictions_file"]))
+                df = pd.concat([pd.read_csv(os.path.join(test_data_path, f"part-{i}.csv")) for i in range(2)])
+                expected = model.predict(df[["feature1", "feature2"]]) == df["outcome"].to_numpy()
+                assert rows == 1000
+                np.testing.assert_array_equal(np.unpackbits(correct)[:rows].astype(bool), expected)
+                assert labels_digest == results["labels_digest"]
+                digests.add(labels_digest)
+
+        # The digest does not depend on the batches
+        assert len(digests) == 1
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    @mock.patch("src.components.classification.model_evaluator.load_model")
+    def test_evaluate_model_reuses_champion_results(self, mock_load_model, mock_mlflow):
+        test_data_path, model = self.create_test_data()
+        mock_load_model.return_value = model
+        store_path = os.path.join(self.test_dir, "champions")
+
+        # The first run evaluates the champion and stores its results with the curves
+        first_result_file = os.path.join(self.test_dir, "first", "results.json")
+        evaluate_model("champion", "models:/fraud/3", test_data_path, "outcome", first_result_file, threshold_grid_size=11, champion_store=store_path)
+        assert mock_load_model.call_count == 1
+
+        # The next run reuses them without loading the model
+        second_result_file = os.path.join(self.test_dir, "second", "results.json")
+        evaluate_model("existing", "models:/fraud/3", test_data_path, "outcome", second_result_file, threshold_grid_size=11, champion_store=store_path)
+        assert mock_load_model.call_count == 1
+        first_results, second_results = self.read_results(first_result_file), self.read_results(second_result_file)
+        assert second_results == {**first_results, "model_id": "existing"}
+        assert os.path.exists(os.path.join(self.test_dir, "second", second_results["curves_file"]))
+
+        # A new version or modified test data are evaluated again
+        evaluate_model("champion", "models:/fraud/4", test_data_path, "outcome", second_result_file, threshold_grid_size=11, champion_store=store_path)
+        assert mock_load_model.call_count == 2
+        pd.read_csv(os.path.join(test_data_path, "part-1.csv")).iloc[:-1].to_csv(os.path.join(test_data_path, "part-1.csv"), index=False)
+        evaluate_model("champion", "models:/fraud/3", test_data_path, "outcome", second_result_file, threshold_grid_size=11, champion_store=store_path)
+        assert mock_load_model.call_count == 3
+        assert self.read_results(second_result_file)["confusion_matrix"] != first_results["confusion_matrix"]
+
+    @mock.patch("src.components.classification.model_evaluator.mlflow")
+    @mock.patch("src.components.classification.model_evaluator.load_model")
+    def test_evaluate_model_champion_key_covers_the_label_and_rows_in_memory(self, mock_load_model, mock_mlflow):
+        # A constant model predicts whatever the other columns are
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({"feature1": rng.normal(size=200), "outcome": rng.integers(0, 2, 200), "other": rng.integers(0, 2, 200)})
+        mock_load_model.return_value = DummyClassifier(strategy="constant", constant=1).fit(df[["feature1"]], df["outcome"])
+        store_path = os.path.join(self.test_dir, "champions")
+        result_file = os.path.join(self.test_dir, "results.json")
+
+        def evaluate(outcome_label, test_data):
+            evaluate_model("champion", "models:/fraud/3", None, outcome_label, result_file, champion_store=store_path, test_data=test_data)
+            return self.read_results(result_file)["confusion_matrix"]
+
+        first_matrix = evaluate("outcome", df)
+        assert evaluate("outcome", df.copy()) == first_matrix
+        assert mock_load_model.call_count == 1
+
+        # Another label column or other rows in memory are evaluated again
+        assert evaluate("other", df) != first_matrix
+        assert mock_load_model.call_count == 2
+        assert np.sum(evaluate("outcome", df.iloc[:100])) == 100
+        assert mock_load_model.call_count == 3
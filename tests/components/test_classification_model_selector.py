@@ -3,9 +3,11 @@ import unittest
 import pytest
 import json
 import os
+import numpy as np
 import pandas as pd
 from unittest import mock
-from src.components.classification.model_selector import compare_models
+from src.components.classification.classification_metrics import save_correctness, save_curves, threshold_curves
+from src.components.classification.model_selector import compare_models, pareto_front
 
 class TestCompareModels(unittest.TestCase):
 
@@ -82,4 +84,170 @@ class TestCompareModels(unittest.TestCase):
         assert len(result['models']) == 2
 
         # Assert that mlflow start_run and log_metrics were called
-        mock_mlflow.start_run.assert_called()
\ No newline at end of file
+        mock_mlflow.start_run.assert_called()
+
+    @mock.patch('src.components.classification.model_selector.mlflow')
+    def test_compare_models_max_tpr_at_fpr(self, mock_mlflow):
+        # Model 1 ranks the positives better at a low false positive rate, model 2 overall
+        rng = np.random.default_rng(0)
+        y_true = rng.random(2000) < 0.3
+        model_scores = {
+            'model_1': np.where(y_true & (rng.random(2000) < 0.5), 0.99, rng.random(2000) * 0.9),
+            'model_2': y_true * 0.3 + rng.random(2000) * 0.7
+        }
+        report_files = []
+        for model_id, scores in model_scores.items():
+            curves = threshold_curves(y_true, scores)
+            save_curves(os.path.join(self.test_dir, f"{model_id}_curves.npz"), curves)
+            report_files.append(os.path.join(self.test_dir, f"{model_id}_metrics.json"))
+            with open(report_files[-1], 'w') as f:
+                json.dump({"model_id": model_id, "f1_score": 0.5, "fpr": 0.1, "fnr": 0.2,
+                           "roc_auc": curves["roc_auc"], "curves_file": f"{model_id}_curves.npz"}, f)
+
+        compare_models(report_files, 'roc_auc', self.output_path)
+        with open(self.output_path, 'r') as f:
+            assert json.load(f)['best_model_id'] == 'model_2'
+
+        compare_models(report_files, 'max_tpr_at_fpr', self.output_path, max_fpr=0.01)
+        with open(self.output_path, 'r') as f:
+            result = json.load(f)
+
+        assert result['best_model_id'] == 'model_1'
+        for model in result['models']:
+            assert model['operating_fpr'] <= 0.01
+            assert 0 < model['tpr_at_max_fpr'] <= 1
+
+    @mock.patch('src.components.classification.model_selector.mlflow')
+    def test_compare_models_max_tpr_at_fpr_needs_curves(self, mock_mlflow):
+        with self.assertRaises(ValueError):
+            compare_models(self.mock_metrics_files, 'max_tpr_at_fpr', self.output_path, max_fpr=0.01)
+
+    @mock.patch('src.components.classification.model_selector.mlflow')
+    def test_compare_models_folder_of_reports(self, mock_mlflow):
+        # Fifty candidates in a folder, the best F1 score is in the middle of the sweep
+        reports_dir = os.path.join(self.test_dir, "reports")
+        os.mkdir(reports_dir)
+        for i in range(50):
+            with open(os.path.join(reports_dir, f"model_{i:02d}.json"), 'w') as f:
+                json.dump({"model_id": f"model_{i:02d}", "f1_score": 0.9 - abs(i - 31) / 100, "fpr": i / 100, "fnr": 0.5}, f)
+
+        for reports in [reports_dir, os.path.join(reports_dir, "model_*.json")]:
+            compare_models(reports, 'balanced', self.output_path)
+            with open(self.output_path, 'r') as f:
+                result = json.load(f)
+
+            assert result['best_model_id'] == 'model_31'
+            assert len(result['models']) == 50
+            ranks = {model['model_id']: model['rank'] for model in result['models']}
+            assert ranks['model_31'] == 1
+            assert ranks['model_00'] == 50
+
+        compare_models(reports_dir, 'minimize_fp', self.output_path)
+        with open(self.output_path, 'r') as f:
+            assert json.load(f)['best_model_id'] == 'model_00'
+
+    @mock.patch('src.components.classification.model_selector.mlflow')
+    def test_compare_models_constrained_selection_and_pareto_front(self, mock_mlflow):
+        reports_dir = os.path.join(self.test_dir, "reports")
+        os.mkdir(reports_dir)
+        candidates = {
+            "model_a": {"fpr": 0.01, "fnr": 0.30, "f1_score": 0.70},
+            "model_b": {"fpr": 0.02, "fnr": 0.20, "f1_score": 0.78},
+            "model_c": {"fpr": 0.03, "fnr": 0.25, "f1_score": 0.74},
+            "model_d": {"fpr": 0.05, "fnr": 0.10, "f1_score": 0.82},
+        }
+        for model_id, metrics in candidates.items():
+            with open(os.path.join(reports_dir, f"{model_id}.json"), 'w') as f:
+                json.dump({"model_id": model_id, **metrics}, f)
+
+        compare_models(reports_dir, 'balanced', self.output_path, objective='fnr', subject_to=['fpr<=0.02'])
+        with open(self.output_path, 'r') as f:
+            result = json.load(f)
+
+        # model_d has the lowest FNR but too many false positives, model_c is dominated by model_b
+        assert result['best_model_id'] == 'model_b'
+        assert result['pareto_front'] == ['model_a', 'model_b', 'model_d']
+        assert [model['feasible'] for model in result['models']] == [True, True, False, False]
+
+        compare_models(reports_dir, 'balanced', self.output_path, pareto_metrics=['f1_score', 'fpr', 'fnr'])
+        with open(self.output_path, 'r') as f:
+            result = json.load(f)
+        assert result['best_model_id'] == 'model_d'
+        assert result['pareto_front'] == ['model_a', 'model_b', 'model_d']
+
+        with self.assertRaises(ValueError):
+            compare_models(reports_dir, 'balanced', self.output_path, objective='fnr', subject_to=['fpr<=0.001'])
+
+    def test_pareto_front_matches_pairwise_dominance(self):
+        rng = np.random.default_rng(0)
+        for dimensions in [2, 3]:
+            # Few distinct values give many ties and duplicates
+            points = rng.integers(0, 8, size=(300, dimensions)).astype(float)
+            dominated = [
+                np.any(np.all(points <= point, axis=1) & np.any(points < point, axis=1))
+                for point in points
+            ]
+            np.testing.assert_array_equal(pareto_front(points), ~np.array(dominated))
+
+    @mock.patch('src.components.classification.model_selector.mlflow')
+    def test_compare_models_results_folders(self, mock_mlflow):
+        # Every evaluation job writes its report and artifacts to its own results folder
+        rng = np.random.default_rng(2)
+        y_true = rng.random(5000) < 0.3
+        model_scores = {
+            "model_a": y_true + rng.normal(0, 0.8, 5000),
+            "model_b": y_true + rng.normal(0, 0.3, 5000),
+        }
+        results_dirs = []
+        for model_id, scores in model_scores.items():
+            results_dir = os.path.join(self.test_dir, "jobs", model_id, "results")
+            os.makedirs(results_dir)
+            save_curves(os.path.join(results_dir, f"{model_id}_curves.npz"), threshold_curves(y_true, scores))
+            save_correctness(os.path.join(results_dir, f"{model_id}_predictions.npz"), (scores > 0.5) == y_true, "same-labels")
+            with open(os.path.join(results_dir, f"{model_id}.json"), 'w') as f:
+                json.dump({"model_id": model_id, "f1_score": 0.5, "fpr": 0.1, "fnr": 0.2,
+                           "curves_file": f"{model_id}_curves.npz", "predictions_file": f"{model_id}_predictions.npz"}, f)
+            results_dirs.append(results_dir)
+
+        # The artifacts are resolved from the folder of every report, not from the output or working folder
+        compare_models(results_dirs, 'max_tpr_at_fpr', self.output_path, max_fpr=0.05,
+                       significance_level=0.01, baseline_model_id="model_a")
+        with open(self.output_path, 'r') as f:
+            result = json.load(f)
+        assert result['best_model_id'] == 'model_b'
+        assert result['significance_test']['significant']
+
+    @mock.patch('src.components.classification.model_selector.mlflow')
+    def test_compare_models_significance_gate(self, mock_mlflow):
+        # The champion is right on 80% of the rows, a challenger slightly more often and another much more often
+        rng = np.random.default_rng(0)
+        champion = rng.random(20000) < 0.8
+        candidates = {
+            "champion": champion,
+            "slightly_better": np.where(rng.random(20000) < 0.02, rng.random(20000) < 0.85, champion),
+            "much_better": champion | (rng.random(20000) < 0.25),
+        }
+        reports_dir = os.path.join(self.test_dir, "reports")
+        os.mkdir(reports_dir)
+        report_files = {}
+        for model_id, correct in candidates.items():
+            save_correctness(os.path.join(reports_dir, f"{model_id}.npz"), correct, "same-labels")
+            report_files[model_id] = os.path.join(reports_dir, f"{model_id}.json")
+            with open(report_files[model_id], 'w') as f:
+                json.dump({"model_id": model_id, "f1_score": correct.mean(), "fpr": 0.1, "fnr": 0.1,
+                           "predictions_file": f"{model_id}.npz"}, f)
+
+        # Without a significant improvement the champion stays the best model
+        compare_models([report_files["champion"], report_files["slightly_better"]], 'balanced', self.output_path,
+                       significance_level=0.01, baseline_model_id="champion")
+        with open(self.output_path, 'r') as f:
+            result = json.load(f)
+        assert result['best_model_id'] == 'champion'
+        assert result['significance_test']['candidate_model_id'] == 'slightly_better'
+        assert not result['significance_test']['significant']
+
+        compare_models(reports_dir, 'balanced', self.output_path, significance_level=0.01, baseline_model_id="champion")
+        with open(self.output_path, 'r') as f:
+            result = json.load(f)
+        assert result['best_model_id'] == 'much_better'
+        assert result['significance_test']['p_value'] < 0.01
@@ -0,0 +1,159 @@
+import shutil
+import unittest
+import os
+import numpy as np
+import pandas as pd
+from src.components.common.data_loader import (
+    DatasetWriter,
+    dataset_file_name,
+    find_dataset_files,
+    iter_dataset_chunks,
+    read_dataset_files,
+    scan_dataset_dtypes,
+)
+
+class TestDataLoader(unittest.TestCase):
+
+    def setUp(self):
+        # Setup: Create a partitioned dataset with several part files
+        self.input_data_path = 'test_input_data'
+        os.makedirs(self.input_data_path, exist_ok=True)
+
+        self.sample_data = pd.DataFrame({
+            'feature1': range(100),
+            'feature2': [f'value_{i % 3}' for i in range(100)],
+            'label': [i % 2 for i in range(100)]
+        })
+        for part in range(5):
+            part_data = self.sample_data.iloc[part * 20:(part + 1) * 20]
+            part_data.to_csv(os.path.join(self.input_data_path, f'part-{part}.csv'), index=False)
+
+    def tearDown(self):
+        # Cleanup created directories and files
+        if os.path.exists(self.input_data_path):
+            shutil.rmtree(self.input_data_path)
+
+    def write_columnar_parts(self, data_format):
+        # Write the sample data as columnar part files, each one in several chunks
+        data_path = os.path.join(self.input_data_path, data_format)
+        os.makedirs(data_path)
+        for part in range(5):
+            part_file = os.path.join(data_path, dataset_file_name(f'part-{part}', data_format))
+            with DatasetWriter(part_file, data_format) as writer:
+                for start in range(part * 20, (part + 1) * 20, 8):
+                    writer.write(self.sample_data.iloc[start:min(start + 8, (part + 1) * 20)])
+            assert writer.rows == 20
+        return data_path
+
+    def test_find_dataset_files(self):
+        files, data_format = find_dataset_files(self.input_data_path)
+
+        assert files == [os.path.join(self.input_data_path, f'part-{part}.csv') for part in range(5)]
+        assert data_format == 'csv'
+
+    def test_find_dataset_files_mixed_formats(self):
+        self.sample_data.to_parquet(os.path.join(self.input_data_path, 'extra.parquet'))
+
+        with self.assertRaises(ValueError):
+            find_dataset_files(self.input_data_path)
+
+    def test_read_dataset_files_matches_serial_read(self):
+        files, data_format = find_dataset_files(self.input_data_path)
+        timings = {}
+
+        df = read_dataset_files(files, data_format, max_workers=3, timings=timings)
+
+        expected = pd.concat([pd.read_csv(file) for file in files], ignore_index=True)
+        pd.testing.assert_frame_equal(df, expected)
+        assert sorted(timings) == files
+
+    def test_read_dataset_files_with_processes(self):
+        files, data_format = find_dataset_files(self.input_data_path)
+
+        df = read_dataset_files(files, data_format, max_workers=2, use_processes=True)
+
+        pd.testing.assert_frame_equal(df, self.sample_data)
+
+    def test_read_dataset_files_with_dtype_and_usecols(self):
+        files, data_format = find_dataset_files(self.input_data_path)
+
+        df = read_dataset_files(files, data_format, dtype={'feature1': 'float32'}, usecols=['feature1', 'label'])
+
+        assert list(df.columns) == ['feature1', 'label']
+        assert df['feature1'].dtype == 'float32'
+        assert len(df) == 100
+
+    def test_read_dataset_files_no_files(self):
+        with self.assertRaises(ValueError):
+            read_dataset_files([])
+
+    def test_iter_dataset_chunks(self):
+        files, data_format = find_dataset_files(self.input_data_path)
+
+        chunks = list(iter_dataset_chunks(files, 7, data_format))
+
+        assert max(len(chunk) for chunk in chunks) == 7
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), self.sample_data)
+
+    def test_columnar_formats_round_trip(self):
+        for data_format in ['parquet', 'feather']:
+            with self.subTest(data_format=data_format):
+                data_path = self.write_columnar_parts(data_format)
+                files, detected_format = find_dataset_files(data_path)
+                assert detected_format == data_format
+
+                df = read_dataset_files(files, detected_format, max_workers=2)
+                pd.testing.assert_frame_equal(df, self.sample_data, check_dtype=False)
+
+                pruned = read_dataset_files(files, detected_format, usecols=['label'])
+                assert list(pruned.columns) == ['label']
+
+                chunks = list(iter_dataset_chunks(files, 6, detected_format))
+                assert max(len(chunk) for chunk in chunks) == 6
+                pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+
+    def test_dataset_writer_empty_dataset(self):
+        for data_format in ['csv', 'parquet', 'feather']:
+            with self.subTest(data_format=data_format):
+                empty_file = os.path.join(self.input_data_path, dataset_file_name('empty', data_format))
+                with DatasetWriter(empty_file, data_format) as writer:
+                    writer.write(self.sample_data.iloc[:0])
+
+                df = read_dataset_files([empty_file], data_format)
+                assert list(df.columns) == list(self.sample_data.columns)
+                assert len(df) == 0
+
+    def test_scan_dataset_dtypes_widens_the_chunk_types(self):
+        # The integers of the first rows are followed by floats and missing values
+        csv_file = os.path.join(self.input_data_path, 'mixed.csv')
+        with open(csv_file, 'w') as f:
+            f.write('x,flag,text\n1,True,a\n2,False,a\n3,True,a\n4,False,a\n1.5,,a\n,True,a\n')
+        self.assertEqual([chunk['x'].dtype.kind for chunk in iter_dataset_chunks([csv_file], 4)], ['i', 'f'])
+
+        dtypes = scan_dataset_dtypes([csv_file], 4)
+        self.assertEqual((dtypes['x'], dtypes['flag']), (np.float64, object))
+        self.assertEqual({chunk['x'].dtype for chunk in iter_dataset_chunks([csv_file], 4, dtype=dtypes)}, {np.dtype(np.float64)})
+
+        for data_format in ['parquet', 'feather']:
+            with self.subTest(data_format=data_format):
+                data_file = os.path.join(self.input_data_path, dataset_file_name('nulls', data_format))
+                table = pd.DataFrame({'x': pd.array([1, 2, None, 4], dtype='Int64'), 'y': [1, 2, 3, 4]})
+                table.to_parquet(data_file) if data_format == 'parquet' else table.to_feather(data_file)
+                dtypes = scan_dataset_dtypes([data_file], 2, data_format)
+                self.assertEqual((dtypes['x'], dtypes['y']), (np.float64, np.int64))
+
+    def test_dataset_writer_rejects_chunks_of_other_types(self):
+        for data_format in ['parquet', 'feather']:
+            with self.subTest(data_format=data_format):
+                data_file = os.path.join(self.input_data_path, dataset_file_name('mixed', data_format))
+                with DatasetWriter(data_file, data_format) as writer:
+                    writer.write(pd.DataFrame({'x': [1, 2]}))
+                    with self.assertRaises(ValueError):
+                        writer.write(pd.DataFrame({'x': [1.5, np.nan]}))
+
+    def test_dataset_writer_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            DatasetWriter(os.path.join(self.input_data_path, 'data.txt'), 'txt')
+
+if __name__ == '__main__':
+    unittest.main()
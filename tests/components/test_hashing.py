@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+from src.components.common.hashing import hash_files, hash_frame
+
+class TestHashing(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.files = []
+        for name, content in [("part-0.csv", b"a,b\n1,2\n"), ("part-1.csv", b"a,b\n3,4\n" * 1000)]:
+            self.files.append(os.path.join(self.test_dir, name))
+            with open(self.files[-1], "wb") as f:
+                f.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_fingerprint_is_independent_of_order_and_block_size(self):
+        fingerprint = hash_files(self.files)
+        assert hash_files(self.files[::-1], block_size=7) == fingerprint
+
+    def test_fingerprint_changes_with_names_and_contents(self):
+        fingerprint = hash_files(self.files)
+
+        renamed = os.path.join(self.test_dir, "part-2.csv")
+        os.rename(self.files[1], renamed)
+        assert hash_files([self.files[0], renamed]) != fingerprint
+        os.rename(renamed, self.files[1])
+        assert hash_files(self.files) == fingerprint
+
+        with open(self.files[0], "ab") as f:
+            f.write(b"5,6\n")
+        assert hash_files(self.files) != fingerprint
+
+    def test_frame_fingerprint_changes_with_rows_and_columns(self):
+        df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+        fingerprint = hash_frame(df)
+        assert hash_frame(df.set_index(pd.Index([7, 8, 9]))) == fingerprint
+        assert hash_frame(df.iloc[:2]) != fingerprint
+        assert hash_frame(df.rename(columns={"b": "c"})) != fingerprint
+        assert hash_frame(df.astype({"a": float})) != fingerprint
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import types
+import unittest
+from unittest import mock
+from src.components.common.lazy_import import LazyModule, lazy_import
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src")
+
+
+class TestLazyImport(unittest.TestCase):
+
+    def test_imports_the_module_on_first_attribute_access(self):
+        code = (
+            "import sys\n"
+            "from components.common.lazy_import import lazy_import\n"
+            "colorsys = lazy_import('colorsys')\n"
+            "assert 'colorsys' not in sys.modules\n"
+            "assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)\n"
+            "assert 'colorsys' in sys.modules\n"
+        )
+        subprocess.run([sys.executable, "-c", code], env={**os.environ, "PYTHONPATH": SRC_PATH}, check=True)
+
+    def test_sees_patched_attributes_of_the_module(self):
+        json_module = lazy_import("json")
+        self.assertIsInstance(json_module, (LazyModule, types.ModuleType))
+        with mock.patch("json.dumps", return_value="patched"):
+            self.assertEqual(json_module.dumps({}), "patched")
+        self.assertEqual(json_module.dumps({}), "{}")
+
+    def test_components_do_not_import_heavy_modules(self):
+        for module in [
+            "components.training.split_data",
+            "components.classification.model_evaluator",
+            "components.classification.model_selector",
+            "components.training.register_model",
+        ]:
+            with self.subTest(module=module):
+                code = f"import sys, {module}; print(','.join(name for name in ['mlflow', 'pandas', 'sklearn'] if name in sys.modules))"
+                completed = subprocess.run(
+                    [sys.executable, "-c", code], env={**os.environ, "PYTHONPATH": SRC_PATH},
+                    capture_output=True, text=True, check=True
+                )
+                self.assertEqual(completed.stdout.strip(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
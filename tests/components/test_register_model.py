@@ -2,9 +2,7 @@ import json
 import os
 import shutil
 import unittest
-from unittest.mock import MagicMock, patch
-
-import mlflow
+from unittest.mock import patch
 
 from src.components.training.register_model import register_trained_model
 
@@ -27,18 +25,20 @@ class TestRegisterTrainedModel(unittest.TestCase):
         # Create a dummy model file
         with open(os.path.join(self.model_path, 'model.pkl'), "w") as f:
             f.write("dummy model content")
+        with open(os.path.join(self.model_path, 'MLmodel'), "w") as f:
+            f.write("flavors: {}")
 
     def tearDown(self):
         shutil.rmtree(self.test_dir)
 
     @patch("mlflow.start_run")
-    @patch('mlflow.sklearn.autolog')
+    @patch("mlflow.register_model")
+    @patch("mlflow.log_artifacts")
     @patch("mlflow.sklearn.load_model")
     @patch("mlflow.sklearn.log_model")
-    def test_register_trained_model_success(self, mock_log_model, mock_load_model, mock_autolog, mock_start_run):
-        # Mock the return value of mlflow.sklearn.load_model
-        model = MagicMock()
-        mock_load_model.return_value = model
+    def test_register_trained_model_success(self, mock_log_model, mock_load_model, mock_log_artifacts, mock_register_model, mock_start_run):
+        mock_start_run.return_value.__enter__.return_value.info.run_id = "run_1"
+        mock_register_model.return_value.version = "3"
 
         # Call the function to register the trained model
         register_trained_model(
@@ -49,21 +49,38 @@ class TestRegisterTrainedModel(unittest.TestCase):
             self.register_report_path,
         )
 
-        # Assert that mlflow functions were called correctly
+        # The model directory is registered as it is, without loading or logging the model again
         mock_start_run.assert_called()
-        mock_autolog.assert_called()
-        mock_load_model.assert_called_once_with(self.model_path)
-        mock_log_model.assert_called_once_with(
-            sk_model=model,
-            registered_model_name=self.model_name,
-            artifact_path=self.model_name,
-            serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE,
-        )
+        mock_load_model.assert_not_called()
+        mock_log_model.assert_not_called()
+        mock_log_artifacts.assert_called_once_with(self.model_path, artifact_path=self.model_name)
+        mock_register_model.assert_called_once_with(f"runs:/run_1/{self.model_name}", self.model_name)
 
         with open(self.register_report_path, "r") as f:
             report_content = f.read()
+            self.assertIn("Registered model version: 3", report_content)
             self.assertIn("Model registration complete.", report_content)
 
+    @patch("mlflow.start_run")
+    def test_register_trained_model_rejects_a_folder_without_mlflow_model(self, mock_start_run):
+        os.remove(os.path.join(self.model_path, "MLmodel"))
+
+        telemetry_file = os.path.join(self.test_dir, "telemetry.jsonl")
+        with patch.dict(os.environ, {"TELEMETRY_FILE": telemetry_file}), self.assertRaises(ValueError):
+            register_trained_model(
+                self.comparison_report_path,
+                self.model_path,
+                self.model_name,
+                self.model_id,
+                self.register_report_path,
+            )
+        mock_start_run.assert_not_called()
+
+        # The telemetry is closed with its summary when the registration fails
+        with open(telemetry_file, "r") as f:
+            lines = [json.loads(line) for line in f]
+        self.assertIn("summary", lines[-1])
+
     @patch("mlflow.start_run")
     @patch('mlflow.sklearn.autolog')
     def test_register_trained_model_comparison_report_not_found(self, mock_autolog, mock_start_run):
@@ -79,9 +96,9 @@ class TestRegisterTrainedModel(unittest.TestCase):
             self.register_report_path,
         )
 
-        # Assert that mlflow functions were called correctly
-        mock_start_run.assert_called()
-        mock_autolog.assert_called()
+        # Assert that no mlflow work was done
+        mock_start_run.assert_not_called()
+        mock_autolog.assert_not_called()
         with open(self.register_report_path, "r") as f:
             report_content = f.read()
             self.assertIn("Comparison report not found.", report_content)
@@ -104,8 +121,8 @@ class TestRegisterTrainedModel(unittest.TestCase):
         )
 
         # Assertions
-        mock_start_run.assert_called()
-        mock_autolog.assert_called()
+        mock_start_run.assert_not_called()
+        mock_autolog.assert_not_called()
         with open(self.register_report_path, "r") as f:
             report_content = f.read()
             self.assertIn("Existing model is better than trained model.", report_content)
@@ -4,6 +4,7 @@ import os
 import pandas as pd
 from src.components.training.split_data import split_dataset
 from unittest.mock import patch
+from src.components.training import split_data
 
 class TestSplitDataset(unittest.TestCase):
 
@@ -104,7 +105,184 @@ class TestSplitDataset(unittest.TestCase):
         # Assert that the mlflow function is called atleast once
         mock_start_run.assert_called()
         mock_autolog.assert_called()
-        
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_streaming(self, mock_autolog, mock_start_run):
+        # Create a larger dataset spread across two files
+        large_data = pd.DataFrame({
+            'feature1': range(20000),
+            'feature2': [i % 7 for i in range(20000)],
+            'label': [i % 2 for i in range(20000)]
+        })
+        large_data.iloc[:12000].to_csv(os.path.join(self.input_data_path, 'part-0.csv'), index=False)
+        large_data.iloc[12000:].to_csv(os.path.join(self.input_data_path, 'part-1.csv'), index=False)
+        os.remove(os.path.join(self.input_data_path, 'sample.csv'))
+
+        # Run the split_dataset function in streaming mode
+        split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, split_ratio=0.7, chunk_size=1000, seed=7)
+
+        train_df = pd.read_csv(os.path.join(self.train_output_path, 'train_data.csv'))
+        test_df = pd.read_csv(os.path.join(self.test_output_path, 'test_data.csv'))
+
+        # Every row is written exactly once with the original schema
+        self.assertEqual(list(train_df.columns), list(large_data.columns))
+        self.assertEqual(len(train_df) + len(test_df), len(large_data))
+        self.assertEqual(sorted(pd.concat([train_df, test_df])['feature1']), list(range(20000)))
+
+        # The ratio stays within 3 standard deviations of the binomial split
+        self.assertAlmostEqual(len(train_df) / len(large_data), 0.7, delta=3 * (0.7 * 0.3 / 20000) ** 0.5)
+
+        # The split only depends on the seed, not on the chunk size
+        split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, split_ratio=0.7, chunk_size=333, seed=7)
+        pd.testing.assert_frame_equal(train_df, pd.read_csv(os.path.join(self.train_output_path, 'train_data.csv')))
+
+        # A different seed gives a different split
+        split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, split_ratio=0.7, chunk_size=1000, seed=8)
+        self.assertFalse(train_df.equals(pd.read_csv(os.path.join(self.train_output_path, 'train_data.csv'))))
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_columnar_output(self, mock_autolog, mock_start_run):
+        for output_format in ['parquet', 'feather']:
+            for chunk_size in [None, 2]:
+                with self.subTest(output_format=output_format, chunk_size=chunk_size):
+                    split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, split_ratio=0.7, chunk_size=chunk_size, output_format=output_format)
+
+                    train_file = os.path.join(self.train_output_path, f'train_data.{output_format}')
+                    test_file = os.path.join(self.test_output_path, f'test_data.{output_format}')
+                    read_file = pd.read_parquet if output_format == 'parquet' else pd.read_feather
+                    train_df = read_file(train_file)
+                    test_df = read_file(test_file)
+
+                    # The columns and their types survive the round trip
+                    self.assertEqual(list(train_df.columns), list(self.sample_data.columns))
+                    self.assertEqual(len(train_df) + len(test_df), len(self.sample_data))
+                    self.assertEqual(train_df['feature1'].dtype, self.sample_data['feature1'].dtype)
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_columnar_output_with_int_then_float_chunks(self, mock_autolog, mock_start_run):
+        # The first chunks only hold integers, a later one floats and missing values
+        with open(os.path.join(self.input_data_path, 'sample.csv'), 'w') as f:
+            f.write('feature1,label\n' + ''.join(f'{i},{i % 2}\n' for i in range(20)) + '0.5,0\n,1\n')
+        mixed_data = pd.read_csv(os.path.join(self.input_data_path, 'sample.csv'))
+
+        for output_format in ['parquet', 'feather']:
+            with self.subTest(output_format=output_format):
+                split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, split_ratio=0.7, chunk_size=5, output_format=output_format)
+
+                read_file = pd.read_parquet if output_format == 'parquet' else pd.read_feather
+                train_df = read_file(os.path.join(self.train_output_path, f'train_data.{output_format}'))
+                test_df = read_file(os.path.join(self.test_output_path, f'test_data.{output_format}'))
+                split_df = pd.concat([train_df, test_df]).sort_values('feature1', na_position='last', ignore_index=True)
+                expected = mixed_data.sort_values('feature1', na_position='last', ignore_index=True)
+                pd.testing.assert_frame_equal(split_df, expected)
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_stratified_and_group(self, mock_autolog, mock_start_run):
+        imbalanced_data = pd.DataFrame({
+            'feature1': range(1000),
+            'customer': [i % 40 for i in range(1000)],
+            'label': [1 if i % 50 == 0 else 0 for i in range(1000)]
+        })
+        imbalanced_data.to_csv(os.path.join(self.input_data_path, 'sample.csv'), index=False)
+        train_file = os.path.join(self.train_output_path, 'train_data.csv')
+        test_file = os.path.join(self.test_output_path, 'test_data.csv')
+
+        for chunk_size in [None, 64]:
+            with self.subTest(strategy='stratified', chunk_size=chunk_size):
+                split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, split_ratio=0.7, chunk_size=chunk_size, strategy='stratified', split_column='label')
+
+                # The 20 positives are split 14/6 like the rest of the data
+                self.assertEqual(pd.read_csv(test_file)['label'].sum(), 6)
+                self.assertEqual(pd.read_csv(train_file)['label'].sum(), 14)
+
+            with self.subTest(strategy='group', chunk_size=chunk_size):
+                split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, split_ratio=0.7, chunk_size=chunk_size, strategy='group', split_column='customer')
+
+                train_customers = set(pd.read_csv(train_file)['customer'])
+                test_customers = set(pd.read_csv(test_file)['customer'])
+                self.assertEqual(train_customers & test_customers, set())
+                self.assertEqual(len(train_customers | test_customers), 40)
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_temporal(self, mock_autolog, mock_start_run):
+        events = pd.DataFrame({
+            'feature1': range(10),
+            'event_date': [f'2024-01-{day:02d}' for day in range(1, 11)],
+            'label': [0, 1] * 5
+        })
+        events.to_csv(os.path.join(self.input_data_path, 'sample.csv'), index=False)
+
+        for chunk_size in [None, 3]:
+            with self.subTest(chunk_size=chunk_size):
+                split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, chunk_size=chunk_size, strategy='temporal', split_column='event_date', cutoff='2024-01-08')
+
+                train_df = pd.read_csv(os.path.join(self.train_output_path, 'train_data.csv'))
+                test_df = pd.read_csv(os.path.join(self.test_output_path, 'test_data.csv'))
+                self.assertEqual(list(train_df['feature1']), list(range(7)))
+                self.assertEqual(list(test_df['feature1']), [7, 8, 9])
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_folds(self, mock_autolog, mock_start_run):
+        large_data = pd.DataFrame({
+            'feature1': range(500),
+            'label': [1 if i % 10 == 0 else 0 for i in range(500)]
+        })
+        large_data.to_csv(os.path.join(self.input_data_path, 'sample.csv'), index=False)
+        folds_path = os.path.join(self.test_dir, 'folds')
+
+        for chunk_size in [None, 64]:
+            with self.subTest(chunk_size=chunk_size), \
+                    patch.object(split_data, 'iter_dataset_chunks', wraps=split_data.iter_dataset_chunks) as chunk_reader, \
+                    patch.object(split_data, 'read_dataset_files', wraps=split_data.read_dataset_files) as full_reader:
+                split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, chunk_size=chunk_size, strategy='stratified', split_column='label', folds_path=folds_path, n_folds=5)
+
+                # The input is read once for the train/test split and the folds
+                self.assertEqual(chunk_reader.call_count + full_reader.call_count, 1)
+
+                test_ids = []
+                for fold in range(5):
+                    fold_train = pd.read_csv(os.path.join(folds_path, f'fold_{fold}', 'train', 'train_data.csv'))
+                    fold_test = pd.read_csv(os.path.join(folds_path, f'fold_{fold}', 'test', 'test_data.csv'))
+
+                    # Every fold is a partition of the data with its share of positives
+                    self.assertEqual(len(fold_train) + len(fold_test), 500)
+                    self.assertEqual(set(fold_train['feature1']) & set(fold_test['feature1']), set())
+                    self.assertEqual(fold_test['label'].sum(), 10)
+                    test_ids.extend(fold_test['feature1'])
+
+                # Every row is in exactly one test fold
+                self.assertEqual(sorted(test_ids), list(range(500)))
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_invalid_folds(self, mock_autolog, mock_start_run):
+        folds_path = os.path.join(self.test_dir, 'folds')
+        with self.assertRaises(ValueError):
+            split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, folds_path=folds_path, n_folds=1)
+        with self.assertRaises(ValueError):
+            split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, strategy='temporal', split_column='feature1', cutoff='3', folds_path=folds_path, n_folds=3)
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_strategy_without_column(self, mock_autolog, mock_start_run):
+        with self.assertRaises(ValueError):
+            split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, strategy='stratified')
+
+    @patch('mlflow.start_run')
+    @patch('mlflow.sklearn.autolog')
+    def test_split_dataset_streaming_no_data(self, mock_autolog, mock_start_run):
+        # Remove sample data to simulate no data scenario
+        os.remove(os.path.join(self.input_data_path, 'sample.csv'))
+
+        with self.assertRaises(ValueError):
+            split_dataset(self.input_data_path, self.train_output_path, self.test_output_path, split_ratio=0.7, chunk_size=10)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import numpy as np
+import pandas as pd
+from src.components.training.split_strategies import make_assigner
+
+class TestSplitStrategies(unittest.TestCase):
+
+    def setUp(self):
+        # Imbalanced labels with 1% positives and 500 entities spread over the rows
+        self.df = pd.DataFrame({
+            'feature1': range(20000),
+            'entity': [f'entity_{i % 500}' for i in range(20000)],
+            'label': [1 if i % 100 == 0 else 0 for i in range(20000)]
+        })
+
+    def assign_in_chunks(self, assigner, chunk_size):
+        return np.concatenate([
+            assigner.assign(self.df.iloc[start:start + chunk_size])
+            for start in range(0, len(self.df), chunk_size)
+        ])
+
+    def test_random_assigner_independent_of_chunking(self):
+        whole = make_assigner('random', [0.7, 0.3], 11).assign(self.df)
+        chunked = self.assign_in_chunks(make_assigner('random', [0.7, 0.3], 11), 777)
+
+        np.testing.assert_array_equal(whole, chunked)
+        self.assertAlmostEqual((whole == 0).mean(), 0.7, delta=0.02)
+
+    def test_stratified_assigner_keeps_ratio_per_stratum(self):
+        for chunk_size in [len(self.df), 333]:
+            with self.subTest(chunk_size=chunk_size):
+                buckets = self.assign_in_chunks(make_assigner('stratified', [0.7, 0.3], 5, 'label'), chunk_size)
+
+                counts = pd.crosstab(self.df['label'], buckets)
+                # Every stratum is within one row of its expected test share
+                assert abs(counts.loc[1, 1] - 0.3 * 200) <= 1
+                assert abs(counts.loc[0, 1] - 0.3 * 19800) <= 1
+
+    def test_stratified_assigner_is_reproducible(self):
+        first = self.assign_in_chunks(make_assigner('stratified', [0.7, 0.3], 5, 'label'), 1000)
+        second = self.assign_in_chunks(make_assigner('stratified', [0.7, 0.3], 5, 'label'), 1000)
+        other_seed = self.assign_in_chunks(make_assigner('stratified', [0.7, 0.3], 6, 'label'), 1000)
+
+        np.testing.assert_array_equal(first, second)
+        assert not np.array_equal(first, other_seed)
+
+    def test_stratified_assigner_equal_folds(self):
+        buckets = make_assigner('stratified', [0.2] * 5, 5, 'label').assign(self.df)
+
+        counts = pd.crosstab(self.df['label'], buckets)
+        assert (counts.loc[1] == 40).all()
+        assert (counts.loc[0] == 3960).all()
+
+    def test_stratified_assigner_unequal_weights(self):
+        with self.assertRaises(ValueError):
+            make_assigner('stratified', [0.5, 0.3, 0.2], 5, 'label')
+
+    def test_group_assigner_has_no_leakage(self):
+        buckets = self.assign_in_chunks(make_assigner('group', [0.7, 0.3], 3, 'entity'), 999)
+
+        buckets_per_entity = pd.Series(buckets).groupby(self.df['entity']).nunique()
+        assert (buckets_per_entity == 1).all()
+        self.assertAlmostEqual((buckets == 0).mean(), 0.7, delta=0.1)
+
+    def test_group_assigner_depends_on_seed(self):
+        first = make_assigner('group', [0.7, 0.3], 3, 'feature1').assign(self.df)
+        second = make_assigner('group', [0.7, 0.3], 4, 'feature1').assign(self.df)
+
+        assert not np.array_equal(first, second)
+
+    def test_temporal_assigner(self):
+        events = pd.DataFrame({
+            'event_time': ['2024-01-30', '2024-02-01', None, '2023-12-31'],
+            'event_day': [30, 32, None, -1],
+        })
+
+        by_date = make_assigner('temporal', [0.7, 0.3], 3, 'event_time', cutoff='2024-02-01').assign(events)
+        by_number = make_assigner('temporal', [0.7, 0.3], 3, 'event_day', cutoff='31').assign(events)
+
+        np.testing.assert_array_equal(by_date, [0, 1, 1, 0])
+        np.testing.assert_array_equal(by_number, [0, 1, 1, 0])
+
+    def test_temporal_assigner_needs_cutoff(self):
+        with self.assertRaises(ValueError):
+            make_assigner('temporal', [0.7, 0.3], 3, 'event_time')
+
+    def test_make_assigner_needs_column(self):
+        with self.assertRaises(ValueError):
+            make_assigner('group', [0.7, 0.3], 3)
+        with self.assertRaises(ValueError):
+            make_assigner('unknown', [0.7, 0.3], 3, 'label')
+
+if __name__ == '__main__':
+    unittest.main()
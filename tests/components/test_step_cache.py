@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from src.components.common.step_cache import StepCache
+
+class TestStepCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.input_file = os.path.join(self.test_dir, "input.csv")
+        with open(self.input_file, "w") as f:
+            f.write("a,b\n1,2\n")
+        self.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def step(self, input_path, output_folder, output_file, factor=1, max_workers=None, optional_output=None):
+        # Writes a folder and a file output derived from the input
+        self.calls.append(factor)
+        with open(input_path, "r") as f:
+            content = f.read() * factor
+        os.makedirs(os.path.join(output_folder, "part"), exist_ok=True)
+        with open(os.path.join(output_folder, "part", "data.csv"), "w") as f:
+            f.write(content)
+        with open(output_file, "w") as f:
+            f.write(str(len(content)))
+
+    def run_step(self, cache, run_name, **kwargs):
+        outputs = {
+            "output_folder": os.path.join(self.test_dir, run_name, "folder"),
+            "output_file": os.path.join(self.test_dir, run_name, "result.txt"),
+        }
+        hit = cache.run("step", self.step, {"input_path": self.input_file, **outputs, **kwargs},
+                        input_args=["input_path"], output_args=["output_folder", "output_file", "optional_output"],
+                        ignored_args=["max_workers"])
+        with open(os.path.join(outputs["output_folder"], "part", "data.csv"), "r") as f:
+            data = f.read()
+        with open(outputs["output_file"], "r") as f:
+            return hit, data, f.read()
+
+    def test_hits_restore_the_outputs(self):
+        cache = StepCache(os.path.join(self.test_dir, "cache"))
+        first = self.run_step(cache, "first")
+        second = self.run_step(cache, "second", max_workers=8)
+
+        assert first[0] is False and second[0] is True
+        assert first[1:] == second[1:]
+        assert self.calls == [1]
+
+    def test_changed_inputs_or_arguments_miss(self):
+        cache = StepCache(os.path.join(self.test_dir, "cache"))
+        self.run_step(cache, "first")
+        assert self.run_step(cache, "factor", factor=2)[0] is False
+
+        with open(self.input_file, "a") as f:
+            f.write("3,4\n")
+        hit, data, _ = self.run_step(cache, "modified")
+        assert hit is False
+        assert data == "a,b\n1,2\n3,4\n"
+        assert self.calls == [1, 2, 1]
+
+    def test_least_recently_used_entries_are_evicted(self):
+        # The entries store 9, 18 and 26 bytes of outputs for the factors 1, 2 and 3
+        cache = StepCache(os.path.join(self.test_dir, "cache"), max_bytes=50)
+        self.run_step(cache, "first", factor=1)
+        self.run_step(cache, "second", factor=2)
+        self.run_step(cache, "first_again", factor=1)
+        self.run_step(cache, "third", factor=3)
+
+        # The second entry was used least recently and is evicted
+        assert self.run_step(cache, "first_hit", factor=1)[0] is True
+        assert self.run_step(cache, "second_miss", factor=2)[0] is False
+        assert self.calls == [1, 2, 3, 2]
+
+    def test_outputs_over_the_budget_are_not_cached(self):
+        cache = StepCache(os.path.join(self.test_dir, "cache"), max_bytes=5)
+        with mock.patch("builtins.print") as mock_print:
+            assert self.run_step(cache, "first")[0] is False
+        messages = [call.args[0] for call in mock_print.call_args_list]
+        assert any(message.startswith("Not caching step") for message in messages)
+        assert not any(message.startswith("Cached the outputs") for message in messages)
+
+        assert self.run_step(cache, "second")[0] is False
+        assert self.calls == [1, 1]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import threading
+import unittest
+from unittest import mock
+from src.components.common.telemetry import Telemetry
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = "test_output"
+        os.makedirs(self.test_dir, exist_ok=True)
+        self.telemetry_file = os.path.join(self.test_dir, "telemetry.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def read_lines(self):
+        with open(self.telemetry_file, "r") as f:
+            return [json.loads(line) for line in f]
+
+    def test_writes_spans_events_and_summary_as_json_lines(self):
+        with Telemetry("split_data", self.telemetry_file) as telemetry:
+            with telemetry.span("load"):
+                pass
+            with telemetry.span("load"):
+                pass
+            telemetry.count("rows", 10)
+            telemetry.count("rows", 5)
+            telemetry.event("Loaded files", files=2)
+
+        lines = self.read_lines()
+        self.assertEqual([line.get("span") for line in lines[:2]], ["load", "load"])
+        self.assertTrue(all(line["step"] == "split_data" for line in lines))
+        self.assertEqual(lines[2]["event"], "Loaded files")
+        self.assertEqual(lines[2]["files"], 2)
+
+        summary = lines[3]["summary"]
+        self.assertEqual(summary["rows"], 15)
+        self.assertAlmostEqual(summary["load_seconds"], lines[0]["seconds"] + lines[1]["seconds"])
+        self.assertGreater(summary["peak_rss_mb"], 0)
+
+    def test_counts_from_threads(self):
+        telemetry = Telemetry("model_selector", self.telemetry_file)
+
+        def count():
+            for _ in range(1000):
+                telemetry.count("reports")
+
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        telemetry.close()
+
+        self.assertEqual(self.read_lines()[-1]["summary"]["reports"], 8000)
+
+    @mock.patch("src.components.common.telemetry.mlflow")
+    def test_logs_the_summary_to_mlflow_in_one_call(self, mock_mlflow):
+        with Telemetry("model_evaluator", log_to_mlflow=True) as telemetry:
+            with telemetry.span("predict"):
+                pass
+            telemetry.count("rows", 100)
+
+        mock_mlflow.log_metrics.assert_called_once()
+        metrics = mock_mlflow.log_metrics.call_args.args[0]
+        self.assertEqual(metrics["telemetry.rows"], 100)
+        self.assertIn("telemetry.predict_seconds", metrics)
+
+    @mock.patch("src.components.common.telemetry.mlflow")
+    def test_logs_the_summary_to_a_given_run_without_the_active_run(self, mock_mlflow):
+        with Telemetry("model_evaluator", log_to_mlflow=True, run_id="run-1") as telemetry:
+            telemetry.count("rows", 100)
+
+        mock_mlflow.active_run.assert_not_called()
+        mock_mlflow.log_metrics.assert_not_called()
+        log_batch = mock_mlflow.MlflowClient.return_value.log_batch
+        log_batch.assert_called_once()
+        self.assertEqual(log_batch.call_args.args[0], "run-1")
+        self.assertIn("telemetry.rows", [call.args[0] for call in mock_mlflow.entities.Metric.call_args_list])
+
+    @mock.patch("src.components.common.telemetry.mlflow")
+    def test_does_nothing_when_disabled(self, mock_mlflow):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            telemetry = Telemetry.from_env("register_model")
+        self.assertFalse(telemetry.enabled)
+
+        with telemetry.span("write"):
+            pass
+        telemetry.count("rows", 1)
+        telemetry.event("Model registration aborted.")
+        telemetry.close()
+
+        self.assertEqual(telemetry.span_seconds, {})
+        self.assertEqual(telemetry.counters, {})
+        mock_mlflow.log_metrics.assert_not_called()
+        self.assertFalse(os.path.exists(self.telemetry_file))
+
+    def test_reads_the_configuration_from_the_environment(self):
+        with mock.patch.dict(os.environ, {"TELEMETRY_FILE": self.telemetry_file}):
+            with Telemetry.from_env("split_data") as telemetry:
+                with telemetry.span("split"):
+                    pass
+
+        self.assertEqual(self.read_lines()[0]["span"], "split")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,402 @@
+import io
+import json
+import os
+import shutil
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+import numpy as np
+import pandas as pd
+import mlflow.sklearn
+import pyarrow as pa
+from sklearn.linear_model import LogisticRegression
+from src.scoring import score
+from src.scoring.score import MicroBatcher, PredictionCache
+
+
+class TestScore(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = os.path.abspath("test_output")
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame(rng.normal(size=(200, 3)), columns=["feature1", "feature2", "feature3"])
+        outcome = (self.df["feature1"] - self.df["feature3"] > 0).astype(int)
+        self.model = LogisticRegression().fit(self.df, outcome)
+
+        # Azure ML mounts the registered model folder inside the model directory
+        self.model_dir = os.path.join(self.test_dir, "azureml-models", "model", "1")
+        mlflow.sklearn.save_model(self.model, os.path.join(self.model_dir, "model"))
+        self.expected = self.model.predict(self.df).tolist()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        score.scorer = None
+        score.prediction_cache = None
+        if score.request_telemetry is not None:
+            score.request_telemetry.close()
+            score.request_telemetry = None
+
+    def init(self):
+        with mock.patch.dict(os.environ, {"AZUREML_MODEL_DIR": self.model_dir}):
+            score.init()
+
+    def test_scores_the_request_formats(self):
+        self.init()
+        rows = self.df.to_numpy().tolist()
+        shuffled = ["feature3", "feature1", "feature2"]
+        requests = {
+            "rows": rows,
+            "data": {"data": rows},
+            "input_data": {"input_data": {"columns": list(self.df.columns), "data": rows}},
+            "reordered columns": {"input_data": {"columns": shuffled, "data": self.df[shuffled].to_numpy().tolist()}},
+        }
+        for name, request in requests.items():
+            with self.subTest(request=name):
+                self.assertEqual(json.loads(score.run(json.dumps(request))), self.expected)
+
+        self.assertEqual(json.loads(score.run(json.dumps(rows[0]))), self.expected[:1])
+
+    def test_reuses_the_feature_array_of_the_thread(self):
+        self.init()
+        first = score.scorer.features([[0.0, 1.0, 2.0]] * 3)
+        second = score.scorer.features([[3.0, 4.0, 5.0]] * 10)
+        self.assertTrue(np.shares_memory(first, second))
+
+        grown = score.scorer.features([[0.0, 1.0, 2.0]] * (score.INITIAL_BUFFER_ROWS + 1))
+        self.assertEqual(grown.shape, (score.INITIAL_BUFFER_ROWS + 1, 3))
+
+    def test_rejects_requests_missing_features(self):
+        self.init()
+        with self.assertRaises(ValueError):
+            score.run(json.dumps({"input_data": {"columns": ["feature1", "feature2"], "data": [[0.0, 1.0]]}}))
+
+    def test_scores_without_orjson(self):
+        self.init()
+        with mock.patch.object(score, "orjson", None):
+            self.assertEqual(json.loads(score.run(json.dumps(self.df.to_numpy().tolist()))), self.expected)
+
+    def npy(self, values):
+        stream = io.BytesIO()
+        np.save(stream, values)
+        return stream.getvalue()
+
+    def arrow(self, df):
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    def test_decodes_npy_requests_without_copying(self):
+        self.init()
+        body = self.npy(self.df.to_numpy())
+        features = score.scorer.decode(body, score.NPY_CONTENT_TYPE)
+        self.assertTrue(np.shares_memory(features, np.frombuffer(body, dtype=np.uint8)))
+
+        for name, values in {"float64": self.df.to_numpy(), "float32": self.df.to_numpy(np.float32), "fortran": np.asfortranarray(self.df.to_numpy())}.items():
+            with self.subTest(values=name):
+                predictions = score.scorer.score(self.npy(values), score.NPY_CONTENT_TYPE)
+                self.assertEqual(predictions.tolist(), self.model.predict(values.astype(np.float64)).tolist())
+
+    def test_rejects_invalid_npy_requests(self):
+        self.init()
+        requests = {
+            "not npy": b"[[0.0, 1.0, 2.0]]",
+            "truncated": self.npy(self.df.to_numpy())[:-8],
+            "objects": self.npy(np.array([["a", 1, 2.0]], dtype=object)),
+            "missing features": self.npy(self.df.to_numpy()[:, :2]),
+        }
+        for name, body in requests.items():
+            with self.subTest(request=name), self.assertRaises(ValueError):
+                score.scorer.score(body, score.NPY_CONTENT_TYPE)
+
+    def test_scores_arrow_requests_by_column_name(self):
+        self.init()
+        shuffled = self.df[["feature3", "feature1", "feature2"]]
+        predictions = score.scorer.score(self.arrow(shuffled), score.ARROW_CONTENT_TYPE)
+        self.assertEqual(predictions.tolist(), self.expected)
+
+        with self.assertRaises(ValueError):
+            score.scorer.score(self.arrow(self.df[["feature1", "feature2"]]), score.ARROW_CONTENT_TYPE)
+        with self.assertRaises(ValueError):
+            score.scorer.score(b"not arrow", score.ARROW_CONTENT_TYPE)
+
+    def test_responds_in_the_accepted_or_request_content_type(self):
+        self.init()
+        body = self.npy(self.df.to_numpy())
+        cases = {
+            (score.NPY_CONTENT_TYPE, None): score.NPY_CONTENT_TYPE,
+            (score.NPY_CONTENT_TYPE, "*/*"): score.NPY_CONTENT_TYPE,
+            (score.NPY_CONTENT_TYPE, "application/json"): score.JSON_CONTENT_TYPE,
+            (score.NPY_CONTENT_TYPE, "text/html, application/vnd.apache.arrow.stream;q=0.9"): score.ARROW_CONTENT_TYPE,
+        }
+        for (content_type, accept), expected_type in cases.items():
+            with self.subTest(accept=accept):
+                response, response_type = score.score_request(body, content_type, accept)
+                self.assertEqual(response_type, expected_type)
+                if response_type == score.NPY_CONTENT_TYPE:
+                    predictions = np.load(io.BytesIO(response)).tolist()
+                elif response_type == score.ARROW_CONTENT_TYPE:
+                    predictions = pa.ipc.open_stream(response).read_all().column("prediction").to_pylist()
+                else:
+                    predictions = json.loads(response)
+                self.assertEqual(predictions, self.expected)
+
+        response, response_type = score.score_request(json.dumps(self.df.to_numpy().tolist()).encode("utf-8"), "application/json; charset=utf-8")
+        self.assertEqual((json.loads(response), response_type), (self.expected, score.JSON_CONTENT_TYPE))
+
+    def test_run_answers_raw_http_requests(self):
+        self.init()
+        request = mock.Mock()
+        request.get_data.return_value = self.npy(self.df.to_numpy())
+        request.headers = {"Content-Type": score.NPY_CONTENT_TYPE, "Accept": score.JSON_CONTENT_TYPE}
+        with mock.patch.object(score, "AMLResponse") as response:
+            score.run(request)
+        body, status, headers = response.call_args.args
+        self.assertEqual((json.loads(body), status, headers), (self.expected, 200, {"Content-Type": score.JSON_CONTENT_TYPE}))
+
+        with mock.patch.object(score, "AMLResponse") as response, mock.patch.object(score.scorer.model, "predict", side_effect=TypeError("bad input")):
+            score.run(request)
+        self.assertEqual(response.call_args.args, ("TypeError: bad input", 500))
+
+    def test_writes_every_request_to_the_telemetry_file(self):
+        telemetry_file = os.path.join(self.test_dir, "telemetry", "telemetry.jsonl")
+        with mock.patch.dict(os.environ, {score.TELEMETRY_FILE_ENV: telemetry_file}):
+            self.init()
+        score.run(json.dumps(self.df.to_numpy().tolist()))
+        with self.assertRaises(ValueError):
+            score.run('{"data": 1}')
+        score.request_telemetry.close()
+
+        with open(telemetry_file) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line["step"] for line in lines], ["score"] * 3)
+        self.assertEqual([line.get("rows") for line in lines[:2]], [200, 0])
+        self.assertIn("error", lines[1])
+        self.assertEqual(lines[2]["summary"]["requests"], 2)
+        self.assertEqual(lines[2]["summary"]["errors"], 1)
+
+    def test_predicts_only_the_rows_missing_from_the_cache(self):
+        with mock.patch.dict(os.environ, {score.CACHE_ENTRIES_ENV: "1000"}):
+            self.init()
+        rows = self.df.to_numpy().tolist()
+        self.assertEqual(json.loads(score.run(json.dumps(rows[:100]))), self.expected[:100])
+
+        with mock.patch.object(score.scorer.model, "predict", wraps=score.scorer.model.predict) as predict:
+            # The same rows with other columns order hit the cache
+            shuffled = ["feature3", "feature1", "feature2"]
+            request = {"input_data": {"columns": shuffled, "data": self.df[shuffled].to_numpy()[:100].tolist()}}
+            self.assertEqual(json.loads(score.run(json.dumps(request))), self.expected[:100])
+            predict.assert_not_called()
+
+            self.assertEqual(json.loads(score.run(json.dumps(rows))), self.expected)
+            self.assertEqual(len(predict.call_args.args[0]), 100)
+
+        stats = score.prediction_cache.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (200, 200, 200))
+
+    def test_new_model_version_invalidates_the_cache(self):
+        with mock.patch.dict(os.environ, {score.CACHE_ENTRIES_ENV: "1000"}):
+            self.init()
+            score.run(json.dumps(self.df.to_numpy().tolist()))
+            cache = score.prediction_cache
+
+            # Deploying the same model version keeps the cache
+            self.init()
+            self.assertIs(score.prediction_cache, cache)
+            self.assertEqual(cache.stats()["entries"], 200)
+
+            shutil.rmtree(os.path.join(self.model_dir, "model"))
+            mlflow.sklearn.save_model(self.model, os.path.join(self.model_dir, "model"))
+            self.init()
+            self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_serves_the_model_over_http(self):
+        for max_batch_rows in [0, 32]:
+            with self.subTest(max_batch_rows=max_batch_rows):
+                self.serve_and_check(max_batch_rows)
+
+    def test_serve_leaves_the_environment_untouched(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            server = score.serve(self.model_dir, port=0, max_batch_rows=0, cache_entries=10, cache_ttl_seconds=60)
+            try:
+                self.assertEqual(dict(os.environ), {})
+                self.assertEqual((score.prediction_cache.max_entries, score.prediction_cache.ttl_seconds), (10, 60))
+                self.assertIsNone(score.scorer.batcher)
+            finally:
+                server.server_close()
+                score.prediction_cache = None
+
+    def test_answers_unexpected_errors_with_a_server_error(self):
+        server = score.serve(self.model_dir, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/score"
+            body = json.dumps({"data": self.df.to_numpy().tolist()}).encode("utf-8")
+            with mock.patch.object(score.scorer.model, "predict", side_effect=MemoryError("no memory left")):
+                with self.assertRaises(urllib.error.HTTPError) as context:
+                    urllib.request.urlopen(urllib.request.Request(url, data=body))
+            self.assertEqual(context.exception.code, 500)
+            self.assertEqual(context.exception.read(), b"MemoryError: no memory left")
+            self.assertEqual(score.request_telemetry.stats()["server_errors"], 1)
+
+            # The server keeps scoring the next requests
+            with urllib.request.urlopen(urllib.request.Request(url, data=body)) as response:
+                self.assertEqual(json.loads(response.read()), self.expected)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def serve_and_check(self, max_batch_rows):
+        server = score.serve(self.model_dir, port=0, max_batch_rows=max_batch_rows)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/score"
+            body = json.dumps({"data": self.df.to_numpy().tolist()}).encode("utf-8")
+            with urllib.request.urlopen(urllib.request.Request(url, data=body)) as response:
+                self.assertEqual(json.loads(response.read()), self.expected)
+
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(urllib.request.Request(url, data=b'{"data": 1}'))
+            self.assertEqual(context.exception.code, 400)
+
+            request = urllib.request.Request(url, data=self.npy(self.df.to_numpy()), headers={"Content-Type": score.NPY_CONTENT_TYPE})
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(response.headers["Content-Type"], score.NPY_CONTENT_TYPE)
+                self.assertEqual(np.load(io.BytesIO(response.read())).tolist(), self.expected)
+
+            with urllib.request.urlopen(url.replace("/score", "/stats")) as response:
+                stats = json.loads(response.read())
+            self.assertIsNone(stats["cache"])
+            self.assertEqual((stats["requests"]["requests"], stats["requests"]["errors"], stats["requests"]["rows"]), (3, 1, 400))
+            self.assertEqual("batcher" in stats, max_batch_rows > 0)
+        finally:
+            server.shutdown()
+            server.server_close()
+            if score.scorer.batcher is not None:
+                score.scorer.batcher.close()
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_batches_concurrent_requests_and_fans_out_the_predictions(self):
+        calls = []
+
+        def predict(features):
+            calls.append(len(features))
+            time.sleep(0.01)
+            return features[:, 0] * 10
+
+        batcher = MicroBatcher(predict, max_batch_rows=64, max_latency_ms=50)
+        # Requests arriving close together make the batcher wait for more
+        batcher.mean_gap = 0.001
+        results = [None] * 16
+
+        def submit(index):
+            results[index] = batcher.submit(np.full((2, 3), index, dtype=float))
+
+        threads = [threading.Thread(target=submit, args=(index,)) for index in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        for index, predictions in enumerate(results):
+            np.testing.assert_array_equal(predictions, [index * 10, index * 10])
+        self.assertEqual(sum(calls), 32)
+        self.assertLess(len(calls), 16)
+        self.assertEqual(batcher.requests, 16)
+
+    def test_does_not_wait_when_requests_are_sparse(self):
+        # Requests 50 ms apart are not worth holding for a 20 ms budget
+        batcher = MicroBatcher(lambda features: features[:, 0], max_batch_rows=64, max_latency_ms=20)
+        latencies = []
+        for _ in range(5):
+            start = time.perf_counter()
+            batcher.submit(np.zeros((1, 2)))
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.05)
+        batcher.close()
+
+        self.assertGreaterEqual(batcher.mean_gap, batcher.max_latency)
+        self.assertLess(max(latencies), batcher.max_latency)
+
+    def test_only_the_faulty_request_gets_the_error(self):
+        def predict(features):
+            if features.shape[1] != 2:
+                raise ValueError("Expected 2 features")
+            return features[:, 0]
+
+        batcher = MicroBatcher(predict, max_batch_rows=64, max_latency_ms=50)
+        batcher.mean_gap = 0.001
+        errors, results = [], []
+
+        def submit(features):
+            try:
+                results.append(batcher.submit(features))
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=submit, args=(np.zeros((1, width)),)) for width in [2, 3, 2]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(len(results), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestPredictionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = np.arange(12, dtype=np.float64).reshape(4, 3)
+
+    def test_keys_are_canonical_and_depend_on_the_model_version(self):
+        cache = PredictionCache(version="1")
+        keys = cache.keys(self.rows)
+        self.assertEqual(len(set(keys)), 4)
+        self.assertEqual(cache.keys(self.rows.astype(np.int64)), keys)
+        self.assertEqual(cache.keys(np.array([[-0.0, 1.0, 2.0]])), keys[:1])
+        self.assertNotEqual(PredictionCache(version="2").keys(self.rows), keys)
+
+    def test_evicts_the_least_recently_used_rows(self):
+        cache = PredictionCache(max_entries=3)
+        keys = cache.keys(self.rows)
+        cache.put(keys[:3], [0, 1, 2])
+        self.assertEqual(cache.get(keys[:1]), [0])
+        cache.put(keys[3:], [3])
+
+        self.assertEqual(cache.get(keys), [0, None, 2, 3])
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_expires_the_rows_after_the_ttl(self):
+        cache = PredictionCache(ttl_seconds=10)
+        keys = cache.keys(self.rows)
+        with mock.patch.object(time, "monotonic", return_value=100.0):
+            cache.put(keys, [0, 1, 2, 3])
+        with mock.patch.object(time, "monotonic", return_value=105.0):
+            self.assertEqual(cache.get(keys[:1]), [0])
+        with mock.patch.object(time, "monotonic", return_value=111.0):
+            self.assertEqual(cache.get(keys[:1]), [None])
+
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (3, 1, 1))
+
+    def test_setting_another_version_clears_the_cache(self):
+        cache = PredictionCache(version="1")
+        cache.put(cache.keys(self.rows), [0, 1, 2, 3])
+        cache.set_version("1")
+        self.assertEqual(cache.stats()["entries"], 4)
+        cache.set_version("2")
+        self.assertEqual(cache.stats()["entries"], 0)
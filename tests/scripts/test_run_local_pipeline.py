@@ -0,0 +1,112 @@
+import json
+import os
+import shutil
+import unittest
+import numpy as np
+import pandas as pd
+import mlflow
+import mlflow.sklearn
+from sklearn.dummy import DummyClassifier
+from sklearn.linear_model import LogisticRegression
+from src.scripts.run_local_pipeline import LocalDag, run_local_pipeline
+
+
+class TestLocalDag(unittest.TestCase):
+
+    def test_runs_steps_after_their_dependencies(self):
+        dag = LocalDag(max_workers=4)
+        dag.add("a", lambda inputs: 1)
+        dag.add("b", lambda inputs: inputs["a"] + 1, depends_on=["a"])
+        dag.add("c", lambda inputs: inputs["a"] + 2, depends_on=["a"])
+        dag.add("d", lambda inputs: inputs["b"] * inputs["c"], depends_on=["b", "c"])
+
+        results, timings = dag.run()
+
+        self.assertEqual(results, {"a": 1, "b": 2, "c": 3, "d": 6})
+        self.assertEqual(set(timings), {"a", "b", "c", "d"})
+
+    def test_rejects_unknown_dependencies(self):
+        dag = LocalDag()
+        with self.assertRaises(ValueError):
+            dag.add("b", lambda inputs: None, depends_on=["a"])
+
+    def test_raises_the_error_of_a_failing_step(self):
+        def fail(inputs):
+            raise RuntimeError("step failed")
+
+        dag = LocalDag()
+        dag.add("a", fail)
+        dag.add("b", lambda inputs: None, depends_on=["a"])
+        with self.assertRaises(RuntimeError):
+            dag.run()
+
+
+class TestRunLocalPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = os.path.abspath("test_output")
+        self.input_path = os.path.join(self.test_dir, "input")
+        self.output_path = os.path.join(self.test_dir, "output")
+        os.makedirs(self.input_path)
+        self.tracking_uri = mlflow.get_tracking_uri()
+
+        rng = np.random.default_rng(0)
+        features = rng.normal(size=(400, 2))
+        df = pd.DataFrame(features, columns=["feature1", "feature2"])
+        df["label"] = (features[:, 0] + 0.2 * rng.normal(size=400) > 0).astype(int)
+        df.to_csv(os.path.join(self.input_path, "data.csv"), index=False)
+
+        # A trained model that beats a majority class baseline
+        self.models = {}
+        for model_id, model in [("trained", LogisticRegression()), ("baseline", DummyClassifier())]:
+            model_path = os.path.join(self.test_dir, "models", model_id)
+            mlflow.sklearn.save_model(
+                model.fit(df[["feature1", "feature2"]], df["label"]), model_path,
+                serialization_format=mlflow.sklearn.SERIALIZATION_FORMAT_CLOUDPICKLE
+            )
+            self.models[model_id] = model_path
+
+    def tearDown(self):
+        mlflow.set_tracking_uri(self.tracking_uri)
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_runs_the_pipeline_against_a_local_file_store(self):
+        timings = run_local_pipeline(
+            self.input_path, self.output_path, "label", self.models,
+            trained_model_id="trained", model_name="local-model"
+        )
+
+        self.assertEqual(
+            list(timings),
+            ["split_data", "evaluate_trained", "evaluate_baseline", "select_model", "register_model", "total"]
+        )
+        with open(os.path.join(self.output_path, "timings.json"), "r") as f:
+            self.assertEqual(json.load(f), timings)
+
+        with open(os.path.join(self.output_path, "comparison_report.json"), "r") as f:
+            self.assertEqual(json.load(f)["best_model_id"], "trained")
+        with open(os.path.join(self.output_path, "register_report.txt"), "r") as f:
+            self.assertIn("Model registration complete.", f.read())
+
+        # The evaluations ran on the test split written next to the reports
+        with open(os.path.join(self.output_path, "reports", "trained.json"), "r") as f:
+            report = json.load(f)
+        test_rows = len(pd.read_csv(os.path.join(self.output_path, "test", "test_data.csv")))
+        self.assertEqual(np.sum(report["confusion_matrix"]), test_rows)
+
+        client = mlflow.MlflowClient()
+        self.assertEqual([str(version.version) for version in client.search_model_versions("name='local-model'")], ["1"])
+
+        # Every evaluation logged to its own run, created and ended through the client
+        runs = client.search_runs([client.get_experiment_by_name("Default").experiment_id], "attributes.run_name LIKE 'evaluate_%'")
+        self.assertEqual(sorted((run.info.run_name, run.info.status) for run in runs),
+                         [("evaluate_baseline", "FINISHED"), ("evaluate_trained", "FINISHED")])
+
+    def test_rejects_a_trained_model_without_a_name(self):
+        with self.assertRaises(ValueError):
+            run_local_pipeline(self.input_path, self.output_path, "label", self.models, trained_model_id="trained")
+
+
+if __name__ == '__main__':
+    unittest.main()
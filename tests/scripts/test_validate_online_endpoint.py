@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import unittest
+import warnings
+import numpy as np
+import pandas as pd
+import mlflow.sklearn
+from sklearn.linear_model import LogisticRegression
+from src.components.common.telemetry import Telemetry
+from src.scoring import score
+from src.scripts.validate_online_endpoint import (
+    check_slos, latency_histogram, load_corpus, main, percentile, replay_corpus, summarize
+)
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "src", "scripts", "validate_online_endpoint.py")
+
+
+class TestScriptInvocation(unittest.TestCase):
+
+    def test_runs_as_a_file_without_the_src_folder_on_the_path(self):
+        env = {name: value for name, value in os.environ.items() if name != "PYTHONPATH"}
+        result = subprocess.run([sys.executable, SCRIPT_PATH, "--help"], env=env, cwd=os.path.dirname(SCRIPT_PATH), capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("--load_test", result.stdout)
+
+
+class TestLoadTestSummary(unittest.TestCase):
+
+    def test_summarizes_latencies_and_errors(self):
+        summary = summarize([float(value) for value in range(1, 101)], {"500": 25}, 2.0)
+
+        self.assertEqual(summary["requests"], 125)
+        self.assertEqual(summary["error_rate"], 0.2)
+        self.assertEqual(summary["throughput"], 50.0)
+        self.assertEqual((summary["p50_ms"], summary["p99_ms"], summary["max_ms"]), (50.0, 99.0, 100.0))
+        self.assertEqual(sum(summary["histogram"].values()), 100)
+
+    def test_percentile_and_histogram(self):
+        self.assertIsNone(percentile([], 99))
+        self.assertEqual(percentile([3.0], 99), 3.0)
+        histogram = latency_histogram([0.5, 1.0, 1.5, 7000.0])
+        self.assertEqual((histogram["<=1ms"], histogram["<=2ms"], histogram[">5000ms"]), (2, 1, 1))
+
+    def test_checks_the_slos(self):
+        summary = summarize([10.0] * 99 + [300.0], {"503": 1}, 1.0)
+
+        self.assertEqual(check_slos(summary, max_p99_ms=20, min_throughput=50, max_error_rate=0.05), [])
+        failures = check_slos(summary, max_p99_ms=5, min_throughput=200, max_error_rate=0.0)
+        self.assertEqual(len(failures), 3)
+        self.assertEqual(len(check_slos(summarize([], {"503": 3}, 1.0), max_p99_ms=5)), 2)
+
+
+class TestLoadTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Loading the model and starting the server once keeps the tests fast
+        cls.test_dir = os.path.abspath("test_output")
+        rng = np.random.default_rng(0)
+        cls.df = pd.DataFrame(rng.normal(size=(50, 3)), columns=["feature1", "feature2", "feature3"])
+        model = LogisticRegression().fit(cls.df, (cls.df["feature1"] > 0).astype(int))
+        mlflow.sklearn.save_model(model, os.path.join(cls.test_dir, "model"))
+
+        # The request corpus mixes JSON and .npy requests
+        cls.corpus_dir = os.path.join(cls.test_dir, "corpus")
+        os.makedirs(cls.corpus_dir)
+        with open(os.path.join(cls.corpus_dir, "requests.jsonl"), "w") as f:
+            for row in cls.df.to_numpy().tolist():
+                f.write(json.dumps({"data": [row]}) + "\n")
+        np.save(os.path.join(cls.corpus_dir, "batch.npy"), cls.df.to_numpy())
+        cls.request_file = os.path.join(cls.test_dir, "request.json")
+        with open(cls.request_file, "w") as f:
+            json.dump({"data": cls.df.to_numpy()[:2].tolist()}, f)
+        cls.response_file = os.path.join(cls.test_dir, "response.json")
+        with open(cls.response_file, "w") as f:
+            json.dump(model.predict(cls.df.iloc[:2]).tolist(), f)
+
+        cls.server = score.serve(os.path.join(cls.test_dir, "model"), port=0)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.scoring_uri = f"http://127.0.0.1:{cls.server.server_address[1]}/score"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.test_dir)
+        score.scorer = None
+
+    def setUp(self):
+        # The filter set by the scoring script is reset by the test runner around every test
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    def args(self, **kwargs):
+        defaults = dict(
+            scoring_uri=self.scoring_uri, api_key=None, load_test=True, request_data=self.request_file,
+            response_data=self.response_file, request_corpus=self.corpus_dir, concurrency=4, requests=200,
+            timeout=10, max_p99_ms=None, min_throughput=None, max_error_rate=0.0, load_test_report=None,
+        )
+        defaults.update(kwargs)
+        return argparse.Namespace(**defaults)
+
+    def test_loads_the_request_corpus(self):
+        corpus = load_corpus(self.corpus_dir)
+        self.assertEqual(len(corpus), 51)
+        self.assertEqual(corpus[0][1], "application/x-npy")
+        self.assertEqual(corpus[1][1], "application/json")
+        self.assertEqual(load_corpus(self.request_file)[0][1], "application/json")
+
+    def test_replays_the_corpus_over_pooled_connections(self):
+        summary = asyncio.run(replay_corpus(self.scoring_uri, load_corpus(self.corpus_dir), concurrency=4, total_requests=200))
+
+        self.assertEqual(summary["requests"], 200)
+        self.assertEqual(summary["errors"], {})
+        self.assertEqual(sum(summary["histogram"].values()), 200)
+        self.assertGreater(summary["throughput"], 0)
+
+    def test_counts_the_failed_requests(self):
+        corpus = [(b'{"data": [[0.0, 1.0, 2.0]]}', "application/json"), (b'{"data": 1}', "application/json")]
+        summary = asyncio.run(replay_corpus(self.scoring_uri, corpus, concurrency=2, total_requests=20))
+        self.assertEqual(summary["errors"], {"400": 10})
+        self.assertEqual(summary["error_rate"], 0.5)
+
+        unreachable = "http://127.0.0.1:1/score"
+        summary = asyncio.run(replay_corpus(unreachable, corpus, concurrency=2, total_requests=4))
+        self.assertEqual(summary["requests"], 4)
+        self.assertEqual(summary["error_rate"], 1.0)
+
+    def test_fails_when_the_slos_are_missed(self):
+        report = os.path.join(self.test_dir, "load_test.json")
+        main(self.args(max_p99_ms=10000, min_throughput=1, load_test_report=report))
+        with open(report) as f:
+            self.assertEqual(json.load(f)["requests"], 200)
+
+        with self.assertRaises(AssertionError):
+            main(self.args(max_p99_ms=0.001))
+
+    def test_writes_the_telemetry_of_the_load_test(self):
+        telemetry_file = os.path.join(self.test_dir, "telemetry.jsonl")
+        with Telemetry("validate_online_endpoint", telemetry_file) as telemetry:
+            main(self.args(requests=50), telemetry)
+
+        with open(telemetry_file) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line.get("span") for line in lines[:1]], ["load_test"])
+        self.assertEqual(lines[1]["event"], "Load test finished")
+        self.assertEqual((lines[-1]["summary"]["requests"], lines[-1]["summary"]["errors"]), (50, 0))
+
+    def test_validates_the_response_of_a_scoring_uri(self):
+        try:
+            import jsondiff  # noqa: F401
+        except ImportError:
+            self.skipTest("jsondiff is not installed")
+        main(self.args(load_test=False))